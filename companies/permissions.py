@@ -11,6 +11,6 @@ class IsCompanyOwner(BasePermission):
             return True
         
         if request.method in ['PATCH', 'PUT', 'DELETE']:
-            return obj.created_by == request.user
+            return obj.created_by_id == request.user.pk
         
         return False
\ No newline at end of file
@@ -1,3 +1,100 @@
-from django.test import TestCase
+import itertools
 
-# Create your tests here.
+from monitoring.testing import QueryBudgetTestCase
+from tasks.models import Task
+from teams.models import Membership, Team
+from users.models import User
+from .models import Company
+
+
+def make_user(label):
+    return User.objects.create_user(email=f'{label}@example.com', username=label, name=label.title(), password='pw-12345-x')
+
+
+class CompanyEndpointTests(QueryBudgetTestCase):
+    def setUp(self):
+        self.user = make_user('owner')
+        self.client.force_authenticate(self.user)
+
+    def own_companies(self, count):
+        for index in range(Company.objects.filter(created_by=self.user).count(), count):
+            Company.objects.create(name=f'Owned {index}', created_by=self.user)
+
+    def join_companies(self, count):
+        """Companies of other owners the user sees through a team membership."""
+        for index in range(Membership.objects.filter(user=self.user).count(), count):
+            company = Company.objects.create(name=f'Joined {index}', created_by=make_user(f'other{index}'))
+            team = Team.objects.create(name='Team', company=company)
+            Membership.objects.create(user=self.user, team=team)
+
+    def test_list_queries_do_not_grow_with_owned_companies(self):
+        response = self.assertConstantQueries(self.own_companies, lambda: self.client.get('/api/companies/?page_size=100'))
+
+        self.assertEqual(response.json()['count'], 100)
+
+    def test_list_queries_do_not_grow_with_member_companies(self):
+        response = self.assertConstantQueries(self.join_companies, lambda: self.client.get('/api/companies/?page_size=100'))
+
+        self.assertEqual({company['owner'] for company in response.json()['results']}, {f'other{index}@example.com' for index in range(100)})
+
+    def test_retrieve_queries_do_not_grow_with_teams(self):
+        company = Company.objects.create(name='Acme', created_by=self.user)
+
+        def add_teams(count):
+            for index in range(company.teams.count(), count):
+                Team.objects.create(name=f'Team {index}', company=company)
+
+        self.assertConstantQueries(add_teams, lambda: self.client.get(f'/api/companies/{company.pk}/'))
+
+    def test_create_queries_do_not_grow_with_owned_companies(self):
+        response = self.assertConstantQueries(self.own_companies, lambda: self.client.post('/api/companies/', {'name': 'New'}, format='json'))
+
+        self.assertEqual(response.status_code, 201)
+
+    def test_update_queries_do_not_grow_with_teams(self):
+        company = Company.objects.create(name='Acme', created_by=self.user)
+        names = itertools.cycle(['Renamed', 'Acme'])
+
+        def add_teams(count):
+            for index in range(company.teams.count(), count):
+                Team.objects.create(name=f'Team {index}', company=company)
+
+        self.assertConstantQueries(add_teams, lambda: self.client.put(f'/api/companies/{company.pk}/', {'name': next(names)}, format='json'))
+
+    def test_destroy_queries_do_not_grow_with_teams(self):
+        companies = []
+        users = itertools.count()
+
+        def grow(count):
+            companies[:] = [Company.objects.create(name='Doomed', created_by=self.user) for _ in range(2)]
+            for company in companies:
+                for index in range(count):
+                    team = Team.objects.create(name=f'Team {index}', company=company)
+                    membership = Membership.objects.create(user=make_user(f'member{next(users)}'), team=team)
+                    Task.objects.create(title='Task', team=team, created_by=membership)
+
+        # Django deletes collected rows in batches of 100 primary keys.
+        self.assertConstantQueries(grow, lambda: self.client.delete(f'/api/companies/{companies.pop().pk}/'), sizes=(1, 10, 50))
+
+    def test_list_hides_unrelated_companies(self):
+        Company.objects.create(name='Elsewhere', created_by=make_user('stranger'))
+
+        response = self.client.get('/api/companies/')
+
+        self.assertEqual(response.json()['count'], 0)
+
+    def test_create_sets_owner(self):
+        response = self.client.post('/api/companies/', {'name': ' Acme '}, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['name'], 'Acme')
+        self.assertEqual(Company.objects.get().created_by, self.user)
+
+    def test_only_owner_can_update(self):
+        company = Company.objects.create(name='Acme', created_by=make_user('stranger'))
+        team = Team.objects.create(name='Team', company=company)
+        Membership.objects.create(user=self.user, team=team)
+
+        response = self.client.patch(f'/api/companies/{company.pk}/', {'name': 'Mine'}, format='json')
+
+        self.assertEqual(response.status_code, 403)
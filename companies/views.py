@@ -1,9 +1,10 @@
 from rest_framework import viewsets, filters
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.pagination import PageNumberPagination
-from django.db.models import Q
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
+from monitoring.profiling import ProfilingMixin
+from teams.scoping import visible_companies
 from .models import Company
 from .serializers import CompanySerializer
 from .permissions import IsCompanyOwner
@@ -16,7 +17,7 @@ class CompanyPagination(PageNumberPagination):
     max_page_size = 100
 
 
-class CompanyViewSet(viewsets.ModelViewSet):
+class CompanyViewSet(ProfilingMixin, viewsets.ModelViewSet):
  
     queryset = Company.objects.all()
     serializer_class = CompanySerializer
@@ -37,12 +38,7 @@ class CompanyViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
        
-        user = self.request.user
-        
-        return Company.objects.filter(
-            Q(created_by=user) |                         
-            Q(teams__memberships__user=user)             
-        ).distinct()
+        return visible_companies(self.request.user).select_related('created_by')
 
     @swagger_auto_schema(
         operation_summary="Create a new company",
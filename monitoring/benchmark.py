@@ -0,0 +1,167 @@
+import itertools
+import json
+import math
+import re
+import threading
+import time
+from collections import namedtuple
+
+from django.db import connections
+from django.db.models import Count
+from django.test import Client
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from tasks.models import Task
+from tasks.synthetic import SYNTHETIC_PASSWORD
+from teams.models import Membership, Team
+from users.models import User
+
+# Set by QueryInstrumentationMiddleware on every response.
+QUERY_COUNT_RE = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+# `request(index)` returns the (path, JSON body or None) of the index-th call.
+Scenario = namedtuple('Scenario', 'name method request')
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of already sorted `values`."""
+    if not values:
+        return None
+    return values[max(0, min(len(values) - 1, math.ceil(pct / 100 * len(values)) - 1))]
+
+
+def build_scenarios(team=None):
+    """
+    The endpoints to drive, run as an admin of `team` (by default the team
+    with the most tasks, so list pages are full). Writes go to that team:
+    every `assign` uses a (task, member) pair that is not assigned yet and
+    every `add_member` a user outside the team, so repeated calls do not
+    turn into 400s.
+    """
+    if team is None:
+        team = Team.objects.annotate(task_count=Count('tasks')).order_by('-task_count', 'pk').first()
+    admin = Membership.objects.filter(team=team, role=Membership.ROLE_ADMIN).select_related('user').order_by('joined_at', 'pk').first()
+    user = admin.user
+
+    task_ids = list(Task.objects.filter(team=team, is_deleted=False).order_by('pk').values_list('pk', flat=True))
+    members = list(Membership.objects.filter(team=team).order_by('pk').values_list('pk', 'user__email'))
+    assigned = set(Task.assigned_members.through.objects.filter(task__team=team).values_list('task_id', 'membership_id'))
+    outsiders = list(User.objects.exclude(membership__team=team).order_by('pk').values_list('pk', flat=True))
+
+    def assign_pairs():
+        for task_id in task_ids:
+            for membership_id, email in members:
+                if (task_id, membership_id) not in assigned:
+                    yield task_id, email
+
+    pairs, pair_source, pair_lock = [], assign_pairs(), threading.Lock()
+
+    def assign(index):
+        with pair_lock:
+            while len(pairs) <= index:
+                pairs.append(next(pair_source, pairs[-1] if pairs else (task_ids[0], members[0][1])))
+            task_id, email = pairs[index]
+        return f'/api/tasks/{task_id}/assign/', {'assigned_to': email}
+
+    statuses = [status for status, _ in Task.STATUS_CHOICES]
+    scenarios = [
+        Scenario('tasks.list', 'get', lambda index: ('/api/tasks/', None)),
+        Scenario('tasks.list_filtered', 'get', lambda index: (f'/api/tasks/?status={statuses[index % 3]}&ordering=-due_date', None)),
+        Scenario('tasks.search', 'get', lambda index: ('/api/tasks/?search=deploy', None)),
+        Scenario('tasks.retrieve', 'get', lambda index: (f'/api/tasks/{task_ids[index % len(task_ids)]}/', None)),
+        Scenario('tasks.partial_update', 'patch', lambda index: (
+            f'/api/tasks/{task_ids[index % len(task_ids)]}/', {'status': statuses[index % 3]},
+        )),
+        Scenario('tasks.assign', 'post', assign),
+        Scenario('teams.list', 'get', lambda index: ('/api/teams/', None)),
+        Scenario('teams.add_member', 'post', lambda index: (
+            f'/api/teams/{team.pk}/add_member/', {'user_id': str(outsiders[index % len(outsiders)])},
+        )),
+        Scenario('companies.list', 'get', lambda index: ('/api/companies/', None)),
+        Scenario('auth.login', 'post', lambda index: ('/api/auth/login/', {'email': user.email, 'password': SYNTHETIC_PASSWORD})),
+    ]
+    return scenarios, user
+
+
+def run_scenario(scenario, user, requests, concurrency, warmup=0):
+    """
+    Send `warmup` unmeasured calls one after the other, then `requests`
+    measured calls from `concurrency` threads, each with its own test
+    Client (the WSGI handler in-process) and database connection.
+    """
+    token = str(RefreshToken.for_user(user).access_token)
+    counter, lock = itertools.count(warmup), threading.Lock()
+    samples = []
+
+    def call(client, index):
+        path, data = scenario.request(index)
+        start = time.perf_counter()
+        if data is None:
+            response = getattr(client, scenario.method)(path)
+        else:
+            response = getattr(client, scenario.method)(path, json.dumps(data), content_type='application/json')
+        elapsed = time.perf_counter() - start
+        match = QUERY_COUNT_RE.search(response.get('Server-Timing', ''))
+        return elapsed, response.status_code, int(match.group(1)) if match else None
+
+    def worker():
+        client = Client(raise_request_exception=False, HTTP_AUTHORIZATION=f'Bearer {token}')
+        try:
+            while True:
+                with lock:
+                    index = next(counter)
+                if index >= warmup + requests:
+                    return
+                sample = call(client, index)
+                with lock:
+                    samples.append(sample)
+        finally:
+            connections.close_all()
+
+    client = Client(raise_request_exception=False, HTTP_AUTHORIZATION=f'Bearer {token}')
+    for index in range(warmup):
+        call(client, index)
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(samples, time.perf_counter() - start)
+
+
+def summarize(samples, wall_time):
+    latencies = sorted(elapsed * 1000 for elapsed, _, _ in samples)
+    queries = [count for _, _, count in samples if count is not None]
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for _, status, _ in samples if status >= 400),
+        'throughput': round(len(samples) / wall_time, 1) if wall_time else None,
+        'p50_ms': round(percentile(latencies, 50), 2) if latencies else None,
+        'p95_ms': round(percentile(latencies, 95), 2) if latencies else None,
+        'p99_ms': round(percentile(latencies, 99), 2) if latencies else None,
+        'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    Regressions of `results` against `baseline` ({scenario: summary}):
+    p50/p99 more than `tolerance` (a fraction) slower, more queries per
+    request, or errors where there were none.
+    """
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        for key in ('p50_ms', 'p99_ms'):
+            if expected.get(key) and result[key] is not None and result[key] > expected[key] * (1 + tolerance):
+                regressions.append(f'{name}: {key} {result[key]} > {expected[key]} (+{tolerance:.0%})')
+        # Averages over a few hundred calls; half a query is noise, not an N+1.
+        if expected.get('queries_per_request') is not None and result['queries_per_request'] is not None \
+                and result['queries_per_request'] > expected['queries_per_request'] + 0.5:
+            regressions.append(f"{name}: {result['queries_per_request']} queries/request > {expected['queries_per_request']}")
+        if result['errors'] and not expected.get('errors'):
+            regressions.append(f"{name}: {result['errors']} failed requests")
+    return regressions
@@ -0,0 +1,85 @@
+import time
+from collections import Counter
+
+from django.conf import settings
+
+from .slow_queries import get_slow_query_settings, slow_query_log
+
+DEFAULTS = {
+    'ENABLED': True,
+    'SERVER_TIMING': True,
+    'LOG': True,
+}
+
+
+def get_instrumentation_settings():
+    return {**DEFAULTS, **getattr(settings, 'REQUEST_INSTRUMENTATION', {})}
+
+
+def resolve_view_name(view_func, method):
+    """
+    `TaskViewSet.list`, `LoginView.post`, ... for DRF views, the function's
+    qualified name for plain Django views.
+    """
+    view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+    if view_class is None:
+        return getattr(view_func, '__qualname__', repr(view_func))
+
+    actions = getattr(view_func, 'actions', None)
+    handler = actions.get(method.lower(), method.lower()) if actions else method.lower()
+    return f'{view_class.__name__}.{handler}'
+
+
+class QueryStats:
+    """
+    connection.execute_wrapper() callable that counts the statements of one
+    request, their total time and how many were exact repeats (same SQL and
+    parameters) or repeats of the same SQL with other parameters (N+1).
+
+    Statements slower than SLOW_QUERY_LOG['THRESHOLD_MS'] are handed to the
+    slow-query log. The EXPLAIN it runs goes through this wrapper too and is
+    passed straight through, neither counted nor recorded.
+    """
+
+    def __init__(self):
+        self.view_name = None
+        self.count = 0
+        self.duration = 0.0
+        self._statements = Counter()
+        self._calls = Counter()
+        self._recording = False
+        self._slow_options = get_slow_query_settings()
+
+    def __call__(self, execute, sql, params, many, context):
+        if self._recording:
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        try:
+            result = execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.duration += elapsed
+            self.count += 1
+            self._statements[sql] += 1
+            self._calls[(sql, repr(params))] += 1
+
+        options = self._slow_options
+        if options['ENABLED'] and elapsed * 1000 >= options['THRESHOLD_MS']:
+            self._record_slow(context['connection'], sql, params, many, elapsed)
+        return result
+
+    def _record_slow(self, connection, sql, params, many, elapsed):
+        self._recording = True
+        try:
+            slow_query_log.record(connection, sql, params, many, elapsed, self.view_name, self._slow_options)
+        finally:
+            self._recording = False
+
+    @property
+    def duplicates(self):
+        return sum(n - 1 for n in self._calls.values())
+
+    @property
+    def similar(self):
+        return sum(n - 1 for n in self._statements.values())
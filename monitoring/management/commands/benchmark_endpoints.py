@@ -0,0 +1,126 @@
+import json
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import override_settings, setup_databases, teardown_databases
+
+from monitoring.benchmark import build_scenarios, compare, run_scenario
+from monitoring.instrumentation import get_instrumentation_settings
+from tasks.activity import flush_activity
+from tasks.synthetic import SyntheticDataGenerator
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / 'benchmarks' / 'baseline.json'
+
+# The threads write at the same time. Transactions take SQLite's write lock
+# when they begin, so writers wait for it (up to `timeout` seconds) instead
+# of failing with "database is locked" when a read lock cannot be upgraded.
+SQLITE_OPTIONS = {'transaction_mode': 'IMMEDIATE', 'timeout': 20}
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway database with generate_synthetic_data, drive the main API endpoints from several threads "
+        "and report throughput, p50/p95/p99 latency and queries per request. Fails when results regress against "
+        "the baseline file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100, help="Measured requests per scenario.")
+        parser.add_argument('--concurrency', type=int, default=4, help="Threads sending requests at the same time.")
+        parser.add_argument('--warmup', type=int, default=5, help="Unmeasured requests per scenario.")
+        parser.add_argument('--scenario', action='append', help="Only run this scenario (repeatable), e.g. tasks.list.")
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--teams', type=int, default=50)
+        parser.add_argument('--tasks', type=int, default=20000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE), help="JSON file to compare against.")
+        parser.add_argument('--tolerance', type=float, default=0.5, help="Allowed latency increase as a fraction, 0.5 = +50%%.")
+        parser.add_argument('--update-baseline', action='store_true', help="Write the results to --baseline instead of comparing.")
+        parser.add_argument('--output', help="Also write the results as JSON to this file.")
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1 or options['warmup'] < 0:
+            raise CommandError("--requests and --concurrency must be positive, --warmup cannot be negative.")
+
+        dataset = {key: options[key] for key in ('users', 'teams', 'tasks', 'seed')}
+        with tempfile.TemporaryDirectory() as directory:
+            old_options = {}
+            for alias in connections:
+                # SQLite test databases default to in-memory, which threads cannot share.
+                if connections[alias].vendor == 'sqlite':
+                    settings_dict = connections[alias].settings_dict
+                    settings_dict['TEST']['NAME'] = os.path.join(directory, f'{alias}.sqlite3')
+                    old_options[alias] = settings_dict['OPTIONS']
+                    settings_dict['OPTIONS'] = {**old_options[alias], **SQLITE_OPTIONS}
+            old_config = setup_databases(verbosity=0, interactive=False)
+            try:
+                self.stdout.write(f"Seeding {dataset}...")
+                SyntheticDataGenerator(**dataset).run()
+                # Query counts come from the Server-Timing header; the
+                # per-request log, slow-query EXPLAINs and sampled profiles
+                # would only add noise to the timings.
+                with override_settings(
+                    REQUEST_INSTRUMENTATION={**get_instrumentation_settings(), 'ENABLED': True, 'SERVER_TIMING': True, 'LOG': False},
+                    SLOW_QUERY_LOG={'ENABLED': False},
+                    PROFILING={'ENABLED': False},
+                ):
+                    results = self.run_scenarios(options)
+            finally:
+                # No buffered ActivityLog row may outlive the throwaway database.
+                flush_activity()
+                teardown_databases(old_config, verbosity=0)
+                for alias, database_options in old_options.items():
+                    connections[alias].settings_dict['OPTIONS'] = database_options
+
+        report = {
+            'dataset': dataset,
+            'requests': options['requests'],
+            'concurrency': options['concurrency'],
+            'results': results,
+        }
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(report, indent=2) + '\n', encoding='utf-8')
+
+        baseline_path = Path(options['baseline'])
+        if options['update_baseline']:
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(json.dumps(report, indent=2) + '\n', encoding='utf-8')
+            self.stdout.write(self.style.SUCCESS(f"Baseline written to {baseline_path}."))
+            return
+        if not baseline_path.exists():
+            self.stdout.write(self.style.WARNING(f"No baseline at {baseline_path}, nothing to compare."))
+            return
+
+        baseline = json.loads(baseline_path.read_text(encoding='utf-8'))
+        if any(baseline.get(key) != report[key] for key in ('dataset', 'requests', 'concurrency')):
+            self.stdout.write(self.style.WARNING("The baseline was recorded with other settings; latencies may not compare."))
+        regressions = compare(results, baseline.get('results', {}), options['tolerance'])
+        if regressions:
+            raise CommandError("Performance regressions:\n  " + '\n  '.join(regressions))
+        self.stdout.write(self.style.SUCCESS(f"No regressions against {baseline_path}."))
+
+    def run_scenarios(self, options):
+        scenarios, user = build_scenarios()
+        if options['scenario']:
+            unknown = set(options['scenario']) - {scenario.name for scenario in scenarios}
+            if unknown:
+                raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}.")
+            scenarios = [scenario for scenario in scenarios if scenario.name in options['scenario']]
+
+        self.stdout.write(
+            f"{'scenario':<22}{'req':>6}{'err':>5}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}"
+        )
+        results = {}
+        for scenario in scenarios:
+            result = results[scenario.name] = run_scenario(
+                scenario, user, options['requests'], options['concurrency'], warmup=options['warmup'],
+            )
+            self.stdout.write(
+                f"{scenario.name:<22}{result['requests']:>6}{result['errors']:>5}{result['throughput']:>9}"
+                f"{result['p50_ms']:>9}{result['p95_ms']:>9}{result['p99_ms']:>9}{str(result['queries_per_request']):>9}"
+            )
+        return results
@@ -0,0 +1,271 @@
+import atexit
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+
+DEFAULTS = {
+    'ENABLED': True,
+    # Directory shared by all worker processes. Each one writes its values
+    # there and /metrics adds them up; None keeps the numbers per process.
+    'MULTIPROCESS_DIR': None,
+    'SNAPSHOT_INTERVAL': 5.0,
+    # /metrics answers scrapers sending `Authorization: Bearer <TOKEN>` and,
+    # with ALLOW_STAFF, staff users; everyone else gets a 403.
+    'TOKEN': None,
+    'ALLOW_STAFF': True,
+}
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def get_metrics_settings():
+    return {**DEFAULTS, **getattr(settings, 'METRICS', {})}
+
+
+def process_exists(pid):
+    try:
+        os.kill(int(pid), 0)
+    except ValueError:
+        # Not written by a Registry; leave it alone.
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Alive, owned by another user.
+        pass
+    return True
+
+
+def format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        '{}="{}"'.format(name, str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"'))
+        for name, value in pairs
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name} expects labels {self.labelnames}, got {tuple(labels)}.')
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'type': self.type,
+                'samples': [[list(key), self._dump(value)] for key, value in self._values.items()],
+            }
+
+    def _dump(self, value):
+        return value
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def merge(self, total, value):
+        return (total or 0) + value
+
+    def render(self, samples):
+        for key, value in samples:
+            yield f'{self.name}{format_labels(self.labelnames, key)} {format_value(value)}'
+
+
+class Histogram(Metric):
+    """Fixed upper bounds; counts are kept per bucket and summed on render."""
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = next(i for i, bound in enumerate(self.buckets) if value <= bound)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def _dump(self, value):
+        return [list(value[0]), value[1]]
+
+    def merge(self, total, value):
+        counts, total_sum = value
+        if len(counts) != len(self.buckets):
+            # Written by a process running with other buckets.
+            return total
+        if total is None:
+            return [list(counts), total_sum]
+        return [[a + b for a, b in zip(total[0], counts)], total[1] + total_sum]
+
+    def render(self, samples):
+        for key, (counts, total_sum) in samples:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = format_labels(self.labelnames, key, [('le', format_value(bound))])
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            labels = format_labels(self.labelnames, key)
+            yield f'{self.name}_sum{labels} {format_value(total_sum)}'
+            yield f'{self.name}_count{labels} {cumulative}'
+
+
+class Registry:
+    """
+    The metrics of this process. In multiprocess mode every process dumps
+    its values to `<pid>-<token>.json` in MULTIPROCESS_DIR at most every
+    SNAPSHOT_INTERVAL seconds (and on exit); collect() adds up the files of
+    the other processes and the live values of this one, and deletes the
+    files of processes that no longer exist. Their counts drop out of the
+    totals, which Prometheus treats as a counter reset. The directory must
+    only be shared by the processes of one host.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._pid = None
+        self._token = None
+        self._last_snapshot = 0.0
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f'Metric {metric.name} is already registered.')
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def reset(self):
+        for metric in self._metrics.values():
+            metric.reset()
+
+    def snapshot(self):
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+    def snapshot_path(self, directory):
+        # A forked worker must not keep writing to its parent's file.
+        if self._pid != os.getpid():
+            self._pid, self._token = os.getpid(), uuid.uuid4().hex[:8]
+        return Path(directory) / f'{self._pid}-{self._token}.json'
+
+    def write_snapshot(self, directory=None):
+        directory = directory or get_metrics_settings()['MULTIPROCESS_DIR']
+        if not directory:
+            return None
+        path = self.snapshot_path(directory)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp = path.with_suffix('.tmp')
+        temp.write_text(json.dumps(self.snapshot(), separators=(',', ':')), encoding='utf-8')
+        os.replace(temp, path)
+        self._last_snapshot = time.monotonic()
+        return path
+
+    def maybe_write_snapshot(self):
+        options = get_metrics_settings()
+        if options['MULTIPROCESS_DIR'] and time.monotonic() - self._last_snapshot >= options['SNAPSHOT_INTERVAL']:
+            self.write_snapshot(options['MULTIPROCESS_DIR'])
+
+    def collect(self, directory=None):
+        """{name: [(label values, value), ...]} over all processes."""
+        snapshots = [self.snapshot()]
+        directory = directory or get_metrics_settings()['MULTIPROCESS_DIR']
+        if directory and Path(directory).is_dir():
+            own = self.snapshot_path(directory)
+            for path in sorted(Path(directory).glob('*.json')):
+                if path == own:
+                    continue
+                if not process_exists(path.stem.split('-', 1)[0]):
+                    path.unlink(missing_ok=True)
+                    continue
+                try:
+                    snapshots.append(json.loads(path.read_text(encoding='utf-8')))
+                except (OSError, ValueError):
+                    # Being replaced or truncated; the next scrape reads it.
+                    continue
+
+        merged = {}
+        for name, metric in self._metrics.items():
+            totals = {}
+            for snapshot in snapshots:
+                data = snapshot.get(name)
+                if not data or data.get('type') != metric.type:
+                    continue
+                for key, value in data['samples']:
+                    key = tuple(key)
+                    totals[key] = metric.merge(totals.get(key), value)
+            merged[name] = sorted((key, value) for key, value in totals.items() if value is not None)
+        return merged
+
+    def render(self, directory=None):
+        """The Prometheus text exposition format (0.0.4)."""
+        lines = []
+        for name, samples in self.collect(directory).items():
+            metric = self._metrics[name]
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.type}')
+            lines.extend(metric.render(samples))
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+atexit.register(registry.write_snapshot)
+
+REQUESTS = registry.counter(
+    'http_requests_total', 'Requests handled, by view, method and status code.', ('view', 'method', 'status'),
+)
+REQUEST_DURATION = registry.histogram(
+    'http_request_duration_seconds', 'Time spent handling a request.', ('view', 'method'),
+)
+DB_QUERIES = registry.counter(
+    'db_queries_total', 'SQL statements run while handling a request.', ('view',),
+)
+DB_DURATION = registry.histogram(
+    'db_query_duration_seconds', 'Total SQL time of one request.', ('view',),
+)
+ACTIVITY_LOG_WRITES = registry.counter(
+    'activity_log_writes_total', 'ActivityLog rows written, by code path.', ('source',),
+)
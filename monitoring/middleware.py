@@ -0,0 +1,98 @@
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+
+from .instrumentation import QueryStats, get_instrumentation_settings, resolve_view_name
+from .metrics import DB_DURATION, DB_QUERIES, REQUEST_DURATION, REQUESTS, get_metrics_settings, registry
+
+logger = logging.getLogger('monitoring.requests')
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Counts the SQL statements, DB time and duplicate statements of every
+    request through connection.execute_wrapper(), which works with DEBUG off.
+    The totals go out as a Server-Timing header and one JSON log line keyed
+    by the view, e.g. `TaskViewSet.list`.
+
+    Queries run while a StreamingHttpResponse is consumed happen after the
+    middleware returns and are not counted.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        options = get_instrumentation_settings()
+        if not options['ENABLED']:
+            return self.get_response(request)
+
+        stats = QueryStats()
+        request.query_stats = stats
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        if options['SERVER_TIMING']:
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} queries"',
+                f'db-dup;desc="{stats.duplicates} duplicate, {stats.similar} repeated"',
+                f'app;dur={elapsed * 1000:.1f}',
+            ])
+        if options['LOG']:
+            logger.info(json.dumps({
+                'view': stats.view_name,
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'duration_ms': round(elapsed * 1000, 2),
+                'db_ms': round(stats.duration * 1000, 2),
+                'queries': stats.count,
+                'duplicates': stats.duplicates,
+                'repeated': stats.similar,
+            }, separators=(',', ':')))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        stats = getattr(request, 'query_stats', None)
+        if stats is not None:
+            stats.view_name = resolve_view_name(view_func, request.method)
+
+
+class MetricsMiddleware:
+    """
+    Feeds the request counter and latency histograms of monitoring.metrics,
+    labelled with the view (`unmatched` when no URL matched). Placed before
+    QueryInstrumentationMiddleware so that request.query_stats is complete
+    when the DB series are recorded.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not get_metrics_settings()['ENABLED']:
+            return self.get_response(request)
+
+        start = time.perf_counter()
+        response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        view = getattr(request, 'metrics_view', None) or 'unmatched'
+        REQUESTS.inc(view=view, method=request.method, status=response.status_code)
+        REQUEST_DURATION.observe(elapsed, view=view, method=request.method)
+        stats = getattr(request, 'query_stats', None)
+        if stats is not None:
+            DB_QUERIES.inc(stats.count, view=view)
+            DB_DURATION.observe(stats.duration, view=view)
+        registry.maybe_write_snapshot()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metrics_view = resolve_view_name(view_func, request.method)
@@ -0,0 +1,184 @@
+import cProfile
+import io
+import logging
+import pstats
+import random
+import re
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    # Staff users get their request profiled by sending this header.
+    'HEADER': 'X-Profile',
+    # {'TaskViewSet.list': 0.01, ...}: fraction of the view's requests
+    # profiled regardless of who sends them.
+    'SAMPLE_RATES': {},
+    'OUTPUT_DIR': Path(settings.BASE_DIR) / 'logs' / 'profiles',
+    # Oldest captures are deleted once the directory grows past this.
+    'MAX_BYTES': 100 * 1024 * 1024,
+    'TOP_N': 30,
+    'SORT': 'cumulative',
+}
+
+# cProfile can only follow one request at a time without the captures
+# mixing; requests arriving meanwhile are served unprofiled.
+_lock = threading.Lock()
+
+
+def get_profiling_settings():
+    return {**DEFAULTS, **getattr(settings, 'PROFILING', {})}
+
+
+def view_name(view, request):
+    """Same names as the request log, e.g. `TaskViewSet.list`, `LoginView.post`."""
+    return f'{type(view).__name__}.{getattr(view, "action", None) or request.method.lower()}'
+
+
+def rotate(directory, max_bytes, keep=None):
+    """
+    Delete the oldest captures until `directory` holds at most `max_bytes`,
+    never the capture named `keep`.
+    """
+    captures = {}
+    for path in Path(directory).iterdir():
+        if path.suffix in ('.prof', '.txt') and path.stem != keep:
+            captures.setdefault(path.stem, []).append(path)
+
+    def stat(paths):
+        stats = [path.stat() for path in paths]
+        return max(s.st_mtime for s in stats), sum(s.st_size for s in stats)
+
+    sized = sorted((stat(paths) + (paths,) for paths in captures.values()), key=lambda item: item[0])
+    total = sum(size for _, size, _ in sized)
+    if keep is not None:
+        total += sum(path.stat().st_size for path in Path(directory).glob(f'{keep}.*'))
+    for _, size, paths in sized:
+        if total <= max_bytes:
+            break
+        for path in paths:
+            path.unlink(missing_ok=True)
+        total -= size
+
+
+class Capture:
+    """One running cProfile session and what is known about its request."""
+
+    def __init__(self, view, request, reason):
+        self.view = view
+        self.request = request
+        self.reason = reason
+        self.name = view_name(view, request)
+        self.capture_id = '{}-{}-{}'.format(
+            timezone.now().strftime('%Y%m%dT%H%M%S'), re.sub(r'[^\w.]+', '_', self.name), uuid.uuid4().hex[:8],
+        )
+        self.profiler = cProfile.Profile()
+        stats = getattr(request, 'query_stats', None)
+        self._queries_before = stats.count if stats is not None else None
+
+    def start(self):
+        self._start = time.perf_counter()
+        self.profiler.enable()
+
+    def abort(self):
+        self.profiler.disable()
+
+    def stop(self, response, options):
+        self.profiler.disable()
+        elapsed = time.perf_counter() - self._start
+        stats = getattr(self.request, 'query_stats', None)
+        queries = stats.count - self._queries_before if self._queries_before is not None else None
+
+        directory = Path(options['OUTPUT_DIR'])
+        directory.mkdir(parents=True, exist_ok=True)
+        self.profiler.dump_stats(directory / f'{self.capture_id}.prof')
+
+        summary = io.StringIO()
+        summary.write(
+            f'view: {self.name}\n'
+            f'request: {self.request.method} {self.request.get_full_path()}\n'
+            f'status: {response.status_code}\n'
+            f'trigger: {self.reason}\n'
+            f'user: {getattr(self.request.user, "pk", None)}\n'
+            f'duration_ms: {elapsed * 1000:.1f}\n'
+            f'queries: {queries if queries is not None else "n/a"}\n\n'
+        )
+        pstats.Stats(self.profiler, stream=summary).sort_stats(options['SORT']).print_stats(options['TOP_N'])
+        (directory / f'{self.capture_id}.txt').write_text(summary.getvalue(), encoding='utf-8')
+        rotate(directory, options['MAX_BYTES'], keep=self.capture_id)
+
+
+class ProfilingMixin:
+    """
+    Runs cProfile around the handler of a DRF view when a staff user sends
+    PROFILING['HEADER'] or the view is drawn by PROFILING['SAMPLE_RATES'].
+    The profile starts after authentication (so staff can be recognised
+    from the JWT) and stops in finalize_response, or is dropped when the
+    handler raises past handle_exception; the `.prof` file and a
+    top-N text summary tagged with the view and query count are written to
+    OUTPUT_DIR. Staff requests get the capture id back in `X-Profile-Id`.
+    Rows streamed after the view returns are not covered.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            # Unhandled exceptions skip finalize_response.
+            capture = getattr(self, '_profile', None)
+            if capture is not None:
+                self._profile = None
+                capture.abort()
+                _lock.release()
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._profile = None
+        options = get_profiling_settings()
+        if not options['ENABLED']:
+            return
+
+        reason = self.get_profiling_reason(request, options)
+        if reason is None or not _lock.acquire(blocking=False):
+            return
+        capture = Capture(self, request, reason)
+        try:
+            capture.start()
+        except ValueError:
+            # Another profiler (e.g. a debugger) is already active.
+            _lock.release()
+            return
+        self._profile = capture
+
+    def get_profiling_reason(self, request, options):
+        user = request.user
+        if request.headers.get(options['HEADER']) and getattr(user, 'is_staff', False):
+            return 'header'
+        rate = options['SAMPLE_RATES'].get(view_name(self, request), 0)
+        if rate and random.random() < rate:
+            return 'sample'
+        return None
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        capture = getattr(self, '_profile', None)
+        if capture is None:
+            return response
+
+        self._profile = None
+        try:
+            capture.stop(response, get_profiling_settings())
+        except OSError:
+            logger.exception("Could not write profile %s.", capture.capture_id)
+        finally:
+            _lock.release()
+        if getattr(request.user, 'is_staff', False):
+            response['X-Profile-Id'] = capture.capture_id
+        return response
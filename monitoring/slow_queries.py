@@ -0,0 +1,107 @@
+import json
+import logging
+import re
+import threading
+from contextlib import nullcontext
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+DEFAULTS = {
+    'ENABLED': True,
+    'THRESHOLD_MS': 100,
+    'EXPLAIN': True,
+    'LOG_FILE': Path(settings.BASE_DIR) / 'logs' / 'slow_queries.log',
+    'MAX_BYTES': 10 * 1024 * 1024,
+    'BACKUP_COUNT': 5,
+    'MAX_SQL_LENGTH': 10000,
+}
+
+# `SCAN tasks_task` (SQLite) / `Seq Scan on tasks_task` (PostgreSQL), but not
+# `SCAN ... USING INDEX`, which walks an index in order.
+FULL_SCAN_RE = re.compile(r'\b(?:SCAN|Seq Scan on)\s+(?!CONSTANT ROW)(\w+)(?!.*\bUSING\b(?:\s+COVERING)?\s+INDEX)')
+
+
+def get_slow_query_settings():
+    return {**DEFAULTS, **getattr(settings, 'SLOW_QUERY_LOG', {})}
+
+
+def params_shape(params, many):
+    """Types of the parameters, never their values."""
+    if many:
+        return {'rows': len(params) if hasattr(params, '__len__') else None}
+    if not params:
+        return []
+    if isinstance(params, dict):
+        return {key: type(value).__name__ for key, value in params.items()}
+    return [type(value).__name__ for value in params]
+
+
+def explain(connection, sql, params):
+    """The query plan as a list of lines, None for non-SELECTs or on failure."""
+    if not sql.lstrip()[:6].upper().startswith(('SELECT', 'WITH')):
+        return None
+    # A savepoint keeps a failed EXPLAIN from breaking the request's
+    # transaction. Outside one none is opened: with transaction_mode
+    # IMMEDIATE (as benchmark_endpoints runs SQLite) that would take the
+    # write lock.
+    atomic = transaction.atomic(using=connection.alias) if connection.in_atomic_block else nullcontext()
+    try:
+        with atomic:
+            with connection.cursor() as cursor:
+                cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+                rows = cursor.fetchall()
+    except DatabaseError:
+        return None
+    # SQLite rows are (id, parent, notused, detail); others one column.
+    return [str(row[-1]) for row in rows]
+
+
+class SlowQueryLog:
+    """Appends one JSON line per slow statement to a size-rotated file."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._logger = None
+        self._path = None
+
+    def _get_logger(self, options):
+        path = Path(options['LOG_FILE'])
+        with self._lock:
+            if self._logger is None or self._path != path:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                logger = logging.getLogger('monitoring.slow_queries')
+                logger.setLevel(logging.INFO)
+                logger.propagate = False
+                for handler in list(logger.handlers):
+                    logger.removeHandler(handler)
+                    handler.close()
+                handler = RotatingFileHandler(
+                    path, maxBytes=options['MAX_BYTES'], backupCount=options['BACKUP_COUNT'], encoding='utf-8', delay=True
+                )
+                handler.setFormatter(logging.Formatter('%(message)s'))
+                logger.addHandler(handler)
+                self._logger, self._path = logger, path
+            return self._logger
+
+    def record(self, connection, sql, params, many, duration, view_name, options=None):
+        options = options or get_slow_query_settings()
+        plan = explain(connection, sql, params) if options['EXPLAIN'] and not many else None
+        entry = {
+            'timestamp': timezone.now().isoformat(),
+            'view': view_name,
+            'alias': connection.alias,
+            'duration_ms': round(duration * 1000, 2),
+            'sql': sql[:options['MAX_SQL_LENGTH']],
+            'params': params_shape(params, many),
+            'plan': plan,
+            'full_scans': sorted({match.group(1) for line in plan or () for match in FULL_SCAN_RE.finditer(line)}),
+        }
+        self._get_logger(options).info(json.dumps(entry, separators=(',', ':'), default=str))
+        return entry
+
+
+slow_query_log = SlowQueryLog()
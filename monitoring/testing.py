@@ -0,0 +1,122 @@
+import re
+from collections import Counter
+
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections, transaction
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+BUDGET_SIZES = (1, 10, 100)
+
+LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+IN_LIST_RE = re.compile(r'IN \((?:\?, )*\?\)')
+
+
+def normalize_sql(sql):
+    """The shape of a statement: literals become ? and IN lists collapse."""
+    return IN_LIST_RE.sub('IN (...)', LITERAL_RE.sub('?', sql))
+
+
+def describe_query_growth(small_size, small, large_size, large):
+    """Failure message naming the statements the larger run added."""
+    added = Counter(normalize_sql(query['sql']) for query in large)
+    added.subtract(normalize_sql(query['sql']) for query in small)
+    lines = [
+        f"{len(small)} queries with {small_size} rows, {len(large)} with {large_size}.",
+        "Statements added:",
+    ]
+    lines.extend(f"  {count}x {sql}" for sql, count in added.most_common() if count > 0)
+    lines.append(f"All queries with {large_size} rows:")
+    lines.extend(f"  {number}. {query['sql']}" for number, query in enumerate(large, 1))
+    return '\n'.join(lines)
+
+
+def per_row_scans(connection, sql):
+    """
+    The SCAN steps SQLite runs once per outer row of `sql`: those inside a
+    correlated subquery, e.g. a full-text MATCH or a table scan repeated for
+    every row returned. Index lookups (SEARCH) are fine. Empty for other
+    databases and statements that are not SELECTs.
+    """
+    if connection.vendor != 'sqlite' or not sql.lstrip()[:6].upper().startswith(('SELECT', 'WITH')):
+        return []
+    try:
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                rows = cursor.fetchall()
+    except DatabaseError:
+        return []
+
+    correlated = set()
+    scans = []
+    for node, parent, _, detail in rows:
+        if detail.startswith('CORRELATED') or parent in correlated:
+            correlated.add(node)
+            if detail.startswith('SCAN') and detail != 'SCAN CONSTANT ROW' and parent in correlated:
+                scans.append(detail)
+    return scans
+
+
+class QueryBudgetMixin:
+    """
+    assertConstantQueries() catches N+1 patterns: a request whose query
+    count grows with the number of related rows, or whose SQL makes the
+    database repeat a scan for every row (see per_row_scans).
+    """
+
+    def assertConstantQueries(self, grow, request, sizes=BUDGET_SIZES, using=DEFAULT_DB_ALIAS):
+        """
+        For each size, `grow(size)` brings the data to that size and
+        `request()` runs twice: once to fill per-process caches, then
+        measured. Fails with the added SQL when a count differs from the
+        first size's, and when a statement of the last run scans per row.
+        `request()` returning a response with a 4xx/5xx status fails too, a
+        budget met by an error page proves nothing. Returns the last
+        response.
+        """
+        runs = []
+        for size in sizes:
+            grow(size)
+            self._check_response(request(), size)
+            with CaptureQueriesContext(connections[using]) as context:
+                response = request()
+            self._check_response(response, size)
+            runs.append((size, context.captured_queries, response))
+
+        first_size, first_queries, _ = runs[0]
+        for size, queries, _ in runs[1:]:
+            if len(queries) != len(first_queries):
+                self.fail(describe_query_growth(first_size, first_queries, size, queries))
+        self.assertNoPerRowScans(runs[-1][1], using=using)
+        return runs[-1][2]
+
+    def assertNoPerRowScans(self, queries, using=DEFAULT_DB_ALIAS):
+        """Fails naming the statement when a captured query scans once per row."""
+        connection = connections[using]
+        for query in queries:
+            scans = per_row_scans(connection, query['sql'])
+            if scans:
+                self.fail(f"Per-row {', '.join(scans)} in:\n  {query['sql']}")
+
+    def _check_response(self, response, size):
+        status_code = getattr(response, 'status_code', None)
+        if status_code is not None and status_code >= 400:
+            content = b''.join(response.streaming_content) if response.streaming else response.content
+            self.fail(f"Request failed with {status_code} at size {size}: {content[:500]!r}")
+
+
+@override_settings(
+    # Rows are written at once instead of from a timer thread.
+    ACTIVITY_LOG_WRITER={'BUFFERED': False},
+    REQUEST_INSTRUMENTATION={'LOG': False},
+    SLOW_QUERY_LOG={'ENABLED': False},
+    PROFILING={'ENABLED': False},
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'memberships': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'memberships'},
+    },
+)
+class QueryBudgetTestCase(QueryBudgetMixin, APITestCase):
+    pass
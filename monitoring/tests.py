@@ -0,0 +1,308 @@
+import json
+import re
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from django.db import connection
+from django.db.models import OuterRef, Subquery
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework.views import APIView
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from companies.models import Company
+from teams.models import Membership, Team
+from teams.views import TeamViewSet
+from users.models import User
+from users.views import LoginView
+from .benchmark import compare, percentile
+from .instrumentation import QueryStats, resolve_view_name
+from .metrics import Registry
+from .profiling import ProfilingMixin, _lock
+from .testing import QueryBudgetTestCase, normalize_sql
+
+
+class NormalizeSqlTests(SimpleTestCase):
+    def test_literals_and_in_lists_collapse(self):
+        sql = """SELECT * FROM t WHERE a = 'it''s' AND b = 12.5 AND c IN (1, 2, 3) LIMIT 10"""
+
+        self.assertEqual(normalize_sql(sql), 'SELECT * FROM t WHERE a = ? AND b = ? AND c IN (...) LIMIT ?')
+
+    def test_identifiers_with_digits_are_kept(self):
+        self.assertEqual(normalize_sql('SAVEPOINT "s1_x2"'), 'SAVEPOINT "s1_x2"')
+
+
+class BenchmarkMathTests(SimpleTestCase):
+    def summary(self, p50=100.0, p99=200.0, queries=5.0, errors=0):
+        return {'p50_ms': p50, 'p99_ms': p99, 'queries_per_request': queries, 'errors': errors}
+
+    def test_nearest_rank_percentiles(self):
+        values = list(range(1, 101))
+
+        self.assertEqual([percentile(values, pct) for pct in (0, 1, 50, 95, 99, 100)], [1, 1, 50, 95, 99, 100])
+        self.assertEqual([percentile([3, 7], pct) for pct in (50, 51, 99)], [3, 7, 7])
+        self.assertEqual(percentile([42], 99), 42)
+        self.assertIsNone(percentile([], 50))
+
+    def test_results_within_tolerance_pass(self):
+        baseline = {'tasks.list': self.summary()}
+        results = {'tasks.list': self.summary(p50=150.0, p99=300.0, queries=5.5), 'tasks.new': self.summary(errors=3)}
+
+        self.assertEqual(compare(results, baseline, tolerance=0.5), [])
+
+    def test_regressions_are_flagged(self):
+        baseline = {'tasks.list': self.summary(), 'teams.list': self.summary(errors=2)}
+        results = {
+            'tasks.list': self.summary(p50=150.1, p99=200.0, queries=6.0, errors=1),
+            'teams.list': self.summary(p99=400.0, errors=5),
+        }
+
+        self.assertEqual(compare(results, baseline, tolerance=0.5), [
+            'tasks.list: p50_ms 150.1 > 100.0 (+50%)',
+            'tasks.list: 6.0 queries/request > 5.0',
+            'tasks.list: 1 failed requests',
+            'teams.list: p99_ms 400.0 > 200.0 (+50%)',
+        ])
+
+
+class QueryBudgetTests(QueryBudgetTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='owner@example.com', username='owner', name='Owner', password='pw-12345-x')
+        self.company = Company.objects.create(name='Acme', created_by=self.user)
+
+    def grow_teams(self, count):
+        for index in range(Team.objects.count(), count):
+            Team.objects.create(name=f'Team {index}', company=self.company)
+
+    def test_n_plus_one_fails_with_the_repeated_statement(self):
+        def n_plus_one():
+            return [team.company.name for team in Team.objects.all()]
+
+        with self.assertRaises(self.failureException) as caught:
+            self.assertConstantQueries(self.grow_teams, n_plus_one, sizes=(1, 3))
+
+        message = str(caught.exception)
+        self.assertTrue(message.startswith('2 queries with 1 rows, 4 with 3.'))
+        self.assertIn('  2x SELECT "companies_company"', message)
+        self.assertIn('All queries with 3 rows:', message)
+
+    def test_constant_queries_pass(self):
+        def joined():
+            return [team.company.name for team in Team.objects.select_related('company')]
+
+        self.assertConstantQueries(self.grow_teams, joined)
+
+    def test_per_row_scans_fail(self):
+        def by_name():
+            same_name = Team.objects.filter(name=OuterRef('name')).values('pk')[:1]
+            return list(Team.objects.annotate(twin=Subquery(same_name)))
+
+        with self.assertRaises(self.failureException) as caught:
+            self.assertConstantQueries(self.grow_teams, by_name, sizes=(1, 3))
+
+        self.assertTrue(str(caught.exception).startswith('Per-row SCAN U0 in:'))
+
+    def test_correlated_index_lookups_pass(self):
+        def with_company():
+            company = Company.objects.filter(pk=OuterRef('company_id')).values('name')[:1]
+            return list(Team.objects.annotate(company_name=Subquery(company)))
+
+        self.assertConstantQueries(self.grow_teams, with_company, sizes=(1, 3))
+
+    def test_error_responses_fail(self):
+        with self.assertRaises(self.failureException) as caught:
+            self.assertConstantQueries(self.grow_teams, lambda: self.client.get('/api/teams/'), sizes=(1,))
+
+        self.assertIn('Request failed with 401 at size 1', str(caught.exception))
+
+
+@override_settings(SLOW_QUERY_LOG={'ENABLED': False})
+class QueryStatsTests(TestCase):
+    def test_counts_duplicates_and_repeats(self):
+        stats = QueryStats()
+        with connection.execute_wrapper(stats), connection.cursor() as cursor:
+            for value in (1, 1, 2):
+                cursor.execute('SELECT %s', [value])
+            cursor.execute('SELECT 1 + 1')
+
+        self.assertEqual(stats.count, 4)
+        self.assertEqual(stats.duplicates, 1)
+        self.assertEqual(stats.similar, 2)
+        self.assertGreater(stats.duration, 0)
+
+    def test_failed_statements_are_counted(self):
+        stats = QueryStats()
+        with self.assertRaises(Exception), connection.execute_wrapper(stats), connection.cursor() as cursor:
+            cursor.execute('SELECT * FROM no_such_table')
+
+        self.assertEqual(stats.count, 1)
+
+    def test_view_names(self):
+        self.assertEqual(resolve_view_name(TeamViewSet.as_view({'get': 'list'}), 'GET'), 'TeamViewSet.list')
+        self.assertEqual(resolve_view_name(LoginView.as_view(), 'POST'), 'LoginView.post')
+        self.assertEqual(resolve_view_name(resolve_view_name, 'GET'), 'resolve_view_name')
+
+
+class InstrumentationTests(QueryBudgetTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='staff@example.com', username='staff', name='Staff', password='pw-12345-x')
+        company = Company.objects.create(name='Acme', created_by=self.user)
+        self.team = Team.objects.create(name='Core', company=company)
+        Membership.objects.create(user=self.user, team=self.team, role=Membership.ROLE_ADMIN)
+        self.client.force_authenticate(self.user)
+
+    def test_server_timing_counts_queries(self):
+        response = self.client.get('/api/teams/')
+
+        match = re.search(r'db;dur=[\d.]+;desc="(\d+) queries"', response['Server-Timing'])
+        self.assertIsNotNone(match)
+        self.assertGreater(int(match.group(1)), 0)
+
+    def test_server_timing_reports_repeats(self):
+        response = self.client.get('/api/teams/')
+
+        self.assertRegex(
+            response['Server-Timing'],
+            r'^db;dur=[\d.]+;desc="\d+ queries", db-dup;desc="\d+ duplicate, \d+ repeated", app;dur=[\d.]+$',
+        )
+
+    @override_settings(REQUEST_INSTRUMENTATION={'LOG': True})
+    def test_each_request_logs_one_json_line(self):
+        with self.assertLogs('monitoring.requests', 'INFO') as logs:
+            response = self.client.get(f'/api/teams/{self.team.pk}/')
+
+        self.assertEqual(len(logs.records), 1)
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual(entry['view'], 'TeamViewSet.retrieve')
+        self.assertEqual((entry['method'], entry['path'], entry['status']), ('GET', f'/api/teams/{self.team.pk}/', 200))
+        self.assertEqual(f'{entry["queries"]} queries', re.search(r'desc="(\d+ queries)"', response['Server-Timing']).group(1))
+        self.assertEqual(set(entry), {'view', 'method', 'path', 'status', 'duration_ms', 'db_ms', 'queries', 'duplicates', 'repeated'})
+
+    @override_settings(REQUEST_INSTRUMENTATION={'SERVER_TIMING': False, 'LOG': False})
+    def test_server_timing_can_be_turned_off(self):
+        self.assertNotIn('Server-Timing', self.client.get('/api/teams/'))
+
+    @override_settings(REQUEST_INSTRUMENTATION={'ENABLED': False, 'LOG': True})
+    def test_disabled_instrumentation_does_nothing(self):
+        with self.assertNoLogs('monitoring.requests'):
+            response = self.client.get('/api/teams/')
+
+        self.assertNotIn('Server-Timing', response)
+        self.assertFalse(hasattr(response.wsgi_request, 'query_stats'))
+
+    @override_settings(METRICS={'TOKEN': 'secret'})
+    def test_metrics_require_the_token(self):
+        self.client.get('/api/teams/')
+        self.client.logout()
+
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('http_requests_total{view="TeamViewSet.list",method="GET",status="200"}', response.content.decode())
+
+    def test_metrics_are_staff_only_without_a_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.client.logout()
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+
+        self.user.is_staff = True
+        self.user.save(update_fields=['is_staff'])
+        access = str(RefreshToken.for_user(self.user).access_token)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION=f'Bearer {access}').status_code, 200)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+    @override_settings(METRICS={'ALLOW_STAFF': False})
+    def test_staff_access_can_be_turned_off(self):
+        self.user.is_staff = True
+        self.user.save(update_fields=['is_staff'])
+
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+
+    def test_metrics_merge_process_snapshots(self):
+        with tempfile.TemporaryDirectory() as directory:
+            workers = [Registry(), Registry()]
+            for worker, amount in zip(workers, (2, 3)):
+                worker.counter('jobs_total', 'Jobs.', ('kind',)).inc(amount, kind='a')
+                worker.write_snapshot(directory)
+
+            self.assertIn('jobs_total{kind="a"} 5', workers[0].render(directory))
+
+    def test_snapshots_of_exited_processes_are_pruned(self):
+        exited = subprocess.Popen([sys.executable, '-c', ''])
+        exited.wait()
+        with tempfile.TemporaryDirectory() as directory:
+            worker = Registry()
+            worker.counter('jobs_total', 'Jobs.', ('kind',)).inc(2, kind='a')
+            worker.write_snapshot(directory)
+            dead = Path(directory) / f'{exited.pid}-0000abcd.json'
+            dead.write_text(json.dumps(worker.snapshot()), encoding='utf-8')
+            scraper = Registry()
+            scraper.counter('jobs_total', 'Jobs.', ('kind',))
+
+            self.assertIn('jobs_total{kind="a"} 2', scraper.render(directory))
+            self.assertFalse(dead.exists())
+
+    def test_slow_queries_are_logged_with_their_plan(self):
+        with tempfile.TemporaryDirectory() as directory:
+            log_file = Path(directory) / 'slow.log'
+            with override_settings(SLOW_QUERY_LOG={'ENABLED': True, 'THRESHOLD_MS': 0, 'LOG_FILE': log_file}):
+                self.client.get('/api/teams/')
+
+            entries = [json.loads(line) for line in log_file.read_text(encoding='utf-8').splitlines()]
+        selects = [entry for entry in entries if entry['sql'].startswith('SELECT')]
+        self.assertTrue(selects)
+        self.assertEqual(selects[0]['view'], 'TeamViewSet.list')
+        self.assertTrue(selects[0]['plan'])
+
+    def test_profile_header_is_honoured_for_staff_only(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(PROFILING={'ENABLED': True, 'OUTPUT_DIR': directory}):
+                response = self.client.get('/api/teams/', HTTP_X_PROFILE='1')
+                self.assertNotIn('X-Profile-Id', response)
+
+                self.user.is_staff = True
+                self.user.save(update_fields=['is_staff'])
+                response = self.client.get('/api/teams/', HTTP_X_PROFILE='1')
+
+            capture_id = response['X-Profile-Id']
+            summary = (Path(directory) / f'{capture_id}.txt').read_text(encoding='utf-8')
+            self.assertTrue((Path(directory) / f'{capture_id}.prof').exists())
+        self.assertIn('view: TeamViewSet.list', summary)
+        self.assertIn('trigger: header', summary)
+
+
+class ExplodingView(ProfilingMixin, APIView):
+    permission_classes = []
+
+    def get(self, request):
+        if request.query_params.get('explode'):
+            raise RuntimeError('boom')
+        return Response({})
+
+
+class ProfilingTests(QueryBudgetTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='staff@example.com', username='staff', name='Staff', password='pw-12345-x', is_staff=True)
+        self.directory = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        self.enterContext(override_settings(PROFILING={'ENABLED': True, 'OUTPUT_DIR': self.directory}))
+
+    def get(self, path):
+        request = APIRequestFactory().get(path, HTTP_X_PROFILE='1')
+        force_authenticate(request, self.user)
+        return ExplodingView.as_view()(request)
+
+    def test_unhandled_exceptions_release_the_profiler(self):
+        with self.assertRaisesMessage(RuntimeError, 'boom'):
+            self.get('/?explode=1')
+
+        self.assertFalse(_lock.locked())
+        self.assertIsNone(sys.getprofile())
+        response = self.get('/')
+
+        self.assertIn('X-Profile-Id', response)
+        self.assertEqual(len(list(self.directory.glob('*.prof'))), 1)
@@ -0,0 +1,36 @@
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .metrics import get_metrics_settings, registry
+
+
+def is_staff_request(request):
+    """Staff users signed in to the admin or sending an API (JWT) token."""
+    if request.user.is_authenticated:
+        return request.user.is_staff
+    api_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    try:
+        user = api_request.user
+    except APIException:
+        return False
+    return bool(user and user.is_staff)
+
+
+def can_read_metrics(request):
+    options = get_metrics_settings()
+    token = options['TOKEN']
+    if token and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return True
+    return options['ALLOW_STAFF'] and is_staff_request(request)
+
+
+@require_GET
+def metrics(request):
+    """The metrics of every worker process in the Prometheus text format."""
+    if not can_read_metrics(request):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,125 @@
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+
+from monitoring.metrics import ACTIVITY_LOG_WRITES
+from .models import ActivityLog
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'BUFFERED': True,
+    'BATCH_SIZE': 200,
+    'FLUSH_INTERVAL': 2.0,
+}
+
+
+def get_writer_settings():
+    return {**DEFAULTS, **getattr(settings, 'ACTIVITY_LOG_WRITER', {})}
+
+
+class ActivityLogWriter:
+    """
+    Collects ActivityLog rows per process and writes them with bulk_create
+    once BATCH_SIZE rows are waiting or the oldest one is FLUSH_INTERVAL
+    seconds old. Rows recorded inside a transaction are only queued once it
+    commits, so a rolled back request leaves no log behind.
+
+    With BUFFERED off every row is saved immediately, which is what the
+    test suite relies on.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._oldest = None
+        self._timer = None
+
+    def record(self, **fields):
+        entry = ActivityLog(**fields)
+        options = get_writer_settings()
+
+        if not options['BUFFERED']:
+            entry.save()
+            ACTIVITY_LOG_WRITES.inc(source='writer')
+            return entry
+
+        if connection.in_atomic_block:
+            transaction.on_commit(lambda: self._enqueue(entry, options))
+        else:
+            self._enqueue(entry, options)
+        return entry
+
+    def pending(self):
+        with self._lock:
+            return len(self._buffer)
+
+    def flush(self):
+        with self._lock:
+            entries, self._buffer = self._buffer, []
+            timer, self._timer = self._timer, None
+            self._oldest = None
+
+        if timer is not None:
+            timer.cancel()
+        if not entries:
+            return 0
+
+        try:
+            ActivityLog.objects.bulk_create(entries, batch_size=get_writer_settings()['BATCH_SIZE'])
+            ACTIVITY_LOG_WRITES.inc(len(entries), source='writer')
+        except DatabaseError:
+            # One bad row (e.g. a task deleted before the flush) must not
+            # cost the whole batch, retry the rows one at a time.
+            logger.exception("Bulk write of %d activity log entries failed, retrying one by one.", len(entries))
+            for entry in entries:
+                try:
+                    entry.save()
+                    ACTIVITY_LOG_WRITES.inc(source='writer')
+                except DatabaseError:
+                    logger.exception("Dropping activity log entry %r.", entry.action)
+        return len(entries)
+
+    def _enqueue(self, entry, options):
+        with self._lock:
+            self._buffer.append(entry)
+            now = time.monotonic()
+            if self._oldest is None:
+                self._oldest = now
+
+            due = (
+                len(self._buffer) >= options['BATCH_SIZE']
+                or now - self._oldest >= options['FLUSH_INTERVAL']
+            )
+            if not due and self._timer is None:
+                self._timer = threading.Timer(options['FLUSH_INTERVAL'], self._flush_from_timer)
+                self._timer.daemon = True
+                self._timer.start()
+
+        if due:
+            self.flush()
+
+    def _flush_from_timer(self):
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush()
+        finally:
+            # The timer thread has its own connection; do not leak it.
+            connection.close()
+
+
+writer = ActivityLogWriter()
+atexit.register(writer.flush)
+
+
+def record_activity(**fields):
+    return writer.record(**fields)
+
+
+def flush_activity():
+    return writer.flush()
@@ -0,0 +1,244 @@
+import gzip
+import json
+import os
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import timedelta, timezone as dt_timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import ActivityLog
+
+DEFAULTS = {
+    'HOT_DAYS': 90,
+    'ARCHIVE_DIR': Path(settings.BASE_DIR) / 'archive' / 'activity_logs',
+    'CHUNK_SIZE': 500,
+}
+
+ARCHIVE_FIELDS = ('id', 'action', 'performed_by_id', 'team_id', 'task_id', 'target_user_id', 'timestamp', 'details')
+NO_TEAM_DIR = '_no_team'
+MANIFEST_NAME = 'manifest.json'
+
+
+class ArchiveLocked(Exception):
+    pass
+
+
+def get_retention_settings():
+    return {**DEFAULTS, **getattr(settings, 'ACTIVITY_LOG_RETENTION', {})}
+
+
+def hot_window_start(hot_days=None, now=None):
+    if hot_days is None:
+        hot_days = get_retention_settings()['HOT_DAYS']
+    return (now or timezone.now()) - timedelta(days=hot_days)
+
+
+def segment_path(archive_dir, team_id, timestamp):
+    """One append-only segment per team per month, e.g. <team>/2025-11.ndjson.gz"""
+    timestamp = timestamp.astimezone(dt_timezone.utc)
+    team_dir = str(team_id) if team_id else NO_TEAM_DIR
+    return Path(archive_dir) / team_dir / f'{timestamp:%Y-%m}.ndjson.gz'
+
+
+@contextmanager
+def archive_lock(archive_dir):
+    archive_dir = Path(archive_dir)
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    lock_path = archive_dir / '.lock'
+    try:
+        fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        raise ArchiveLocked(f"Another archiver holds {lock_path}. Remove it if no archiver is running.")
+    try:
+        os.write(fd, str(os.getpid()).encode())
+        yield
+    finally:
+        os.close(fd)
+        os.unlink(lock_path)
+
+
+def read_manifest(archive_dir):
+    """
+    How far archiving got, None before the first chunk: `last` is the
+    (timestamp, id) of the newest entry archived so far in archive order,
+    `max_id` the highest id archived. The manifest is rewritten after a chunk
+    is fsynced and before its rows are deleted.
+    """
+    try:
+        manifest = json.loads((Path(archive_dir) / MANIFEST_NAME).read_text(encoding='utf-8'))
+    except FileNotFoundError:
+        return None
+    return {
+        'archived_before': parse_datetime(manifest['archived_before']),
+        'last': (parse_datetime(manifest['last_timestamp']), manifest['last_id']),
+        'max_id': manifest['max_id'],
+    }
+
+
+def _write_manifest(archive_dir, manifest):
+    path = Path(archive_dir) / MANIFEST_NAME
+    temp = path.with_suffix('.tmp')
+    temp.write_text(json.dumps({
+        'archived_before': manifest['archived_before'].isoformat(),
+        'last_timestamp': manifest['last'][0].isoformat(),
+        'last_id': manifest['last'][1],
+        'max_id': manifest['max_id'],
+    }), encoding='utf-8')
+    os.replace(temp, path)
+
+
+def _serialize_row(row):
+    return {
+        **row,
+        'performed_by_id': str(row['performed_by_id']),
+        'team_id': str(row['team_id']) if row['team_id'] else None,
+        'task_id': str(row['task_id']) if row['task_id'] else None,
+        'target_user_id': str(row['target_user_id']) if row['target_user_id'] else None,
+        'timestamp': row['timestamp'].isoformat(),
+    }
+
+
+def _append_segment(path, rows):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Appending opens a new gzip member; readers see one continuous stream.
+    with open(path, 'ab') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='ab') as segment:
+            for row in rows:
+                segment.write(json.dumps(_serialize_row(row), separators=(',', ':')).encode('utf-8'))
+                segment.write(b'\n')
+        raw.flush()
+        os.fsync(raw.fileno())
+
+
+def archive_activity_logs(before=None, chunk_size=None, archive_dir=None, dry_run=False):
+    """
+    Move ActivityLog rows older than `before` (default: the hot window start)
+    into compressed NDJSON segments, oldest first, one chunk at a time.
+
+    Each chunk is appended and fsynced before its rows are deleted in a short
+    transaction of its own, so no long write lock is held. A crash between
+    the two steps can leave a row both archived and in the table; readers
+    skip such duplicates using the manifest.
+    """
+    options = get_retention_settings()
+    before = before or hot_window_start(options['HOT_DAYS'])
+    chunk_size = chunk_size or options['CHUNK_SIZE']
+    archive_dir = Path(archive_dir or options['ARCHIVE_DIR'])
+
+    expired = ActivityLog.objects.filter(timestamp__lt=before)
+    if dry_run:
+        return {'archived': expired.count(), 'segments': 0}
+
+    archived = 0
+    segments = set()
+    with archive_lock(archive_dir):
+        manifest = read_manifest(archive_dir)
+        while True:
+            rows = list(expired.order_by('timestamp', 'id').values(*ARCHIVE_FIELDS)[:chunk_size])
+            if not rows:
+                break
+
+            grouped = defaultdict(list)
+            for row in rows:
+                grouped[segment_path(archive_dir, row['team_id'], row['timestamp'])].append(row)
+            for path, segment_rows in grouped.items():
+                _append_segment(path, segment_rows)
+                segments.add(path)
+
+            # A run given an earlier cutoff than a previous one must not
+            # shrink what the manifest covers.
+            last = (rows[-1]['timestamp'], rows[-1]['id'])
+            max_id = max(row['id'] for row in rows)
+            if manifest is not None:
+                last = max(last, manifest['last'])
+                max_id = max(max_id, manifest['max_id'])
+                before_recorded = max(before, manifest['archived_before'])
+            else:
+                before_recorded = before
+            manifest = {'archived_before': before_recorded, 'last': last, 'max_id': max_id}
+            _write_manifest(archive_dir, manifest)
+
+            with transaction.atomic():
+                ActivityLog.objects.filter(id__in=[row['id'] for row in rows]).delete()
+            archived += len(rows)
+
+    return {'archived': archived, 'segments': len(segments)}
+
+
+def _months_between(since, until):
+    if since is None:
+        return None
+    since = since.astimezone(dt_timezone.utc)
+    until = (until or timezone.now()).astimezone(dt_timezone.utc)
+    months = set()
+    year, month = since.year, since.month
+    while (year, month) <= (until.year, until.month):
+        months.add(f'{year:04d}-{month:02d}')
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def iter_archived_activity(team_id, since=None, until=None, archive_dir=None):
+    """Stream archived entries of one team in chronological order as dicts."""
+    archive_dir = Path(archive_dir or get_retention_settings()['ARCHIVE_DIR'])
+    team_dir = archive_dir / (str(team_id) if team_id else NO_TEAM_DIR)
+    if not team_dir.is_dir():
+        return
+
+    wanted_months = _months_between(since, until)
+    for path in sorted(team_dir.glob('*.ndjson.gz')):
+        month = path.name.split('.', 1)[0]
+        if wanted_months is not None and month not in wanted_months:
+            continue
+
+        seen = set()
+        with gzip.open(path, 'rt', encoding='utf-8') as segment:
+            for line in segment:
+                entry = json.loads(line)
+                if entry['id'] in seen:
+                    continue
+                seen.add(entry['id'])
+
+                timestamp = parse_datetime(entry['timestamp'])
+                if since and timestamp < since:
+                    continue
+                if until and timestamp >= until:
+                    continue
+                yield entry
+
+
+def iter_team_activity(team_id, since=None, until=None, archive_dir=None):
+    """
+    Audit read path: archived entries first when `since` reaches back to
+    what the manifest says was archived, then the rows still in the table,
+    all in chronological order.
+
+    A row both archived and still in the table (a crash between the append
+    and the delete) lies at or before the manifest's `last` position with an
+    id no higher than its `max_id`; such rows are skipped instead of
+    remembering every archived id.
+    """
+    archive_dir = Path(archive_dir or get_retention_settings()['ARCHIVE_DIR'])
+    manifest = read_manifest(archive_dir)
+    archived = None
+    # Without a manifest (segments from before it existed) the archive is
+    # read whenever it has segments in range, and nothing is deduplicated.
+    if manifest is None or since is None or since <= manifest['last'][0]:
+        yield from iter_archived_activity(team_id, since, until, archive_dir)
+        archived = manifest
+
+    hot = ActivityLog.objects.filter(team_id=team_id)
+    if since:
+        hot = hot.filter(timestamp__gte=since)
+    if until:
+        hot = hot.filter(timestamp__lt=until)
+
+    for row in hot.order_by('timestamp', 'id').values(*ARCHIVE_FIELDS).iterator(chunk_size=2000):
+        if archived is not None and (row['timestamp'], row['id']) <= archived['last'] and row['id'] <= archived['max_id']:
+            continue
+        yield _serialize_row(row)
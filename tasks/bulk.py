@@ -0,0 +1,59 @@
+from collections import Counter
+
+from django.db import transaction
+from django.utils import timezone
+
+from monitoring.metrics import ACTIVITY_LOG_WRITES
+from teams.versions import bump_team_versions
+from .models import ActivityLog, Task
+from .stats import apply_stat_deltas, stats_key
+
+BULK_UPDATE_CHUNK_SIZE = 500
+
+
+def bulk_update_tasks(queryset, user, changes, delete=False, chunk_size=BULK_UPDATE_CHUNK_SIZE):
+    """
+    Apply `changes` (field -> value) or a soft delete to every task in
+    `queryset` with set-based UPDATEs of `chunk_size` ids each, instead of
+    loading and saving the tasks one by one. Status changes get their
+    task_status_changed entries in one bulk insert. Returns the number of
+    tasks touched.
+
+    Model signals do not fire, so everything they would do happens here.
+    """
+    now = timezone.now()
+    if delete:
+        values = {'is_deleted': True, 'deleted_at': now}
+    else:
+        values = dict(changes)
+    # update() does not apply auto_now.
+    values['updated_at'] = now
+
+    with transaction.atomic():
+        rows = list(queryset.order_by().select_for_update().values_list('id', 'team_id', 'status'))
+        for start in range(0, len(rows), chunk_size):
+            Task.objects.filter(id__in=[task_id for task_id, _, _ in rows[start:start + chunk_size]]).update(**values)
+
+        new_status = None if delete else changes.get('status')
+        if new_status is not None:
+            logs = ActivityLog.objects.bulk_create([
+                ActivityLog(
+                    action='task_status_changed',
+                    performed_by=user,
+                    team_id=team_id,
+                    task_id=task_id,
+                    details={'old': old_status, 'new': new_status},
+                )
+                for task_id, team_id, old_status in rows
+                if old_status != new_status
+            ], batch_size=chunk_size)
+            ACTIVITY_LOG_WRITES.inc(len(logs), source='bulk_update')
+
+        deltas = Counter()
+        for _, team_id, old_status in rows:
+            deltas[stats_key(team_id, old_status, False)] -= 1
+            deltas[stats_key(team_id, new_status or old_status, delete)] += 1
+        apply_stat_deltas(deltas)
+        bump_team_versions({team_id for _, team_id, _ in rows})
+
+    return len(rows)
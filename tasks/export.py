@@ -0,0 +1,90 @@
+import csv
+from collections import defaultdict
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Task
+
+# (column, queryset lookup) pairs. Only plain columns and to-one joins so a
+# row is one tuple from values_list(); `assigned_to` (lookup None) lists the
+# emails of assigned_members, loaded with one query per chunk of rows.
+EXPORT_COLUMNS = (
+    ('id', 'id'),
+    ('title', 'title'),
+    ('description', 'description'),
+    ('status', 'status'),
+    ('due_date', 'due_date'),
+    ('team_id', 'team_id'),
+    ('team', 'team__name'),
+    ('created_by', 'created_by__user__email'),
+    ('assigned_to', None),
+    ('created_at', 'created_at'),
+    ('updated_at', 'updated_at'),
+)
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+EXPORT_CHUNK_SIZE = 2000
+
+
+class _Echo:
+    """File-like object that hands back what csv.writer writes to it."""
+
+    def write(self, value):
+        return value
+
+
+def _assignee_emails(task_ids):
+    emails = defaultdict(list)
+    rows = (
+        Task.assigned_members.through.objects
+        .filter(task_id__in=task_ids)
+        .order_by('membership__user__email')
+        .values_list('task_id', 'membership__user__email')
+    )
+    for task_id, email in rows:
+        emails[task_id].append(email)
+    return emails
+
+
+def _export_rows(queryset, chunk_size):
+    lookups = [lookup for _, lookup in EXPORT_COLUMNS]
+    position = lookups.index(None)
+    rows = queryset.values_list(*(lookup for lookup in lookups if lookup is not None)).iterator(chunk_size=chunk_size)
+    while chunk := list(islice(rows, chunk_size)):
+        # `id` is the first column.
+        assignees = _assignee_emails([row[0] for row in chunk])
+        for row in chunk:
+            yield row[:position] + (assignees.get(row[0], []),) + row[position:]
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, list):
+        return ';'.join(value)
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def iter_csv(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    writer = csv.writer(_Echo())
+    yield writer.writerow([column for column, _ in EXPORT_COLUMNS])
+    for row in _export_rows(queryset, chunk_size):
+        yield writer.writerow([_cell(value) for value in row])
+
+
+def iter_ndjson(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    columns = [column for column, _ in EXPORT_COLUMNS]
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    for row in _export_rows(queryset, chunk_size):
+        yield encoder.encode(dict(zip(columns, row))) + '\n'
+
+
+def iter_export(queryset, export_format, chunk_size=EXPORT_CHUNK_SIZE):
+    if export_format == 'ndjson':
+        return iter_ndjson(queryset, chunk_size)
+    return iter_csv(queryset, chunk_size)
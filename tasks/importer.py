@@ -0,0 +1,216 @@
+import json
+import logging
+from collections import Counter
+
+from django.db import DatabaseError, transaction
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+from monitoring.metrics import ACTIVITY_LOG_WRITES
+from teams.models import Membership
+from teams.versions import bump_team_versions
+from .models import ActivityLog, Task
+from .serializers import TaskImportSerializer
+from .stats import apply_stat_deltas
+
+logger = logging.getLogger(__name__)
+
+IMPORT_BATCH_SIZE = 500
+READ_CHUNK_SIZE = 1 << 16
+# Between records: whitespace (NDJSON) or the brackets and commas of an array.
+_RECORD_SEPARATORS = ' \t\r\n[],'
+
+
+class ImportFormatError(Exception):
+    pass
+
+
+def _may_continue(error, buffer):
+    """
+    Whether `error` can come from a record that continues past the end of
+    `buffer`; any other error is reported without reading further.
+    """
+    if error.msg.startswith('Unterminated string'):
+        return True
+    # Otherwise a cut-off record fails within its last token: a literal
+    # (`tru`), a number (`2.`, `1e-`) or a \\uXXXX escape, at most 6 characters.
+    return error.pos > len(buffer) - 6
+
+
+def iter_json_records(stream, chunk_size=READ_CHUNK_SIZE):
+    """
+    Yield the records of a JSON array, a single JSON object or NDJSON read
+    from a text stream, holding at most one chunk plus one record in memory.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    eof = False
+    while True:
+        buffer = buffer.lstrip(_RECORD_SEPARATORS)
+        if buffer:
+            try:
+                record, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError as exc:
+                if eof or not _may_continue(exc, buffer):
+                    raise ImportFormatError(f"Invalid JSON: {exc.msg}") from exc
+            else:
+                yield record
+                buffer = buffer[end:]
+                continue
+        elif eof:
+            return
+
+        # Empty buffer or a record cut off at the end of the chunk.
+        chunk = stream.read(chunk_size)
+        eof = not chunk
+        buffer += chunk
+
+
+class TaskImporter:
+    """
+    Creates tasks for `user` in batches. Each batch is validated row by row,
+    resolves every team/membership it references with one query and is
+    written with bulk_create for tasks, assignments and activity log entries.
+    Invalid rows are reported by their index and do not stop the batch.
+
+    Bypasses model signals, so team versions and task stats are updated
+    here and the task_created / task_assigned entries are written directly.
+    """
+
+    def __init__(self, user, batch_size=IMPORT_BATCH_SIZE):
+        self.user = user
+        self.batch_size = batch_size
+
+    def run(self, records):
+        """Import an iterable of records, yielding one result per batch."""
+        batch = []
+        for index, record in enumerate(records):
+            batch.append((index, record))
+            if len(batch) >= self.batch_size:
+                yield self.import_batch(batch)
+                batch = []
+        if batch:
+            yield self.import_batch(batch)
+
+    def import_batch(self, rows):
+        errors = []
+        valid = []
+        for index, record in rows:
+            serializer = TaskImportSerializer(data=record) if isinstance(record, dict) else None
+            if serializer is None:
+                errors.append({'index': index, 'errors': {'non_field_errors': ["Expected an object."]}})
+            elif serializer.is_valid():
+                valid.append((index, serializer.validated_data))
+            else:
+                errors.append({'index': index, 'errors': serializer.errors})
+
+        lookup = self._resolve_memberships([data for _, data in valid])
+        pending = []
+        for index, data in valid:
+            try:
+                pending.append((index, *self._build(data, lookup)))
+            except ValidationError as exc:
+                errors.append({'index': index, 'errors': exc.detail})
+
+        created = self._write(pending, errors)
+        errors.sort(key=lambda error: error['index'])
+        return {'created': created, 'errors': errors}
+
+    def _resolve_memberships(self, rows):
+        team_ids = {data['team'] for data in rows}
+        emails = {data['assigned_to'] for data in rows if isinstance(data['assigned_to'], str)}
+        membership_ids = {data['assigned_to'] for data in rows if data['assigned_to'] and not isinstance(data['assigned_to'], str)}
+
+        lookup = {}
+        if not team_ids:
+            return lookup
+
+        memberships = (
+            Membership.objects
+            .filter(team_id__in=team_ids)
+            .filter(Q(user=self.user) | Q(user__email__in=emails) | Q(id__in=membership_ids))
+            .select_related('user')
+        )
+        for membership in memberships:
+            lookup[('user', membership.team_id, membership.user_id)] = membership
+            lookup[('email', membership.team_id, membership.user.email)] = membership
+            lookup[('id', membership.team_id, membership.id)] = membership
+        return lookup
+
+    def _build(self, data, lookup):
+        team_id = data['team']
+        creator = lookup.get(('user', team_id, self.user.pk))
+        if creator is None:
+            raise ValidationError({'team': ["Team not found or you are not a member of it."]})
+
+        assignee = None
+        if data['assigned_to']:
+            if creator.role != Membership.ROLE_ADMIN:
+                raise ValidationError({'assigned_to': ["Only team admins can assign tasks."]})
+            kind = 'email' if isinstance(data['assigned_to'], str) else 'id'
+            assignee = lookup.get((kind, team_id, data['assigned_to']))
+            if assignee is None:
+                raise ValidationError({'assigned_to': ["Membership not found or does not belong to this team."]})
+
+        task = Task(
+            title=data['title'],
+            description=data['description'],
+            status=data['status'],
+            due_date=data['due_date'],
+            team_id=team_id,
+            created_by=creator,
+        )
+        assignments = []
+        logs = [ActivityLog(
+            action='task_created',
+            performed_by_id=self.user.pk,
+            team_id=team_id,
+            task=task,
+            details={'title': task.title},
+        )]
+        if assignee is not None:
+            assignments.append(Task.assigned_members.through(task_id=task.id, membership_id=assignee.id))
+            logs.append(ActivityLog(
+                action='task_assigned',
+                performed_by_id=self.user.pk,
+                team_id=team_id,
+                task=task,
+                target_user_id=assignee.user_id,
+                details={'assigned_to': str(assignee.user_id)},
+            ))
+        return task, assignments, logs
+
+    def _write(self, pending, errors):
+        if not pending:
+            return []
+
+        try:
+            with transaction.atomic():
+                self._insert(pending)
+            return [task.id for _, task, _, _ in pending]
+        except DatabaseError:
+            # Keep the rows that can be written: retry one by one, each in
+            # its own savepoint.
+            logger.exception("Bulk import of %d tasks failed, retrying one by one.", len(pending))
+
+        created = []
+        for row in pending:
+            index, task = row[0], row[1]
+            try:
+                with transaction.atomic():
+                    self._insert([row])
+                created.append(task.id)
+            except DatabaseError as exc:
+                errors.append({'index': index, 'errors': {'non_field_errors': [str(exc)]}})
+        return created
+
+    def _insert(self, rows):
+        tasks = [task for _, task, _, _ in rows]
+        Task.objects.bulk_create(tasks)
+        Task.assigned_members.through.objects.bulk_create(
+            [assignment for _, _, assignments, _ in rows for assignment in assignments]
+        )
+        entries = ActivityLog.objects.bulk_create([log for _, _, _, logs in rows for log in logs])
+        ACTIVITY_LOG_WRITES.inc(len(entries), source='import')
+        bump_team_versions({task.team_id for task in tasks})
+        apply_stat_deltas(Counter((task.team_id, task.status) for task in tasks))
@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.archive import ArchiveLocked, archive_activity_logs, get_retention_settings, hot_window_start
+
+
+class Command(BaseCommand):
+    help = "Move activity log entries older than the retention horizon into compressed NDJSON segments."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help="Keep this many days in the database (default: ACTIVITY_LOG_RETENTION['HOT_DAYS']).")
+        parser.add_argument('--chunk-size', type=int, help="Rows archived and deleted per transaction.")
+        parser.add_argument('--archive-dir', help="Directory holding the segment files.")
+        parser.add_argument('--dry-run', action='store_true', help="Only report how many entries would be archived.")
+        parser.add_argument('--every', type=int, metavar='SECONDS', help="Keep running and archive again every SECONDS.")
+
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else get_retention_settings()['HOT_DAYS']
+        if days < 0:
+            raise CommandError("--days cannot be negative.")
+
+        while True:
+            self._archive(days, options)
+            if not options['every'] or options['dry_run']:
+                break
+            time.sleep(options['every'])
+
+    def _archive(self, days, options):
+        before = hot_window_start(days)
+        try:
+            result = archive_activity_logs(
+                before=before,
+                chunk_size=options['chunk_size'],
+                archive_dir=options['archive_dir'],
+                dry_run=options['dry_run'],
+            )
+        except ArchiveLocked as exc:
+            raise CommandError(str(exc))
+
+        if options['dry_run']:
+            self.stdout.write(f"{result['archived']} entries older than {before:%Y-%m-%d %H:%M} would be archived.")
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"Archived {result['archived']} entries older than {before:%Y-%m-%d %H:%M} into {result['segments']} segments."
+            ))
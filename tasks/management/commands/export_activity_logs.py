@@ -0,0 +1,31 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from tasks.archive import iter_team_activity
+
+
+class Command(BaseCommand):
+    help = "Stream a team's activity log as NDJSON, reading archived segments when the range reaches past the hot window."
+
+    def add_arguments(self, parser):
+        parser.add_argument('team_id')
+        parser.add_argument('--since', help="ISO 8601 datetime, inclusive.")
+        parser.add_argument('--until', help="ISO 8601 datetime, exclusive.")
+        parser.add_argument('--archive-dir', help="Directory holding the segment files.")
+
+    def handle(self, *args, **options):
+        since = self._parse(options['since'], '--since')
+        until = self._parse(options['until'], '--until')
+
+        for entry in iter_team_activity(options['team_id'], since, until, options['archive_dir']):
+            self.stdout.write(json.dumps(entry, separators=(',', ':')))
+
+    def _parse(self, value, name):
+        if not value:
+            return None
+        parsed = parse_datetime(value)
+        if parsed is None or parsed.tzinfo is None:
+            raise CommandError(f"{name} must be an ISO 8601 datetime with a timezone, e.g. 2025-01-01T00:00:00Z.")
+        return parsed
@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.synthetic import SYNTHETIC_BATCH_SIZE, SYNTHETIC_PASSWORD, SyntheticDataGenerator
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with synthetic users, companies, teams, memberships, tasks and activity history "
+        "for scale testing. A few teams get most members and tasks, the rest stay small."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--companies', type=int, default=10)
+        parser.add_argument('--teams', type=int, default=100)
+        parser.add_argument('--members-per-team', type=int, default=10, help="Average team size.")
+        parser.add_argument('--tasks', type=int, default=100000)
+        parser.add_argument('--admin-ratio', type=float, default=0.1, help="Share of members (besides each team's first) who are admins.")
+        parser.add_argument('--deleted-ratio', type=float, default=0.05, help="Share of tasks that are soft-deleted.")
+        parser.add_argument('--skew', type=float, default=1.2, help="Zipf exponent of team sizes and task counts; 0 makes all teams equal.")
+        parser.add_argument('--days', type=int, default=365, help="Timestamps are spread over this many past days.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=SYNTHETIC_BATCH_SIZE, help="Rows per bulk insert transaction.")
+        parser.add_argument('--prefix', default='synthetic', help="Prefix of the generated emails and usernames.")
+
+    def handle(self, *args, **options):
+        for name in ('users', 'companies', 'teams', 'members_per_team', 'batch_size'):
+            if options[name] < 1:
+                raise CommandError(f"--{name.replace('_', '-')} must be positive.")
+        if options['tasks'] < 0 or options['days'] < 0 or options['skew'] < 0:
+            raise CommandError("--tasks, --days and --skew cannot be negative.")
+        for name in ('admin_ratio', 'deleted_ratio'):
+            if not 0 <= options[name] <= 1:
+                raise CommandError(f"--{name.replace('_', '-')} must be between 0 and 1.")
+
+        generator = SyntheticDataGenerator(
+            users=options['users'], companies=options['companies'], teams=options['teams'],
+            members_per_team=options['members_per_team'], tasks=options['tasks'],
+            admin_ratio=options['admin_ratio'], deleted_ratio=options['deleted_ratio'], skew=options['skew'],
+            days=options['days'], seed=options['seed'], batch_size=options['batch_size'], prefix=options['prefix'],
+            log=self.stdout.write,
+        )
+        start = time.monotonic()
+        counts = generator.run()
+        elapsed = time.monotonic() - start
+
+        total = sum(counts.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Inserted {total} rows in {elapsed:.1f}s ({total / max(elapsed, 1e-9):.0f} rows/s): "
+            + ', '.join(f"{count} {label}" for label, count in counts.items())
+        ))
+        self.stdout.write(f"Every generated user's password is {SYNTHETIC_PASSWORD!r}.")
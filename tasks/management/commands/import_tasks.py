@@ -0,0 +1,46 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.importer import IMPORT_BATCH_SIZE, ImportFormatError, TaskImporter, iter_json_records
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = "Bulk-create tasks from a JSON array or NDJSON file of sample_task_data.json-shaped records."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to read, or - for stdin.")
+        parser.add_argument('--user', required=True, help="Email of the user the tasks are created as. Must be a member of every team.")
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE, help="Records validated and inserted per transaction.")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be positive.")
+        try:
+            user = User.objects.get(email=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user with email {options['user']}.")
+
+        importer = TaskImporter(user, batch_size=options['batch_size'])
+        created = failed = 0
+        try:
+            stream = sys.stdin if options['path'] == '-' else open(options['path'], encoding='utf-8')
+        except OSError as exc:
+            raise CommandError(str(exc))
+
+        try:
+            for result in importer.run(iter_json_records(stream)):
+                created += len(result['created'])
+                failed += len(result['errors'])
+                # Errors are written as they come so memory does not grow with the file.
+                for error in result['errors']:
+                    self.stderr.write(json.dumps(error, default=str))
+        except ImportFormatError as exc:
+            raise CommandError(f"{exc} (after {created + failed} records, {created} imported).")
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        self.stdout.write(self.style.SUCCESS(f"Imported {created} tasks, {failed} rejected."))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from tasks.search import rebuild_search_index, search_index_available
+
+
+class Command(BaseCommand):
+    help = "Repopulate the full-text search index for task titles and descriptions."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        using = options['database']
+        if not search_index_available(using):
+            raise CommandError("The task search index does not exist on this database. Run migrate on SQLite with FTS5.")
+
+        with transaction.atomic(using=using):
+            indexed = rebuild_search_index(using)
+
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} tasks."))
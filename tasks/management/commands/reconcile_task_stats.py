@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.stats import RECONCILE_BATCH_SIZE, reconcile_task_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute every team's task counters from the tasks table and repair the ones that drifted."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=RECONCILE_BATCH_SIZE, help="Teams recomputed per transaction.")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be positive.")
+
+        result = reconcile_task_stats(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {result['checked']} teams, repaired {result['repaired']}."
+        ))
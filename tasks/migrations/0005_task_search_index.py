@@ -0,0 +1,86 @@
+from django.db import migrations
+
+
+FORWARD_SQL = [
+    "CREATE VIRTUAL TABLE tasks_task_fts USING fts5("
+    "title, description, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4')",
+    "CREATE TABLE tasks_task_fts_doc ("
+    "docid INTEGER PRIMARY KEY, task_id char(32) NOT NULL UNIQUE)",
+    """
+    CREATE TRIGGER tasks_task_fts_insert AFTER INSERT ON tasks_task
+    WHEN new.is_deleted = 0
+    BEGIN
+        INSERT INTO tasks_task_fts_doc (task_id) VALUES (new.id);
+        INSERT INTO tasks_task_fts (rowid, title, description)
+            SELECT docid, new.title, new.description FROM tasks_task_fts_doc WHERE task_id = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER tasks_task_fts_update AFTER UPDATE OF title, description, is_deleted ON tasks_task
+    WHEN old.title IS NOT new.title OR old.description IS NOT new.description OR old.is_deleted IS NOT new.is_deleted
+    BEGIN
+        DELETE FROM tasks_task_fts WHERE rowid = (SELECT docid FROM tasks_task_fts_doc WHERE task_id = old.id);
+        DELETE FROM tasks_task_fts_doc WHERE task_id = old.id;
+        INSERT INTO tasks_task_fts_doc (task_id) SELECT new.id WHERE new.is_deleted = 0;
+        INSERT INTO tasks_task_fts (rowid, title, description)
+            SELECT docid, new.title, new.description FROM tasks_task_fts_doc WHERE task_id = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER tasks_task_fts_delete AFTER DELETE ON tasks_task
+    BEGIN
+        DELETE FROM tasks_task_fts WHERE rowid = (SELECT docid FROM tasks_task_fts_doc WHERE task_id = old.id);
+        DELETE FROM tasks_task_fts_doc WHERE task_id = old.id;
+    END
+    """,
+    "INSERT INTO tasks_task_fts_doc (task_id) SELECT id FROM tasks_task WHERE is_deleted = 0",
+    "INSERT INTO tasks_task_fts (rowid, title, description) "
+    "SELECT d.docid, t.title, t.description FROM tasks_task_fts_doc d JOIN tasks_task t ON t.id = d.task_id",
+]
+
+REVERSE_SQL = [
+    "DROP TRIGGER IF EXISTS tasks_task_fts_insert",
+    "DROP TRIGGER IF EXISTS tasks_task_fts_update",
+    "DROP TRIGGER IF EXISTS tasks_task_fts_delete",
+    "DROP TABLE IF EXISTS tasks_task_fts_doc",
+    "DROP TABLE IF EXISTS tasks_task_fts",
+]
+
+
+def _fts5_supported(schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        if cursor.fetchone()[0]:
+            return True
+        try:
+            cursor.execute("CREATE VIRTUAL TABLE temp.tasks_fts5_probe USING fts5(x)")
+            cursor.execute("DROP TABLE temp.tasks_fts5_probe")
+        except Exception:
+            return False
+        return True
+
+
+def create_search_index(apps, schema_editor):
+    # The index is SQLite specific; other backends keep the icontains search.
+    if schema_editor.connection.vendor != 'sqlite' or not _fts5_supported(schema_editor):
+        return
+    for statement in FORWARD_SQL:
+        schema_editor.execute(statement, params=None)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in REVERSE_SQL:
+        schema_editor.execute(statement, params=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0004_task_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:32
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0007_activitylog_timestamp_index'),
+        ('teams', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['team', 'timestamp'], name='tasks_activity_team_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['task', 'timestamp'], name='tasks_activity_task_ts_idx'),
+        ),
+    ]
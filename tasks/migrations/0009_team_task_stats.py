@@ -0,0 +1,44 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def compute_team_task_stats(apps, schema_editor):
+    Task = apps.get_model('tasks', 'Task')
+    Team = apps.get_model('teams', 'Team')
+    TeamTaskStats = apps.get_model('tasks', 'TeamTaskStats')
+
+    stats = {team_id: TeamTaskStats(team_id=team_id) for team_id in Team.objects.values_list('id', flat=True)}
+    counts = Task.objects.filter(is_deleted=False).values('team_id', 'status').annotate(n=Count('id')).order_by()
+    for row in counts:
+        if row['team_id'] in stats and row['status'] in ('todo', 'in_progress', 'done'):
+            setattr(stats[row['team_id']], row['status'], row['n'])
+    TeamTaskStats.objects.bulk_create(stats.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0008_activitylog_feed_indexes'),
+        ('teams', '0003_team_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TeamTaskStats',
+            fields=[
+                ('team', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='task_stats', serialize=False, to='teams.team')),
+                ('todo', models.IntegerField(default=0)),
+                ('in_progress', models.IntegerField(default=0)),
+                ('done', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['team', 'due_date'], name='tasks_task_team_due_idx'),
+        ),
+        migrations.RunPython(compute_team_task_stats, migrations.RunPython.noop),
+    ]
@@ -7,6 +7,12 @@ from django.conf import settings
 class Task(models.Model):
     STATUS_CHOICES = [('todo', 'To Do'), ('in_progress', 'In Progress'), ('done', 'Done')]
 
+    # Values remembered from the last load/save, compared in tasks.signals.
+    TRACKED_FIELDS = ('status', 'assigned_to_id', 'team_id', 'is_deleted')
+    # Not a field: the user making the change, set by the views before
+    # save() and logged as performed_by, like bulk updates do.
+    changed_by = None
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
@@ -23,6 +29,28 @@ class Task(models.Model):
     is_deleted = models.BooleanField(default=False)
     deleted_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination orders by (created_at, id) / (due_date, id).
+            models.Index(fields=['created_at', 'id'], name='tasks_task_created_id_idx'),
+            models.Index(fields=['due_date', 'id'], name='tasks_task_due_id_idx'),
+            # Overdue counts per team, see tasks.stats.
+            models.Index(fields=['team', 'due_date'], name='tasks_task_team_due_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = {
+            name: value for name, value in zip(field_names, values) if name in cls.TRACKED_FIELDS
+        }
+        return instance
+
+    def snapshot_tracked_values(self):
+        previous = getattr(self, '_loaded_values', {})
+        self._loaded_values = {name: getattr(self, name) for name in self.TRACKED_FIELDS}
+        return previous
+
     def soft_delete(self):
         self.is_deleted = True
         self.deleted_at = timezone.now()
@@ -45,5 +73,35 @@ class ActivityLog(models.Model):
     team = models.ForeignKey(Team, on_delete=models.CASCADE, null=True, blank=True)
     task = models.ForeignKey(Task, on_delete=models.SET_NULL, null=True, blank=True)
     target_user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
-    timestamp = models.DateTimeField(auto_now_add=True)
-    details = models.JSONField(default=dict, blank=True)
\ No newline at end of file
+    # Set when the entry is recorded, not when a buffered batch is flushed.
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
+    details = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        indexes = [
+            # Retention picks the oldest rows first, see tasks/archive.py.
+            models.Index(fields=['timestamp'], name='tasks_activity_ts_idx'),
+            # Team and task activity feeds, newest first.
+            models.Index(fields=['team', 'timestamp'], name='tasks_activity_team_ts_idx'),
+            models.Index(fields=['task', 'timestamp'], name='tasks_activity_task_ts_idx'),
+        ]
+
+
+class TeamTaskStats(models.Model):
+    """
+    Live (not soft-deleted) tasks of a team per status, kept up to date by
+    tasks.stats on every write instead of being aggregated on read.
+    """
+
+    team = models.OneToOneField(Team, on_delete=models.CASCADE, primary_key=True, related_name='task_stats')
+    todo = models.IntegerField(default=0)
+    in_progress = models.IntegerField(default=0)
+    done = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def total(self):
+        return self.todo + self.in_progress + self.done
+
+    def __str__(self):
+        return f"Task stats of {self.team_id}"
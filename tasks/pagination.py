@@ -0,0 +1,201 @@
+import json
+from base64 import b64decode, b64encode
+from binascii import Error as BinasciiError
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset pagination over a single ordering field plus the primary key as a
+    tiebreaker. Pages are fetched with a `(value, pk)` range condition instead
+    of OFFSET and no COUNT query is run. NULL values always sort last.
+    """
+
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = 'cursor'
+    ordering = '-created_at'
+    tiebreaker = 'pk'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_ordering(self, request, queryset, view):
+        return self.ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.current_ordering = self.get_ordering(request, queryset, view)
+        self.field = self.current_ordering.lstrip('-')
+        self.descending = self.current_ordering.startswith('-')
+        self.model = queryset.model
+        self.model_field = self.model._meta.get_field(self.field)
+
+        cursor = self.decode_cursor(request)
+        reverse = bool(cursor and cursor['reverse'])
+        descending = self.descending != reverse
+
+        queryset = queryset.order_by(*self._order_by(descending, nulls_last=not reverse))
+        if cursor:
+            queryset = queryset.filter(
+                self._position_filter(cursor['value'], cursor['pk'], descending, nulls_last=not reverse)
+            )
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        if reverse:
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = cursor is not None
+
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def encode_cursor(self, obj, reverse):
+        value = getattr(obj, self.field)
+        position = {
+            'o': self.current_ordering,
+            'v': value.isoformat() if hasattr(value, 'isoformat') else value,
+            'k': str(obj.pk),
+            'r': int(reverse),
+        }
+        encoded = b64encode(json.dumps(position, separators=(',', ':')).encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            position = json.loads(b64decode(encoded.encode('ascii')).decode('ascii'))
+            if position['o'] != self.current_ordering:
+                raise ValueError('Cursor was issued for another ordering.')
+            value = position['v']
+            if value is not None:
+                value = self.model_field.to_python(value)
+            pk = self.model._meta.pk.to_python(position['k'])
+            if pk is None:
+                raise ValueError('Cursor has no primary key.')
+            return {'value': value, 'pk': pk, 'reverse': bool(position['r'])}
+        except (TypeError, KeyError, ValueError, UnicodeError, BinasciiError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def _order_by(self, descending, nulls_last):
+        nulls = {'nulls_last': True} if nulls_last else {'nulls_first': True}
+        if not self.model_field.null:
+            nulls = {}
+        if descending:
+            return [F(self.field).desc(**nulls), F(self.tiebreaker).desc()]
+        return [F(self.field).asc(**nulls), F(self.tiebreaker).asc()]
+
+    def _position_filter(self, value, pk, descending, nulls_last):
+        op = 'lt' if descending else 'gt'
+        pk_after = Q(**{f'{self.tiebreaker}__{op}': pk})
+
+        if value is None:
+            condition = Q(**{f'{self.field}__isnull': True}) & pk_after
+            if not nulls_last:
+                condition |= Q(**{f'{self.field}__isnull': False})
+            return condition
+
+        # `field <= value AND (field < value OR pk < last_pk)` keeps a plain
+        # range on the (field, pk) index usable by SQLite.
+        condition = Q(**{f'{self.field}__{op}e': value}) & (
+            Q(**{f'{self.field}__{op}': value}) | (Q(**{self.field: value}) & pk_after)
+        )
+        if nulls_last and self.model_field.null:
+            condition |= Q(**{f'{self.field}__isnull': True})
+        return condition
+
+
+class TaskCursorPagination(KeysetPagination):
+
+    ordering = '-created_at'
+
+    def get_ordering(self, request, queryset, view):
+        allowed = getattr(view, 'ordering_fields', None) or [self.ordering.lstrip('-')]
+        param = request.query_params.get(api_settings.ORDERING_PARAM, '')
+        for term in param.split(','):
+            term = term.strip()
+            if term and term.lstrip('-') in allowed:
+                return term
+        return self.ordering
+
+
+class ActivityFeedPagination(KeysetPagination):
+
+    ordering = '-timestamp'
+    page_size = 20
+
+
+class TaskPagination(PageNumberPagination):
+    """
+    Page number pagination by default; requests that pass `cursor` (empty for
+    the first page) are paginated with TaskCursorPagination instead, which
+    skips the COUNT query and the OFFSET scan.
+    """
+
+    cursor_query_param = 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param in request.query_params:
+            self.cursor_paginator = TaskCursorPagination()
+            return self.cursor_paginator.paginate_queryset(queryset, request, view)
+
+        self.cursor_paginator = None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_next_link(self):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_next_link()
+        return super().get_next_link()
+
+    def get_previous_link(self):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_previous_link()
+        return super().get_previous_link()
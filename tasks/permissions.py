@@ -1,26 +1,24 @@
 from rest_framework import permissions
+from teams.access import get_membership_resolver
 
 class IsTaskTeamMember(permissions.BasePermission):
     
     def has_object_permission(self, request, view, obj):
-        return obj.team.memberships.filter(user=request.user).exists()
+        return get_membership_resolver(request).is_member(obj.team_id)
 
 
 class IsTaskAssigneeOrAdmin(permissions.BasePermission):
    
     def has_object_permission(self, request, view, obj):
-        membership = obj.team.memberships.filter(user=request.user).first()
+        membership = get_membership_resolver(request).membership(obj.team_id)
         if not membership:
             return False
         if membership.role == 'admin':
             return True
-        return obj.assigned_to == membership
+        return obj.assigned_to_id == membership.pk
 
 
 class IsTeamAdmin(permissions.BasePermission):
    
     def has_object_permission(self, request, view, obj):
-        membership = obj.team.memberships.filter(user=request.user).first()
-        if not membership:
-            return False
-        return membership.role == 'admin'
\ No newline at end of file
+        return get_membership_resolver(request).is_admin(obj.team_id)
\ No newline at end of file
@@ -0,0 +1,158 @@
+import re
+
+from django.db import connections, models, router
+from django.db.models.expressions import Expression
+from django.db.models.sql.constants import INNER
+from rest_framework import filters
+
+from .models import Task
+
+# Created by migration 0005. Triggers on tasks_task keep both tables in sync;
+# the doc table maps FTS rowids to task ids so every trigger step is a keyed
+# lookup (tasks_task itself has no stable integer rowid).
+FTS_TABLE = 'tasks_task_fts'
+FTS_DOC_TABLE = 'tasks_task_fts_doc'
+
+# Every matching task with its rank, from a single MATCH. Title matches
+# weigh more than description matches.
+RANKED_MATCHES_SQL = (
+    f'SELECT d.task_id, bm25({FTS_TABLE}, 4.0, 1.0) AS rank FROM {FTS_TABLE} '
+    f'JOIN {FTS_DOC_TABLE} d ON d.docid = {FTS_TABLE}.rowid WHERE {FTS_TABLE} MATCH %s'
+)
+
+_available = {}
+
+
+def search_index_available(using=None):
+    using = using or router.db_for_read(Task)
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return False
+
+    key = (using, str(connection.settings_dict['NAME']))
+    if key not in _available:
+        _available[key] = FTS_TABLE in connection.introspection.table_names()
+    return _available[key]
+
+
+def build_match_expression(terms):
+    """
+    Turn free-text search terms into an FTS5 query: every word becomes a
+    quoted prefix token and all tokens must match.
+    """
+    tokens = []
+    for term in terms:
+        tokens.extend(re.findall(r'\w+', term))
+    if not tokens:
+        return None
+    return ' '.join('"{}"*'.format(token.replace('"', '""')) for token in tokens)
+
+
+def rebuild_search_index(using=None):
+    using = using or router.db_for_write(Task)
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(f'DELETE FROM {FTS_DOC_TABLE}')
+        cursor.execute(f'INSERT INTO {FTS_DOC_TABLE} (task_id) SELECT id FROM {Task._meta.db_table} WHERE is_deleted = 0')
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, title, description) '
+            f'SELECT d.docid, t.title, t.description FROM {FTS_DOC_TABLE} d '
+            f'JOIN {Task._meta.db_table} t ON t.id = d.task_id'
+        )
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+        cursor.execute(f'SELECT COUNT(*) FROM {FTS_DOC_TABLE}')
+        return cursor.fetchone()[0]
+
+
+class RankedMatchJoin:
+    """
+    `INNER JOIN (RANKED_MATCHES_SQL) alias ON alias.task_id = task.id` as an
+    entry of Query.alias_map (see django.db.models.sql.datastructures.Join
+    for the interface). Joining the matches keeps MATCH to one run per
+    query; a rank subquery in the SELECT list would run it once per row.
+    """
+
+    table_name = 'tasks_task_search_rank'
+    join_type = INNER
+    nullable = False
+    filtered_relation = None
+
+    def __init__(self, parent_alias, match, table_alias=None):
+        self.parent_alias = parent_alias
+        self.match = match
+        self.table_alias = table_alias
+
+    def as_sql(self, compiler, connection):
+        qn = compiler.quote_name_unless_alias
+        alias = qn(self.table_alias)
+        pk_column = connection.ops.quote_name(Task._meta.pk.column)
+        sql = f'{self.join_type} ({RANKED_MATCHES_SQL}) {alias} ON ({alias}.task_id = {qn(self.parent_alias)}.{pk_column})'
+        return sql, [self.match]
+
+    def relabeled_clone(self, change_map):
+        return self.__class__(
+            change_map.get(self.parent_alias, self.parent_alias),
+            self.match,
+            change_map.get(self.table_alias, self.table_alias),
+        )
+
+    def demote(self):
+        return self.relabeled_clone({})
+
+    @property
+    def identity(self):
+        return self.__class__, self.parent_alias, self.match
+
+    def __eq__(self, other):
+        if not isinstance(other, RankedMatchJoin):
+            return NotImplemented
+        return self.identity == other.identity
+
+    def __hash__(self):
+        return hash(self.identity)
+
+
+class SearchRank(Expression):
+    """The `rank` column of the RankedMatchJoin at `alias`."""
+
+    output_field = models.FloatField()
+
+    def __init__(self, alias):
+        super().__init__()
+        self.alias = alias
+
+    def as_sql(self, compiler, connection):
+        return f'{compiler.quote_name_unless_alias(self.alias)}.rank', []
+
+    def relabeled_clone(self, change_map):
+        return self.__class__(change_map.get(self.alias, self.alias))
+
+    def get_group_by_cols(self):
+        return [self]
+
+
+def rank_matches(queryset, match):
+    """`queryset` limited to tasks matching `match`, annotated with `search_rank`."""
+    queryset = queryset.all()
+    query = queryset.query
+    alias = query.join(RankedMatchJoin(query.get_initial_alias(), match))
+    return queryset.annotate(search_rank=SearchRank(alias))
+
+
+class TaskSearchFilter(filters.SearchFilter):
+    """
+    `?search=` backed by the SQLite FTS5 index on title/description with
+    prefix matching, ordered by relevance unless `?ordering=` is given.
+    Falls back to SearchFilter's icontains lookups when the index is missing.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms or not search_index_available(queryset.db):
+            return super().filter_queryset(request, queryset, view)
+
+        match = build_match_expression(terms)
+        if match is None:
+            return super().filter_queryset(request, queryset, view)
+
+        return rank_matches(queryset, match).order_by('search_rank', 'pk')
@@ -1,13 +1,29 @@
+import uuid
 from rest_framework import serializers
-from .models import Task, Membership
+from .models import Task, Membership, ActivityLog, TeamTaskStats
+from teams.access import get_membership_resolver
 from teams.models import Team
 
+class MemberTeamField(serializers.PrimaryKeyRelatedField):
+    """Accepts only teams the requesting user belongs to."""
+
+    def get_queryset(self):
+        request = self.context.get('request')
+        if not request or not hasattr(request, 'user') or not request.user.is_authenticated:
+            return Team.objects.none()
+        return Team.objects.filter(id__in=get_membership_resolver(request).team_ids())
+
+
 class TaskSerializer(serializers.ModelSerializer):
     assigned_members = serializers.SerializerMethodField()
     team_members = serializers.SerializerMethodField()
     assigned_to_email = serializers.EmailField(write_only=True, required=False, allow_null=True)
     created_by = serializers.SerializerMethodField()
-    team = serializers.PrimaryKeyRelatedField(queryset=Team.objects.none(), required=True)
+    team = MemberTeamField(required=True)
+
+    # Costly to render (whole rosters); only included on request once
+    # `?fields=` or `?expand=` is used, see TaskViewSet.get_selected_fields.
+    EXPANDABLE_FIELDS = ('team_members', 'assigned_members')
 
     class Meta:
         model = Task
@@ -16,39 +32,30 @@ class TaskSerializer(serializers.ModelSerializer):
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        request = self.context.get('request')
-        if request and hasattr(request, 'user') and request.user.is_authenticated:
-            self.fields['team'].queryset = Team.objects.filter(memberships__user=request.user).distinct()
-        else:
-            self.fields['team'].queryset = Team.objects.none()
-        
         self.fields.pop('assigned_to_email', None)
+
+        selected = self.context.get('fields')
+        if selected is not None:
+            for name in set(self.fields) - set(selected):
+                self.fields.pop(name)
     
+    def _serialize_membership(self, membership):
+
+        return {
+            'id': str(membership.id),
+            'user_id': str(membership.user_id),
+            'email': membership.user.email,
+            'role': membership.role,
+            'joined_at': membership.joined_at.isoformat() if membership.joined_at else None
+        }
+
     def get_assigned_members(self, obj):
 
-        members = []
-        for membership in obj.assigned_members.all():
-            members.append({
-                'id': str(membership.id),
-                'user_id': str(membership.user.id),
-                'email': membership.user.email,
-                'role': membership.role,
-                'joined_at': membership.joined_at.isoformat() if membership.joined_at else None
-            })
-        return members
+        return [self._serialize_membership(membership) for membership in obj.assigned_members.all()]
     
     def get_team_members(self, obj):
 
-        members = []
-        for membership in obj.team.memberships.all():
-            members.append({
-                'id': str(membership.id),
-                'user_id': str(membership.user.id),
-                'email': membership.user.email,
-                'role': membership.role,
-                'joined_at': membership.joined_at.isoformat() if membership.joined_at else None
-            })
-        return members
+        return [self._serialize_membership(membership) for membership in obj.team.memberships.all()]
     
     def get_created_by(self, obj):
 
@@ -73,4 +80,92 @@ class TaskSerializer(serializers.ModelSerializer):
     def validate(self, attrs):
 
         attrs.pop('assigned_to', None)
-        return attrs
\ No newline at end of file
+        return attrs
+
+
+class TaskSideloadSerializer(TaskSerializer):
+    """
+    TaskSerializer for sideloaded lists: members are referenced by
+    membership id and described once in the response's `included` section
+    (see tasks.sideload) instead of being embedded in every task.
+    """
+
+    team_members = None
+    assigned_members = serializers.SerializerMethodField()
+    created_by = serializers.UUIDField(source='created_by_id', read_only=True)
+
+    def get_assigned_members(self, obj):
+
+        return [str(membership_id) for membership_id in obj.assigned_member_ids]
+
+
+class TaskImportSerializer(serializers.Serializer):
+    """One record of a bulk import, shaped like sample_task_data.json."""
+
+    title = serializers.CharField(max_length=255)
+    description = serializers.CharField(required=False, allow_blank=True, default='')
+    status = serializers.ChoiceField(choices=Task.STATUS_CHOICES, required=False, default='todo')
+    due_date = serializers.DateTimeField(required=False, allow_null=True, default=None)
+    team = serializers.UUIDField()
+    assigned_to = serializers.CharField(required=False, allow_null=True, allow_blank=True, default=None)
+
+    def validate_title(self, value):
+
+        if not value.strip():
+            raise serializers.ValidationError("Task title cannot be empty.")
+        return value.strip()
+
+    def validate_assigned_to(self, value):
+
+        if not value:
+            return None
+        if '@' in value:
+            return value
+        try:
+            return uuid.UUID(value)
+        except ValueError:
+            raise serializers.ValidationError("Provide a membership ID (UUID) or user email.")
+
+
+class TaskBulkUpdateSerializer(serializers.Serializer):
+    """Either a patch (status and/or due_date) or `delete: true`."""
+
+    status = serializers.ChoiceField(choices=Task.STATUS_CHOICES, required=False)
+    due_date = serializers.DateTimeField(required=False, allow_null=True)
+    delete = serializers.BooleanField(required=False, default=False)
+
+    def validate(self, attrs):
+
+        patch = {field: attrs[field] for field in ('status', 'due_date') if field in attrs}
+        if attrs['delete'] and patch:
+            raise serializers.ValidationError("Pass either delete or fields to update, not both.")
+        if not attrs['delete'] and not patch:
+            raise serializers.ValidationError("Pass status and/or due_date to update, or delete: true.")
+        return attrs
+
+
+class ActivityLogSerializer(serializers.ModelSerializer):
+    performed_by = serializers.CharField(source='performed_by.email', read_only=True)
+    target_user = serializers.CharField(source='target_user.email', read_only=True, allow_null=True)
+
+    class Meta:
+        model = ActivityLog
+        fields = ['id', 'action', 'performed_by', 'performed_by_id', 'target_user', 'target_user_id', 'team', 'task', 'timestamp', 'details']
+        read_only_fields = fields
+
+
+class TeamTaskStatsSerializer(serializers.ModelSerializer):
+    total = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = TeamTaskStats
+        fields = ['todo', 'in_progress', 'done', 'total', 'updated_at']
+        read_only_fields = fields
+
+
+class TeamTaskStatsDetailSerializer(TeamTaskStatsSerializer):
+    overdue = serializers.IntegerField(read_only=True)
+
+    class Meta(TeamTaskStatsSerializer.Meta):
+        fields = ['team', 'todo', 'in_progress', 'done', 'total', 'overdue', 'updated_at']
+        read_only_fields = fields
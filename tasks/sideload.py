@@ -0,0 +1,46 @@
+from collections import defaultdict
+
+from teams.models import Membership, Team
+from .models import Task
+
+
+def attach_assigned_member_ids(tasks):
+    """Set `assigned_member_ids` on each task from one query on the M2M table."""
+    assigned = defaultdict(list)
+    rows = Task.assigned_members.through.objects.filter(task_id__in=[task.pk for task in tasks])
+    for task_id, membership_id in rows.values_list('task_id', 'membership_id'):
+        assigned[task_id].append(membership_id)
+    for task in tasks:
+        task.assigned_member_ids = assigned[task.pk]
+
+
+def build_included(tasks):
+    """
+    The teams, memberships and users referenced by `tasks`, each listed
+    once however many tasks share them. Costs two queries per page.
+    """
+    team_ids = {task.team_id for task in tasks}
+    if not team_ids:
+        return {'teams': [], 'memberships': [], 'users': []}
+
+    teams = [
+        {'id': str(team['id']), 'name': team['name']}
+        for team in Team.objects.filter(pk__in=team_ids).order_by('name', 'pk').values('id', 'name')
+    ]
+
+    memberships, users = [], {}
+    for membership in Membership.objects.filter(team_id__in=team_ids).select_related('user').order_by('team_id', 'joined_at', 'pk'):
+        memberships.append({
+            'id': str(membership.id),
+            'team': str(membership.team_id),
+            'user': str(membership.user_id),
+            'role': membership.role,
+            'joined_at': membership.joined_at.isoformat() if membership.joined_at else None,
+        })
+        users.setdefault(membership.user_id, {
+            'id': str(membership.user_id),
+            'email': membership.user.email,
+            'name': membership.user.name,
+        })
+
+    return {'teams': teams, 'memberships': memberships, 'users': list(users.values())}
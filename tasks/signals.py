@@ -1,50 +1,65 @@
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
 from django.dispatch import receiver
-from .models import Task, ActivityLog
-
-_previous_values = {}
-
-@receiver(pre_save, sender=Task)
-def store_previous_values(sender, instance, **kwargs):
-   
-    if instance.pk:
-        try:
-            old_instance = Task.objects.get(pk=instance.pk)
-            _previous_values[instance.pk] = {
-                'assigned_to': old_instance.assigned_to,
-                'status': old_instance.status
-            }
-        except Task.DoesNotExist:
-            _previous_values[instance.pk] = {
-                'assigned_to': None,
-                'status': None
-            }
+from teams.deletion import collecting_deletion
+from teams.versions import bump_team_versions, bump_team_versions_on_delete
+from .activity import record_activity
+from .models import Task
+from .stats import collect_task_delete, track_task_delete, track_task_save
+
+
+def changed_by_id(task):
+    # Saves made outside a request are put on the task's creator.
+    return task.changed_by.pk if task.changed_by else task.created_by.user_id
+
 
 @receiver(post_save, sender=Task)
 def log_task_actions(sender, instance, created, **kwargs):
 
+    # Values loaded with the instance (see Task.from_db), refreshed on every
+    # save, so detecting a status change needs no extra query.
+    prev = instance.snapshot_tracked_values()
+
+    # A task moved to another team changes both teams' task lists.
+    bump_team_versions([instance.team_id, prev.get('team_id')])
+    track_task_save(instance, prev, created)
+
     if instance.is_deleted:
         return
     
     if created:
-        ActivityLog.objects.create(
+        record_activity(
             action='task_created',
-            performed_by=instance.created_by.user,
-            team=instance.team,
+            performed_by_id=instance.created_by.user_id,
+            team_id=instance.team_id,
             task=instance,
             details={'title': instance.title}
         )
-    else:
-        prev = _previous_values.get(instance.pk, {})
-        
-        if prev.get('status') and prev.get('status') != instance.status:
-            ActivityLog.objects.create(
-                action='task_status_changed',
-                performed_by=instance.created_by.user,
-                team=instance.team,
-                task=instance,
-                details={'old': prev.get('status'), 'new': instance.status}
-            )
-        
-        if instance.pk in _previous_values:
-            del _previous_values[instance.pk]
\ No newline at end of file
+    elif prev.get('status') and prev.get('status') != instance.status:
+        record_activity(
+            action='task_status_changed',
+            performed_by_id=changed_by_id(instance),
+            team_id=instance.team_id,
+            task=instance,
+            details={'old': prev.get('status'), 'new': instance.status}
+        )
+
+
+@receiver(pre_delete, sender=Task)
+def note_task_delete(sender, instance, origin=None, **kwargs):
+    deletion = collecting_deletion(origin)
+    deletion.team_ids.add(instance.team_id)
+    collect_task_delete(instance, deletion)
+
+
+@receiver(post_delete, sender=Task)
+def bump_version_on_task_delete(sender, instance, origin=None, **kwargs):
+    bump_team_versions_on_delete(instance.team_id, origin)
+    track_task_delete(instance, origin)
+
+
+@receiver(m2m_changed, sender=Task.assigned_members.through)
+def bump_version_on_assignment_change(sender, instance, action, **kwargs):
+    # `instance` is the Task, or the Membership when changed from that side;
+    # both belong to the team whose payloads change.
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_team_versions([instance.team_id])
@@ -0,0 +1,177 @@
+from collections import Counter, defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from teams.deletion import running_deletion
+from teams.models import Team
+from .models import Task, TeamTaskStats
+
+STATUSES = tuple(value for value, _ in Task.STATUS_CHOICES)
+RECONCILE_BATCH_SIZE = 200
+
+
+def stats_key(team_id, status, is_deleted):
+    """The counter a task in this state belongs to, None if it is not counted."""
+    if is_deleted or not team_id or status not in STATUSES:
+        return None
+    return (team_id, status)
+
+
+def count_tasks(team_ids):
+    """{team_id: {status: count}} of live tasks, aggregated in one query."""
+    counts = defaultdict(lambda: dict.fromkeys(STATUSES, 0))
+    rows = (
+        Task.objects
+        .filter(team_id__in=team_ids, is_deleted=False)
+        .values('team_id', 'status')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    for row in rows:
+        if row['status'] in STATUSES:
+            counts[row['team_id']][row['status']] = row['count']
+    return counts
+
+
+def apply_stat_deltas(deltas):
+    """
+    Add `deltas` ({(team_id, status): n}) to the team counters with
+    UPDATE ... SET status = status + n, one statement per distinct change.
+    Missing rows are created from a fresh count.
+    """
+    per_team = defaultdict(dict)
+    for key, count in deltas.items():
+        if key is not None and count:
+            team_id, status = key
+            per_team[team_id][status] = per_team[team_id].get(status, 0) + count
+
+    grouped = defaultdict(list)
+    for team_id, changes in per_team.items():
+        changes = tuple(sorted((status, count) for status, count in changes.items() if count))
+        if changes:
+            grouped[changes].append(team_id)
+
+    now = timezone.now()
+    for changes, team_ids in grouped.items():
+        expressions = {status: F(status) + count for status, count in changes}
+        updated = TeamTaskStats.objects.filter(team_id__in=team_ids).update(updated_at=now, **expressions)
+        # Only a change that adds a task creates a row: removals without one
+        # come from a team being deleted (its row already went with it).
+        if updated < len(team_ids) and any(count > 0 for _, count in changes):
+            _create_missing(team_ids, expressions, now)
+
+
+def _create_missing(team_ids, expressions, now):
+    # Counted from tasks_task rather than started from the delta, which would
+    # be wrong for a team whose row was lost.
+    missing = set(team_ids) - set(TeamTaskStats.objects.filter(team_id__in=team_ids).values_list('team_id', flat=True))
+    if not missing:
+        return
+
+    counts = count_tasks(missing)
+    for team_id in missing:
+        try:
+            with transaction.atomic():
+                TeamTaskStats.objects.create(team_id=team_id, **counts[team_id])
+        except IntegrityError:
+            # Created concurrently, add to that row instead.
+            TeamTaskStats.objects.filter(team_id=team_id).update(updated_at=now, **expressions)
+
+
+def track_task_save(task, previous, created):
+    """Move a saved task between counters, `previous` as from Task.snapshot_tracked_values()."""
+    if created:
+        before = None
+    elif all(field in previous for field in ('team_id', 'status', 'is_deleted')):
+        before = stats_key(previous['team_id'], previous['status'], previous['is_deleted'])
+    else:
+        # Loaded with deferred fields, leave it to reconcile_task_stats.
+        return
+
+    deltas = Counter()
+    deltas[before] -= 1
+    deltas[stats_key(task.team_id, task.status, task.is_deleted)] += 1
+    apply_stat_deltas(deltas)
+
+
+def collect_task_delete(task, deletion):
+    """pre_delete side of track_task_delete: add the task's removal to `deletion`."""
+    deletion.stat_deltas[stats_key(task.team_id, task.status, task.is_deleted)] -= 1
+
+
+def track_task_delete(task, origin=None):
+    """
+    Take a deleted task off its counter. Within a delete() whose tasks were
+    noted by collect_task_delete, the first call applies the removals of all
+    of them at once and skips teams deleted too (their row goes with them).
+    """
+    deletion = running_deletion(origin)
+    if deletion is None:
+        apply_stat_deltas({stats_key(task.team_id, task.status, task.is_deleted): -1})
+    elif deletion.once('task_stats'):
+        apply_stat_deltas({
+            key: count for key, count in deletion.stat_deltas.items()
+            if key is not None and key[0] not in deletion.deleted_team_ids
+        })
+
+
+def team_task_stats(team, now=None):
+    """The team's counters plus `overdue`, which depends on the clock and is counted on read."""
+    stats = TeamTaskStats.objects.filter(team=team).first() or TeamTaskStats(team=team)
+    stats.overdue = (
+        Task.objects
+        .filter(team=team, is_deleted=False, due_date__lt=now or timezone.now())
+        .exclude(status='done')
+        .count()
+    )
+    return stats
+
+
+def reconcile_task_stats(batch_size=RECONCILE_BATCH_SIZE):
+    """
+    Recompute every team's counters from tasks_task, `batch_size` teams per
+    transaction, and fix the rows that drifted. Returns counts of teams
+    checked and repaired.
+    """
+    checked = repaired = 0
+    last_team_id = None
+    while True:
+        teams = Team.objects.order_by('pk')
+        if last_team_id is not None:
+            teams = teams.filter(pk__gt=last_team_id)
+        team_ids = list(teams.values_list('pk', flat=True)[:batch_size])
+        if not team_ids:
+            break
+        last_team_id = team_ids[-1]
+
+        with transaction.atomic():
+            # Locked so concurrent task writes wait for the batch to commit.
+            stored = {
+                stats.team_id: stats
+                for stats in TeamTaskStats.objects.select_for_update().filter(team_id__in=team_ids)
+            }
+            actual = count_tasks(team_ids)
+
+            now = timezone.now()
+            to_create, to_update = [], []
+            for team_id in team_ids:
+                expected = actual[team_id]
+                stats = stored.get(team_id)
+                if stats is None:
+                    to_create.append(TeamTaskStats(team_id=team_id, **expected))
+                    repaired += any(expected.values())
+                elif any(getattr(stats, status) != count for status, count in expected.items()):
+                    for status, count in expected.items():
+                        setattr(stats, status, count)
+                    stats.updated_at = now
+                    to_update.append(stats)
+                    repaired += 1
+
+            # A task write may have created one of these meanwhile; the next run fixes it.
+            TeamTaskStats.objects.bulk_create(to_create, ignore_conflicts=True)
+            TeamTaskStats.objects.bulk_update(to_update, [*STATUSES, 'updated_at'])
+        checked += len(team_ids)
+
+    return {'checked': checked, 'repaired': repaired}
@@ -0,0 +1,256 @@
+import random
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from companies.models import Company
+from teams.models import Membership, Team
+from users.models import User
+from .models import ActivityLog, Task
+from .stats import reconcile_task_stats
+
+SYNTHETIC_BATCH_SIZE = 5000
+SYNTHETIC_PASSWORD = 'synthetic-password'
+
+WORDS = (
+    'api', 'audit', 'backlog', 'billing', 'build', 'cache', 'checkout', 'client', 'dashboard', 'deploy',
+    'docs', 'email', 'export', 'feature', 'fix', 'import', 'invoice', 'login', 'metrics', 'migration',
+    'mobile', 'onboarding', 'payment', 'performance', 'release', 'report', 'review', 'search', 'security',
+    'settings', 'signup', 'sync', 'test', 'upgrade', 'webhook',
+)
+VERBS = ('Add', 'Update', 'Fix', 'Remove', 'Refactor', 'Document', 'Investigate', 'Speed up', 'Review', 'Plan')
+
+STATUS_WEIGHTS = {'todo': 30, 'in_progress': 20, 'done': 50}
+# task_status_changed entries leading from `todo` to each final status.
+STATUS_HISTORY = {
+    'todo': (),
+    'in_progress': (('todo', 'in_progress'),),
+    'done': (('todo', 'in_progress'), ('in_progress', 'done')),
+}
+ASSIGNEE_COUNTS = (0, 1, 1, 1, 2, 2, 3)
+
+
+@contextmanager
+def backdating(*fields):
+    """Let bulk_create keep the given values of auto_now/auto_now_add fields."""
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def skewed_weights(count, skew, rng):
+    """
+    Zipf-like weights, 1 / rank ** skew, in random order: with skew > 1 a few
+    entries get most of the mass and the long tail gets very little.
+    """
+    weights = [1 / (rank + 1) ** skew for rank in range(count)]
+    rng.shuffle(weights)
+    return weights
+
+
+class SyntheticDataGenerator:
+    """
+    Builds users, companies, teams, memberships, tasks with assigned members
+    and their ActivityLog history with bulk_create, `batch_size` rows per
+    statement batch and transaction. Team sizes and task counts follow the
+    same skewed weights, so the biggest teams also own the most tasks.
+
+    Everything (ids included) is drawn from one seeded RNG, so a seed always
+    produces the same rows; timestamps are relative to the moment of the run
+    and backdated over the last `days` days. Signals are bypassed: team
+    counters are rebuilt with reconcile_task_stats() at the end and the
+    search index is filled by its own triggers.
+    """
+
+    def __init__(self, users=1000, companies=10, teams=100, members_per_team=10, tasks=100000,
+                 admin_ratio=0.1, deleted_ratio=0.05, skew=1.2, days=365, seed=0,
+                 batch_size=SYNTHETIC_BATCH_SIZE, prefix='synthetic', log=None):
+        self.options = {
+            'users': users, 'companies': companies, 'teams': teams, 'members_per_team': members_per_team,
+            'tasks': tasks, 'admin_ratio': admin_ratio, 'deleted_ratio': deleted_ratio, 'skew': skew,
+        }
+        self.days = days
+        self.seed = seed
+        self.batch_size = batch_size
+        self.prefix = prefix
+        self.log = log or (lambda message: None)
+        self.rng = random.Random(seed)
+        self.now = timezone.now()
+        self.counts = {}
+
+    def uuid(self):
+        return uuid.UUID(int=self.rng.getrandbits(128), version=4)
+
+    def moment(self, start=None):
+        """A random time between `start` (default: `days` ago) and now."""
+        start = start or self.now - timedelta(days=self.days)
+        return start + timedelta(seconds=self.rng.uniform(0, max((self.now - start).total_seconds(), 0)))
+
+    def write(self, model, objects):
+        with transaction.atomic():
+            model.objects.bulk_create(objects, batch_size=self.batch_size)
+        self.counts[model._meta.label] = self.counts.get(model._meta.label, 0) + len(objects)
+
+    def run(self):
+        with backdating(
+            Company._meta.get_field('created_at'),
+            Team._meta.get_field('created_at'),
+            Membership._meta.get_field('joined_at'),
+            Task._meta.get_field('created_at'),
+            Task._meta.get_field('updated_at'),
+        ):
+            users = self.create_users()
+            teams = self.create_teams(users)
+            members = self.create_memberships(teams, users)
+            self.create_tasks(teams, members)
+
+        reconcile_task_stats()
+        return self.counts
+
+    def create_users(self):
+        password = make_password(SYNTHETIC_PASSWORD)
+        users, batch = [], []
+        for index in range(self.options['users']):
+            handle = f'{self.prefix}-{self.seed}-{index}'
+            batch.append(User(
+                id=self.uuid(), email=f'{handle}@example.com', username=handle, name=f'User {index}',
+                password=password, date_joined=self.moment(),
+            ))
+            users.append(batch[-1].id)
+            if len(batch) >= self.batch_size:
+                self.write(User, batch)
+                batch = []
+        self.write(User, batch)
+        self.log(f"Created {len(users)} users.")
+        return users
+
+    def create_teams(self, users):
+        companies = [
+            Company(id=self.uuid(), name=f'Company {index}', created_by_id=self.rng.choice(users), created_at=self.moment())
+            for index in range(self.options['companies'])
+        ]
+        self.write(Company, companies)
+
+        teams = []
+        for index in range(self.options['teams']):
+            company = self.rng.choice(companies)
+            teams.append(Team(
+                id=self.uuid(), name=f'Team {index}', company_id=company.id, created_at=self.moment(company.created_at),
+            ))
+        self.write(Team, teams)
+        self.log(f"Created {len(companies)} companies and {len(teams)} teams.")
+        return teams
+
+    def create_memberships(self, teams, users):
+        """{team id: [(membership id, user id, joined_at), ...]}, admins first."""
+        weights = skewed_weights(len(teams), self.options['skew'], self.rng)
+        self.team_weights = weights
+        total_weight = sum(weights)
+        total = len(teams) * self.options['members_per_team']
+
+        members, batch, logs = {}, [], []
+        for team, weight in zip(teams, weights):
+            size = min(max(1, round(total * weight / total_weight)), len(users))
+            rows = []
+            for position, user_id in enumerate(self.rng.sample(users, size)):
+                admin = position == 0 or self.rng.random() < self.options['admin_ratio']
+                membership = Membership(
+                    id=self.uuid(), user_id=user_id, team_id=team.id,
+                    role=Membership.ROLE_ADMIN if admin else Membership.ROLE_MEMBER,
+                    joined_at=self.moment(team.created_at),
+                )
+                batch.append(membership)
+                rows.append((membership.id, user_id, membership.joined_at, admin))
+            rows.sort(key=lambda row: (not row[3], row[2]))
+            owner = rows[0][1]
+            for _, user_id, joined_at, admin in rows[1:]:
+                logs.append(ActivityLog(
+                    action='member_added', performed_by_id=owner, team_id=team.id, target_user_id=user_id,
+                    timestamp=joined_at, details={'role': Membership.ROLE_ADMIN if admin else Membership.ROLE_MEMBER},
+                ))
+            members[team.id] = [row[:3] for row in rows]
+
+            if len(batch) >= self.batch_size:
+                self.write(Membership, batch)
+                batch = []
+        self.write(Membership, batch)
+        self.write(ActivityLog, logs)
+        self.log(f"Created {sum(len(rows) for rows in members.values())} memberships.")
+        return members
+
+    def create_tasks(self, teams, members):
+        cum_weights = list(accumulate(self.team_weights))
+        statuses, status_weights = list(STATUS_WEIGHTS), list(STATUS_WEIGHTS.values())
+        through = Task.assigned_members.through
+        tasks, assignments, logs = [], [], []
+        created = 0
+
+        for team in self.rng.choices(teams, cum_weights=cum_weights, k=self.options['tasks']):
+            team_members = members[team.id]
+            created_by, creator, joined_at = self.rng.choice(team_members)
+            created_at = self.moment(joined_at)
+            status = self.rng.choices(statuses, weights=status_weights)[0]
+            assigned = self.rng.sample(team_members, min(self.rng.choice(ASSIGNEE_COUNTS), len(team_members)))
+            deleted = self.rng.random() < self.options['deleted_ratio']
+            deleted_at = self.moment(created_at) if deleted else None
+
+            task = Task(
+                id=self.uuid(),
+                title=f'{self.rng.choice(VERBS)} {self.rng.choice(WORDS)} {self.rng.choice(WORDS)}',
+                description=' '.join(self.rng.choices(WORDS, k=self.rng.randint(0, 20))),
+                status=status,
+                due_date=created_at + timedelta(days=self.rng.randint(1, 60)) if self.rng.random() < 0.7 else None,
+                team_id=team.id,
+                created_by_id=created_by,
+                assigned_to_id=assigned[0][0] if assigned else None,
+                created_at=created_at,
+                is_deleted=deleted,
+                deleted_at=deleted_at,
+            )
+            tasks.append(task)
+            assignments.extend(through(task_id=task.id, membership_id=membership_id) for membership_id, _, _ in assigned)
+
+            # History in time order: created, assigned, status changes.
+            moment = created_at
+            logs.append(ActivityLog(
+                action='task_created', performed_by_id=creator, team_id=team.id, task_id=task.id,
+                timestamp=moment, details={'title': task.title},
+            ))
+            for _, user_id, _ in assigned:
+                moment = self.moment(moment)
+                logs.append(ActivityLog(
+                    action='task_assigned', performed_by_id=creator, team_id=team.id, task_id=task.id,
+                    target_user_id=user_id, timestamp=moment, details={'assigned_to': str(user_id)},
+                ))
+            for old, new in STATUS_HISTORY[status]:
+                moment = self.moment(moment)
+                logs.append(ActivityLog(
+                    action='task_status_changed', performed_by_id=creator, team_id=team.id, task_id=task.id,
+                    timestamp=moment, details={'old': old, 'new': new},
+                ))
+            task.updated_at = max(moment, deleted_at or moment)
+
+            if len(tasks) >= self.batch_size:
+                created += self.write_tasks(tasks, assignments, logs)
+                tasks, assignments, logs = [], [], []
+        created += self.write_tasks(tasks, assignments, logs)
+        self.log(f"Created {created} tasks.")
+
+    def write_tasks(self, tasks, assignments, logs):
+        with transaction.atomic():
+            Task.objects.bulk_create(tasks, batch_size=self.batch_size)
+            Task.assigned_members.through.objects.bulk_create(assignments, batch_size=self.batch_size)
+            ActivityLog.objects.bulk_create(logs, batch_size=self.batch_size)
+        for model, objects in ((Task, tasks), (Task.assigned_members.through, assignments), (ActivityLog, logs)):
+            self.counts[model._meta.label] = self.counts.get(model._meta.label, 0) + len(objects)
+        return len(tasks)
@@ -1,3 +1,1033 @@
-from django.test import TestCase
+import gzip
+import itertools
+import json
+import tempfile
+import time
+import uuid
+from base64 import b64encode
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Count
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from companies.models import Company
+from monitoring.testing import QueryBudgetTestCase
+from teams.models import Membership, Team
+from users.models import User
+from .activity import ActivityLogWriter
+from .archive import archive_activity_logs, read_manifest
+from .bulk import bulk_update_tasks
+from .export import iter_export
+from .importer import ImportFormatError, TaskImporter, iter_json_records
+from .models import ActivityLog, Task, TeamTaskStats
+from .search import FTS_TABLE, TaskSearchFilter, search_index_available
+from .stats import apply_stat_deltas, count_tasks, reconcile_task_stats
+from .synthetic import SyntheticDataGenerator
+from .views import TaskViewSet
+
+_labels = itertools.count()
+
+
+def make_user(label=None):
+    label = label or f'user{next(_labels)}'
+    return User.objects.create_user(email=f'{label}@example.com', username=label, name=label.title(), password='pw-12345-x')
+
+
+class TaskEndpointTests(QueryBudgetTestCase):
+    def setUp(self):
+        self.admin = make_user('admin')
+        self.company = Company.objects.create(name='Acme', created_by=self.admin)
+        self.team = Team.objects.create(name='Core', company=self.company)
+        self.admin_membership = Membership.objects.create(user=self.admin, team=self.team, role=Membership.ROLE_ADMIN)
+        self.task = Task.objects.create(title='First', description='deploy', team=self.team, created_by=self.admin_membership)
+        self.client.force_authenticate(self.admin)
+
+    def grow_tasks(self, count):
+        """Tasks with two assignees each, one of them on the page's creator."""
+        member = self.members(2)[1]
+        for index in range(self.team.tasks.count(), count):
+            task = Task.objects.create(title=f'Task {index}', description='deploy', team=self.team, created_by=member, assigned_to=member)
+            task.assigned_members.add(*self.members(2))
+
+    def members(self, count):
+        for _ in range(self.team.memberships.count(), count):
+            Membership.objects.create(user=make_user(), team=self.team)
+        return list(self.team.memberships.order_by('joined_at', 'pk')[:count])
+
+    def grow_assignees(self, count):
+        self.task.assigned_members.set(self.members(count))
+
+    def test_list_queries_do_not_grow_with_tasks(self):
+        response = self.assertConstantQueries(self.grow_tasks, lambda: self.client.get('/api/tasks/'))
+
+        self.assertEqual(response.json()['count'], 100)
+
+    def test_list_queries_do_not_grow_with_assignees(self):
+        response = self.assertConstantQueries(self.grow_assignees, lambda: self.client.get('/api/tasks/'))
+
+        self.assertEqual(len(response.json()['results'][0]['assigned_members']), 100)
+
+    def test_list_queries_do_not_grow_with_team_members(self):
+        self.assertConstantQueries(self.members, lambda: self.client.get('/api/tasks/?expand=team_members'))
+
+    def test_sparse_list_queries_do_not_grow_with_tasks(self):
+        response = self.assertConstantQueries(self.grow_tasks, lambda: self.client.get('/api/tasks/?fields=id,title,status'))
+
+        self.assertEqual(set(response.json()['results'][0]), {'id', 'title', 'status'})
+
+    def test_sideloaded_list_queries_do_not_grow_with_tasks(self):
+        response = self.assertConstantQueries(self.grow_tasks, lambda: self.client.get('/api/tasks/?sideload=true'))
+
+        self.assertEqual(len(response.json()['included']['teams']), 1)
+
+    def test_cursor_list_queries_do_not_grow_with_tasks(self):
+        self.assertConstantQueries(self.grow_tasks, lambda: self.client.get('/api/tasks/?cursor='))
+
+    def test_search_queries_do_not_grow_with_tasks(self):
+        response = self.assertConstantQueries(self.grow_tasks, lambda: self.client.get('/api/tasks/?search=deploy'))
+
+        self.assertEqual(response.json()['count'], 100)
+
+    def test_retrieve_queries_do_not_grow_with_assignees(self):
+        self.assertConstantQueries(self.grow_assignees, lambda: self.client.get(f'/api/tasks/{self.task.pk}/'))
+
+    def test_partial_update_queries_do_not_grow_with_assignees(self):
+        statuses = itertools.cycle(['in_progress', 'done', 'todo'])
+
+        self.assertConstantQueries(
+            self.grow_assignees,
+            lambda: self.client.patch(f'/api/tasks/{self.task.pk}/', {'status': next(statuses)}, format='json'),
+        )
+
+    def test_create_queries_do_not_grow_with_team_members(self):
+        response = self.assertConstantQueries(
+            self.members,
+            lambda: self.client.post('/api/tasks/', {'title': 'New', 'team': str(self.team.pk)}, format='json'),
+        )
+
+        self.assertEqual(response.status_code, 201)
+
+    def test_update_queries_do_not_grow_with_assignees(self):
+        titles = itertools.cycle(['Renamed', 'First'])
+
+        response = self.assertConstantQueries(
+            self.grow_assignees,
+            lambda: self.client.put(f'/api/tasks/{self.task.pk}/', {'title': next(titles), 'team': str(self.team.pk), 'status': 'done'}, format='json'),
+        )
+
+        self.assertEqual(len(response.json()['assigned_members']), 100)
+
+    def test_update_to_another_team_renders_its_roster(self):
+        other = Team.objects.create(name='Other', company=self.company)
+        Membership.objects.create(user=self.admin, team=other, role=Membership.ROLE_ADMIN)
+        Membership.objects.create(user=make_user(), team=other)
+        body = {'title': 'Moved', 'status': 'todo'}
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.put(f'/api/tasks/{self.task.pk}/', {**body, 'team': str(self.team.pk)}, format='json')
+        rosters = [query for query in context.captured_queries if query['sql'].startswith('SELECT "teams_membership"."id", "teams_membership"."user_id"')]
+        # The roster get_queryset prefetched is reused while the team stays.
+        self.assertEqual(len(rosters), 1)
+        self.assertEqual(len(response.json()['team_members']), 1)
+
+        response = self.client.put(f'/api/tasks/{self.task.pk}/', {**body, 'team': str(other.pk)}, format='json')
+        self.assertEqual(len(response.json()['team_members']), 2)
+
+    def test_destroy_queries_do_not_grow_with_assignees(self):
+        tasks = []
+
+        def grow(count):
+            tasks[:] = [Task.objects.create(title='Doomed', team=self.team, created_by=self.admin_membership) for _ in range(2)]
+            for task in tasks:
+                task.assigned_members.set(self.members(count))
+
+        self.assertConstantQueries(grow, lambda: self.client.delete(f'/api/tasks/{tasks.pop().pk}/'))
+
+    def test_assign_queries_do_not_grow_with_team_members(self):
+        def assign():
+            user = make_user()
+            Membership.objects.create(user=user, team=self.team)
+            return self.client.post(f'/api/tasks/{self.task.pk}/assign/', {'assigned_to': user.email}, format='json')
+
+        self.assertConstantQueries(self.members, assign)
+
+    def test_activity_queries_do_not_grow_with_entries(self):
+        def grow_entries(count):
+            for _ in range(ActivityLog.objects.filter(task=self.task).count(), count):
+                ActivityLog.objects.create(action='task_assigned', performed_by=make_user(), team=self.team, task=self.task)
+
+        response = self.assertConstantQueries(grow_entries, lambda: self.client.get(f'/api/tasks/{self.task.pk}/activity/'))
+
+        self.assertEqual(len(response.json()['results']), 20)
+
+    def test_export_queries_do_not_grow_with_tasks(self):
+        def export():
+            response = self.client.get('/api/tasks/export/?export_format=ndjson')
+            response.rows = b''.join(response.streaming_content).splitlines()
+            return response
+
+        response = self.assertConstantQueries(self.grow_tasks, export)
+
+        self.assertEqual(len(response.rows), 100)
+
+    def test_export_lists_assignees_set_through_assign(self):
+        members = self.members(3)[1:]
+        for member in members:
+            self.client.post(f'/api/tasks/{self.task.pk}/assign/', {'assigned_to': member.user.email}, format='json')
+        emails = sorted(member.user.email for member in members)
+
+        ndjson = self.client.get('/api/tasks/export/?export_format=ndjson')
+        rows = [json.loads(line) for line in b''.join(ndjson.streaming_content).splitlines()]
+        self.assertEqual(rows[0]['assigned_to'], emails)
+
+        csv_export = b''.join(self.client.get('/api/tasks/export/').streaming_content).decode()
+        self.assertIn(';'.join(emails), csv_export.splitlines()[1])
+
+        Task.objects.create(title='Unassigned', team=self.team, created_by=self.admin_membership)
+        rows = [json.loads(line) for line in iter_export(Task.objects.order_by('created_at'), 'ndjson', chunk_size=1)]
+        self.assertEqual([row['assigned_to'] for row in rows], [emails, []])
+
+    def test_bulk_create_queries_do_not_grow_with_records(self):
+        size = {}
+
+        def bulk_create():
+            records = [{'title': f'Bulk {index}', 'team': str(self.team.pk)} for index in range(size['records'])]
+            return self.client.post('/api/tasks/bulk_create/', records, format='json')
+
+        # SQLite caps bound parameters per statement, so Django splits inserts
+        # into batches of 83 tasks; stay within one.
+        response = self.assertConstantQueries(lambda count: size.update(records=count), bulk_create, sizes=(1, 10, 80))
+
+        self.assertEqual(len(response.json()['created']), 80)
+
+    def test_bulk_update_queries_do_not_grow_with_tasks(self):
+        statuses = itertools.cycle(['done', 'todo'])
+
+        response = self.assertConstantQueries(
+            self.grow_tasks,
+            lambda: self.client.post('/api/tasks/bulk_update/?search=deploy', {'status': next(statuses)}, format='json'),
+        )
+
+        self.assertEqual(response.json(), {'updated': 100})
+
+    def test_create_logs_activity_and_counts(self):
+        response = self.client.post('/api/tasks/', {'title': 'New', 'team': str(self.team.pk)}, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(ActivityLog.objects.filter(action='task_created', task_id=response.json()['id']).exists())
+        self.assertEqual(TeamTaskStats.objects.get(team=self.team).todo, 2)
+
+    def test_status_change_is_logged_on_the_acting_user(self):
+        member = self.members(2)[1]
+        self.client.force_authenticate(member.user)
+
+        self.client.patch(f'/api/tasks/{self.task.pk}/', {'status': 'done'}, format='json')
+        self.client.force_authenticate(self.admin)
+        self.client.post('/api/tasks/bulk_update/?status=done', {'status': 'todo'}, format='json')
+
+        logs = ActivityLog.objects.filter(action='task_status_changed').order_by('timestamp')
+        self.assertEqual([log.performed_by_id for log in logs], [member.user_id, self.admin.pk])
+
+    def test_soft_deleted_tasks_are_hidden(self):
+        self.task.soft_delete()
+
+        self.assertEqual(self.client.get('/api/tasks/').json()['count'], 0)
+        self.assertEqual(self.client.get(f'/api/tasks/{self.task.pk}/').status_code, 404)
+
+    def test_other_teams_tasks_are_hidden(self):
+        other = Team.objects.create(name='Other', company=self.company)
+        outsider = Membership.objects.create(user=make_user(), team=other, role=Membership.ROLE_ADMIN)
+        Task.objects.create(title='Secret', team=other, created_by=outsider)
+
+        response = self.client.get('/api/tasks/')
+
+        self.assertEqual([task['title'] for task in response.json()['results']], ['First'])
+
+
+def cursor(**position):
+    return b64encode(json.dumps(position).encode('ascii')).decode('ascii')
+
+
+class TaskCursorPaginationTests(QueryBudgetTestCase):
+    def setUp(self):
+        self.admin = make_user()
+        team = Team.objects.create(name='Core', company=Company.objects.create(name='Acme', created_by=self.admin))
+        membership = Membership.objects.create(user=self.admin, team=team, role=Membership.ROLE_ADMIN)
+        soon = timezone.now() + timedelta(days=1)
+        # Every third task has no due date and the rest share four, so both
+        # the NULL branch and the pk tiebreaker are crossed between pages.
+        self.tasks = [
+            Task.objects.create(
+                title=f'Task {index}', team=team, created_by=membership,
+                due_date=None if index % 3 == 0 else soon + timedelta(days=index % 4),
+            )
+            for index in range(25)
+        ]
+        self.client.force_authenticate(self.admin)
+
+    def walk(self, url, link):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            page = [task['id'] for task in response.json()['results']]
+            ids = ids + page if link == 'next' else page + ids
+            url = response.json()[link]
+        return ids
+
+    def walk_both_ways(self, ordering, expected):
+        forward = self.walk(f'/api/tasks/?cursor=&ordering={ordering}', 'next')
+        self.assertEqual(forward, expected)
+
+        last_page = f'/api/tasks/?cursor=&ordering={ordering}'
+        while self.client.get(last_page).json()['next']:
+            last_page = self.client.get(last_page).json()['next']
+        first_of_last = self.client.get(last_page).json()['results'][0]['id']
+        backward = self.walk(self.client.get(last_page).json()['previous'], 'previous')
+        self.assertEqual(backward, expected[:expected.index(first_of_last)])
+
+    def test_created_at_order(self):
+        expected = [str(task.pk) for task in sorted(self.tasks, key=lambda task: (task.created_at, task.pk), reverse=True)]
+
+        self.walk_both_ways('-created_at', expected)
+
+    def test_due_date_order_puts_nulls_last(self):
+        dated = sorted((task for task in self.tasks if task.due_date), key=lambda task: (task.due_date, task.pk))
+        undated = sorted((task for task in self.tasks if not task.due_date), key=lambda task: task.pk)
+
+        self.walk_both_ways('due_date', [str(task.pk) for task in dated + undated])
+
+    def test_descending_due_date_order_puts_nulls_last(self):
+        dated = sorted((task for task in self.tasks if task.due_date), key=lambda task: (task.due_date, task.pk), reverse=True)
+        undated = sorted((task for task in self.tasks if not task.due_date), key=lambda task: task.pk, reverse=True)
+
+        self.walk_both_ways('-due_date', [str(task.pk) for task in dated + undated])
+
+    def test_first_page_has_no_count_or_previous_link(self):
+        body = self.client.get('/api/tasks/?cursor=').json()
+
+        self.assertNotIn('count', body)
+        self.assertIsNone(body['previous'])
+        self.assertEqual(len(body['results']), 10)
+
+    def test_tampered_cursors_are_not_found(self):
+        position = {'o': '-created_at', 'v': timezone.now().isoformat(), 'r': 0}
+        for bad in ['not-base64!', cursor(**position), cursor(**position, k='zzz'), cursor(**position, k=None),
+                    cursor(**{**position, 'v': 'yesterday'}, k=str(self.tasks[0].pk)),
+                    cursor(**{**position, 'o': 'title'}, k=str(self.tasks[0].pk))]:
+            with self.subTest(cursor=bad):
+                self.assertEqual(self.client.get('/api/tasks/', {'cursor': bad}).status_code, 404)
+
+
+class TaskSearchTests(QueryBudgetTestCase):
+    def setUp(self):
+        if not search_index_available():
+            self.skipTest('SQLite was built without FTS5.')
+        self.admin = make_user()
+        team = Team.objects.create(name='Core', company=Company.objects.create(name='Acme', created_by=self.admin))
+        self.membership = Membership.objects.create(user=self.admin, team=team, role=Membership.ROLE_ADMIN)
+        self.team = team
+        self.client.force_authenticate(self.admin)
+
+    def create(self, title, description=''):
+        return Task.objects.create(title=title, description=description, team=self.team, created_by=self.membership)
+
+    def search(self, query, **params):
+        response = self.client.get('/api/tasks/', {'search': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [task['title'] for task in response.json()['results']]
+
+    def test_title_matches_rank_above_description_matches(self):
+        self.create('Write notes', 'before the deploy')
+        self.create('Deploy the API')
+        self.create('Unrelated')
+
+        self.assertEqual(self.search('deploy'), ['Deploy the API', 'Write notes'])
+
+    def test_every_term_must_match_as_a_prefix(self):
+        self.create('Deployment checklist', 'staging')
+        self.create('Deployment checklist', 'production')
+
+        self.assertEqual(self.search('deploy prod'), ['Deployment checklist'])
+
+    def test_ordering_overrides_rank(self):
+        self.create('Deploy docs', 'deploy deploy')
+        self.create('Deploy API')
+
+        self.assertEqual(self.search('deploy', ordering='-created_at'), ['Deploy API', 'Deploy docs'])
+
+    def test_edited_and_deleted_tasks_follow_the_index(self):
+        task = self.create('Deploy API')
+        self.create('Deploy docs').soft_delete()
+        task.title = 'Release API'
+        task.save()
+
+        self.assertEqual(self.search('deploy'), [])
+        self.assertEqual(self.search('release'), ['Release API'])
+
+    def test_match_runs_once_per_query(self):
+        for index in range(5):
+            self.create(f'Deploy {index}')
+        request = APIRequestFactory().get('/api/tasks/', {'search': 'deploy'})
+
+        queryset = TaskSearchFilter().filter_queryset(Request(request), Task.objects.all(), TaskViewSet())
+        plan = queryset.explain()
+
+        # A rank computed per row shows up as a correlated subquery scanning
+        # the FTS table once for every candidate task.
+        self.assertNotIn('CORRELATED', plan)
+        self.assertEqual(plan.count(f'SCAN {FTS_TABLE} VIRTUAL TABLE'), 1)
+        self.assertEqual(queryset.count(), 5)
+
+
+class ActivityArchiveTests(QueryBudgetTestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.team = Team.objects.create(name='Core', company=Company.objects.create(name='Acme', created_by=self.user))
+        self.archive_dir = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        self.now = timezone.now()
+
+    def log(self, days_ago, **details):
+        return ActivityLog.objects.create(
+            action='member_added', performed_by=self.user, team=self.team, target_user=self.user,
+            timestamp=self.now - timedelta(days=days_ago), details=details,
+        )
+
+    def export(self, **options):
+        out = StringIO()
+        call_command('export_activity_logs', str(self.team.pk), archive_dir=str(self.archive_dir), stdout=out, **options)
+        return [json.loads(line) for line in out.getvalue().splitlines()]
+
+    def test_old_entries_move_into_monthly_segments(self):
+        old = [self.log(200, n=1), self.log(120, n=2), self.log(119, n=3)]
+        recent = self.log(1)
+
+        result = archive_activity_logs(before=self.now - timedelta(days=90), chunk_size=2, archive_dir=self.archive_dir)
+
+        self.assertEqual(result['archived'], 3)
+        self.assertEqual(list(ActivityLog.objects.values_list('pk', flat=True)), [recent.pk])
+        segments = sorted((self.archive_dir / str(self.team.pk)).glob('*.ndjson.gz'))
+        self.assertEqual(len(segments), result['segments'])
+        lines = [json.loads(line) for segment in segments for line in gzip.open(segment, 'rt', encoding='utf-8')]
+        self.assertEqual([line['id'] for line in lines], [entry.pk for entry in old])
+        self.assertEqual(lines[0]['details'], {'n': 1})
+        self.assertEqual(lines[0]['timestamp'], old[0].timestamp.isoformat())
+        self.assertEqual(lines[0]['target_user_id'], str(self.user.pk))
+        self.assertEqual(read_manifest(self.archive_dir)['last'], (old[2].timestamp, old[2].pk))
+
+    def test_export_round_trips_archived_and_hot_entries_in_order(self):
+        entries = [self.log(150), self.log(100), self.log(10), self.log(0)]
+        before = self.export()
+        call_command('archive_activity_logs', days=90, archive_dir=str(self.archive_dir), stdout=StringIO())
+
+        self.assertEqual(self.export(), before)
+        self.assertEqual([entry['id'] for entry in before], [entry.pk for entry in entries])
+        since = (self.now - timedelta(days=120)).isoformat()
+        self.assertEqual([entry['id'] for entry in self.export(since=since)], [entry.pk for entry in entries[1:]])
+
+    def test_export_reads_entries_archived_with_a_shorter_window(self):
+        archived = self.log(45)
+        call_command('archive_activity_logs', days=30, archive_dir=str(self.archive_dir), stdout=StringIO())
+
+        # Inside the default 90 day window, but already archived.
+        since = (self.now - timedelta(days=60)).isoformat()
+        self.assertEqual([entry['id'] for entry in self.export(since=since)], [archived.pk])
+
+    def test_export_skips_rows_left_behind_by_an_interrupted_run(self):
+        entry = self.log(100)
+        archive_activity_logs(before=self.now - timedelta(days=90), archive_dir=self.archive_dir)
+        # As if the process died after the append but before the delete.
+        ActivityLog.objects.create(
+            pk=entry.pk, action=entry.action, performed_by=self.user, team=self.team, timestamp=entry.timestamp,
+        )
+        backdated = self.log(100)
+
+        self.assertEqual([line['id'] for line in self.export()], [entry.pk, backdated.pk])
+
+    def test_dry_run_and_a_held_lock_change_nothing(self):
+        self.log(100)
+        out = StringIO()
+        call_command('archive_activity_logs', dry_run=True, archive_dir=str(self.archive_dir), stdout=out)
+        self.assertIn('1 entries', out.getvalue())
+
+        (self.archive_dir / '.lock').touch()
+        with self.assertRaises(CommandError):
+            call_command('archive_activity_logs', archive_dir=str(self.archive_dir), stdout=StringIO())
+        self.assertEqual(ActivityLog.objects.count(), 1)
+        self.assertIsNone(read_manifest(self.archive_dir))
+
+
+class ActivityFeedTests(QueryBudgetTestCase):
+    def setUp(self):
+        self.admin = make_user()
+        self.team = Team.objects.create(name='Core', company=Company.objects.create(name='Acme', created_by=self.admin))
+        membership = Membership.objects.create(user=self.admin, team=self.team, role=Membership.ROLE_ADMIN)
+        self.task = Task.objects.create(title='First', team=self.team, created_by=membership)
+        ActivityLog.objects.all().delete()
+        now = timezone.now()
+        # Pairs of entries share a timestamp so pages break inside ties.
+        self.entries = [
+            ActivityLog.objects.create(
+                action='task_status_changed' if index % 3 else 'task_assigned', performed_by=self.admin,
+                team=self.team, task=self.task, timestamp=now - timedelta(minutes=index // 2),
+            )
+            for index in range(45)
+        ]
+        self.client.force_authenticate(self.admin)
+
+    def newest_first(self, entries):
+        return [entry.pk for entry in sorted(entries, key=lambda entry: (entry.timestamp, entry.pk), reverse=True)]
+
+    def walk(self, url, link):
+        ids = []
+        while url:
+            body = self.client.get(url).json()
+            page = [entry['id'] for entry in body['results']]
+            ids = ids + page if link == 'next' else page + ids
+            url = body[link]
+        return ids
+
+    def test_pages_walk_forward_and_back(self):
+        for url in [f'/api/teams/{self.team.pk}/activity/', f'/api/tasks/{self.task.pk}/activity/']:
+            with self.subTest(url=url):
+                expected = self.newest_first(self.entries)
+                self.assertEqual(self.walk(url, 'next'), expected)
+
+                last = self.client.get(self.client.get(url).json()['next']).json()['next']
+                last_page = self.client.get(last).json()
+                self.assertIsNone(last_page['next'])
+                self.assertEqual([entry['id'] for entry in last_page['results']], expected[40:])
+                self.assertEqual(self.walk(last_page['previous'], 'previous'), expected[:40])
+
+    def test_action_filter(self):
+        url = f'/api/teams/{self.team.pk}/activity/?action=task_assigned'
+        expected = self.newest_first(entry for entry in self.entries if entry.action == 'task_assigned')
+
+        self.assertEqual(self.walk(url, 'next'), expected)
+        self.assertEqual(self.client.get(f'/api/teams/{self.team.pk}/activity/?action=nope').status_code, 400)
+
+    def test_tampered_cursors_are_not_found(self):
+        position = {'o': '-timestamp', 'v': timezone.now().isoformat(), 'r': 0}
+        for url in [f'/api/teams/{self.team.pk}/activity/', f'/api/tasks/{self.task.pk}/activity/']:
+            for bad in ['%%%', cursor(**position, k='abc'), cursor(**position, k=None),
+                        cursor(**{**position, 'o': '-created_at'}, k=self.entries[0].pk)]:
+                with self.subTest(url=url, cursor=bad):
+                    self.assertEqual(self.client.get(url, {'cursor': bad}).status_code, 404)
+
+    def test_outsiders_cannot_read_the_feed(self):
+        self.client.force_authenticate(make_user())
+
+        self.assertEqual(self.client.get(f'/api/teams/{self.team.pk}/activity/').status_code, 404)
+        self.assertEqual(self.client.get(f'/api/tasks/{self.task.pk}/activity/').status_code, 404)
+
+
+class TaskConditionalGetTests(QueryBudgetTestCase):
+    def setUp(self):
+        self.admin = make_user()
+        self.team = Team.objects.create(name='Core', company=Company.objects.create(name='Acme', created_by=self.admin))
+        self.membership = Membership.objects.create(user=self.admin, team=self.team, role=Membership.ROLE_ADMIN)
+        self.task = Task.objects.create(title='First', team=self.team, created_by=self.membership)
+        self.client.force_authenticate(self.admin)
+
+    def assertNotModified(self, url, etag, expected=True):
+        status_code = self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code
+        self.assertEqual(status_code, 304 if expected else 200)
+
+    def test_task_changes_bump_the_team_version(self):
+        version = Team.objects.get(pk=self.team.pk).version
+        self.task.title = 'Renamed'
+        self.task.save()
+        Task.objects.create(title='Second', team=self.team, created_by=self.membership)
+
+        self.assertEqual(Team.objects.get(pk=self.team.pk).version, version + 2)
+
+    def test_retrieve_is_not_modified_until_the_task_changes(self):
+        url = f'/api/tasks/{self.task.pk}/'
+        etag = self.client.get(url)['ETag']
+        self.assertNotModified(url, etag)
+
+        self.task.status = 'done'
+        self.task.save()
+        self.assertNotModified(url, etag, expected=False)
+
+        etag = self.client.get(url)['ETag']
+        self.task.assigned_members.add(self.membership)
+        self.assertNotModified(url, etag, expected=False)
+
+    def test_list_is_not_modified_until_a_task_is_added_or_deleted(self):
+        etag = self.client.get('/api/tasks/')['ETag']
+        self.assertNotModified('/api/tasks/', etag)
+
+        Task.objects.create(title='Second', team=self.team, created_by=self.membership)
+        self.assertNotModified('/api/tasks/', etag, expected=False)
+
+        etag = self.client.get('/api/tasks/')['ETag']
+        self.task.soft_delete()
+        self.assertNotModified('/api/tasks/', etag, expected=False)
+
+    def test_tags_are_per_user_and_per_query(self):
+        etag = self.client.get('/api/tasks/')['ETag']
+        self.assertNotModified('/api/tasks/?status=done', etag, expected=False)
+
+        other = make_user()
+        Membership.objects.create(user=other, team=self.team)
+        self.client.force_authenticate(other)
+        self.assertNotModified('/api/tasks/', etag, expected=False)
+
+    def test_wildcard_does_not_hide_missing_tasks(self):
+        self.assertEqual(self.client.get(f'/api/tasks/{uuid.uuid4()}/', HTTP_IF_NONE_MATCH='*').status_code, 404)
+        self.assertEqual(self.client.get(f'/api/tasks/{self.task.pk}/', HTTP_IF_NONE_MATCH='*').status_code, 200)
+
+
+class TaskImportTests(QueryBudgetTestCase):
+    def setUp(self):
+        self.admin = make_user()
+        self.team = Team.objects.create(name='Core', company=Company.objects.create(name='Acme', created_by=self.admin))
+        Membership.objects.create(user=self.admin, team=self.team, role=Membership.ROLE_ADMIN)
+        self.member = make_user()
+        self.member_membership = Membership.objects.create(user=self.member, team=self.team)
+        self.client.force_authenticate(self.admin)
+
+    def record(self, **fields):
+        return {'title': 'Imported', 'team': str(self.team.pk), **fields}
+
+    def test_anonymous_requests_are_rejected(self):
+        self.client.force_authenticate(None)
+
+        self.assertEqual(self.client.post('/api/tasks/bulk_create/', [self.record()], format='json').status_code, 401)
+        self.assertEqual(self.client.post('/api/tasks/bulk_update/', {'status': 'done'}, format='json').status_code, 401)
+        self.assertEqual(self.client.get('/api/tasks/export/').status_code, 401)
+        self.assertEqual(self.client.get('/api/tasks/').status_code, 401)
+        self.assertFalse(Task.objects.filter(title='Imported').exists())
+
+    def test_records_are_read_from_arrays_objects_and_ndjson(self):
+        expected = [{'n': 1}, {'n': 2}, {'n': 3}]
+        for text in ['[{"n": 1}, {"n": 2},\n {"n": 3}]', '{"n": 1}\n{"n": 2}\n\n{"n": 3}\n']:
+            with self.subTest(text=text):
+                # A tiny chunk size cuts records in half between reads.
+                self.assertEqual(list(iter_json_records(StringIO(text), chunk_size=3)), expected)
+        self.assertEqual(list(iter_json_records(StringIO('{"n": 1}'))), [{'n': 1}])
+
+        with self.assertRaises(ImportFormatError):
+            list(iter_json_records(StringIO('[{"n": 1}, {"n": ')))
+
+    def test_records_cut_at_any_point_are_read_whole(self):
+        text = '[{"title": "caf\\u00e9 \\"ok\\"", "n": [1, 2.5, true, null]}, {"title": "x"}]'
+        expected = json.loads(text)
+        for chunk_size in range(1, len(text) + 1):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(list(iter_json_records(StringIO(text), chunk_size=chunk_size)), expected)
+
+    def test_broken_json_is_reported_without_reading_the_rest(self):
+        stream = StringIO('[{"n": 1}, {"n": oops}, ' + '{"n": 2}, ' * 10000 + ']')
+        records = iter_json_records(stream, chunk_size=64)
+
+        self.assertEqual(next(records), {'n': 1})
+        with self.assertRaisesMessage(ImportFormatError, 'Invalid JSON: Expecting value'):
+            next(records)
+        self.assertLess(stream.tell(), 200)
+
+    def test_invalid_rows_are_reported_by_index_and_the_rest_imported(self):
+        other_team = Team.objects.create(name='Other', company=self.team.company)
+        records = [
+            self.record(title='Valid', assigned_to=self.member.email, status='in_progress'),
+            'not an object',
+            self.record(title='  '),
+            self.record(team=str(other_team.pk)),
+            self.record(assigned_to='nobody@example.com'),
+            self.record(assigned_to='not-a-uuid'),
+            self.record(title='Also valid', assigned_to=str(self.member_membership.pk)),
+        ]
+
+        results = list(TaskImporter(self.admin, batch_size=4).run(records))
+
+        errors = {error['index']: error['errors'] for result in results for error in result['errors']}
+        self.assertEqual(sorted(errors), [1, 2, 3, 4, 5])
+        self.assertIn('team', errors[3])
+        self.assertIn('assigned_to', errors[4])
+        created = [task_id for result in results for task_id in result['created']]
+        tasks = Task.objects.filter(pk__in=created).order_by('title')
+        self.assertEqual([task.title for task in tasks], ['Also valid', 'Valid'])
+        self.assertEqual([list(task.assigned_members.all()) for task in tasks], [[self.member_membership]] * 2)
+        self.assertEqual(ActivityLog.objects.filter(task__in=tasks, action='task_created').count(), 2)
+        self.assertEqual(ActivityLog.objects.filter(task__in=tasks, action='task_assigned').count(), 2)
+        stats = TeamTaskStats.objects.get(team=self.team)
+        self.assertEqual((stats.todo, stats.in_progress), (1, 1))
+
+    def test_members_cannot_assign(self):
+        result = next(TaskImporter(self.member).run([self.record(assigned_to=self.member.email)]))
+
+        self.assertEqual(result['created'], [])
+        self.assertIn('assigned_to', result['errors'][0]['errors'])
+
+    def test_a_failed_batch_is_retried_row_by_row(self):
+        insert = TaskImporter._insert
+
+        def fail_on(rows):
+            if len(rows) > 1 or rows[0][1].title == 'Broken':
+                raise DatabaseError('constraint failed')
+            insert(TaskImporter(self.admin), rows)
+
+        with mock.patch.object(TaskImporter, '_insert', side_effect=fail_on), self.assertLogs('tasks.importer', 'ERROR'):
+            result = next(TaskImporter(self.admin).run([self.record(title='Fine'), self.record(title='Broken')]))
+
+        self.assertEqual(Task.objects.get(pk=result['created'][0]).title, 'Fine')
+        self.assertEqual(result['errors'], [{'index': 1, 'errors': {'non_field_errors': ['constraint failed']}}])
+
+    def test_command_writes_errors_to_stderr(self):
+        path = Path(self.enterContext(tempfile.TemporaryDirectory())) / 'tasks.ndjson'
+        path.write_text('\n'.join(json.dumps(record) for record in [self.record(), self.record(title='')]), encoding='utf-8')
+        out, err = StringIO(), StringIO()
+
+        call_command('import_tasks', str(path), user=self.admin.email, stdout=out, stderr=err)
+
+        self.assertIn('Imported 1 tasks, 1 rejected.', out.getvalue())
+        self.assertEqual(json.loads(err.getvalue())['index'], 1)
+
+    def test_command_reports_progress_on_broken_json(self):
+        path = Path(self.enterContext(tempfile.TemporaryDirectory())) / 'tasks.json'
+        path.write_text(f'[{json.dumps(self.record())}, {{"title": ', encoding='utf-8')
+
+        with self.assertRaisesMessage(CommandError, 'after 1 records, 1 imported'):
+            call_command('import_tasks', str(path), user=self.admin.email, batch_size=1, stdout=StringIO(), stderr=StringIO())
+
+    def test_endpoint_status_reflects_the_outcome(self):
+        response = self.client.post('/api/tasks/bulk_create/', [self.record(), self.record(title='')], format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([error['index'] for error in response.json()['errors']], [1])
+
+        response = self.client.post('/api/tasks/bulk_create/', [self.record(title='')], format='json')
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post('/api/tasks/bulk_create/', [self.record()] * 1001, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'detail': 'At most 1000 tasks per request, use the import_tasks command for more.'})
+
+
+class TaskBulkUpdateTests(QueryBudgetTestCase):
+    def setUp(self):
+        self.admin = make_user()
+        company = Company.objects.create(name='Acme', created_by=self.admin)
+        self.team = Team.objects.create(name='Core', company=company)
+        self.membership = Membership.objects.create(user=self.admin, team=self.team, role=Membership.ROLE_ADMIN)
+        # The user is only a member here, so bulk updates must skip it.
+        self.other_team = Team.objects.create(name='Other', company=company)
+        other_admin = Membership.objects.create(user=make_user(), team=self.other_team, role=Membership.ROLE_ADMIN)
+        Membership.objects.create(user=self.admin, team=self.other_team)
+        statuses = ['todo', 'todo', 'in_progress', 'done', 'todo']
+        self.tasks = [
+            Task.objects.create(title=f'Task {index}', team=self.team, created_by=self.membership, status=status)
+            for index, status in enumerate(statuses)
+        ]
+        self.foreign = Task.objects.create(title='Foreign', team=self.other_team, created_by=other_admin)
+        self.client.force_authenticate(self.admin)
+
+    def bulk_update(self, query, body):
+        return self.client.post(f'/api/tasks/bulk_update/?{query}', body, format='json')
+
+    def assertCountersMatchTasks(self, team):
+        stats = TeamTaskStats.objects.get(team=team)
+        self.assertEqual({status: getattr(stats, status) for status in ('todo', 'in_progress', 'done')}, count_tasks([team.pk])[team.pk])
+
+    def test_status_change_moves_counters_and_logs_changed_tasks(self):
+        version = Team.objects.get(pk=self.team.pk).version
+        ActivityLog.objects.all().delete()
+
+        response = self.bulk_update('status=todo', {'status': 'done'})
+
+        self.assertEqual(response.json(), {'updated': 3})
+        self.assertEqual(Task.objects.filter(team=self.team, status='done').count(), 4)
+        self.assertEqual(Task.objects.get(pk=self.foreign.pk).status, 'todo')
+        self.assertCountersMatchTasks(self.team)
+        self.assertCountersMatchTasks(self.other_team)
+        logs = ActivityLog.objects.filter(action='task_status_changed')
+        self.assertEqual(logs.count(), 3)
+        self.assertEqual(logs.first().details, {'old': 'todo', 'new': 'done'})
+        self.assertEqual(Team.objects.get(pk=self.team.pk).version, version + 1)
+
+    def test_unchanged_tasks_are_counted_but_not_logged(self):
+        ActivityLog.objects.all().delete()
+
+        response = self.bulk_update('search=task', {'status': 'todo'})
+
+        self.assertEqual(response.json(), {'updated': 5})
+        self.assertEqual(ActivityLog.objects.count(), 2)
+        self.assertCountersMatchTasks(self.team)
+
+    def test_delete_soft_deletes_and_decrements(self):
+        response = self.bulk_update('status=todo', {'delete': True})
+
+        self.assertEqual(response.json(), {'deleted': 3})
+        self.assertEqual(Task.objects.filter(team=self.team, is_deleted=True).count(), 3)
+        self.assertTrue(Task.objects.filter(pk__in=[self.tasks[0].pk], deleted_at__isnull=False).exists())
+        self.assertCountersMatchTasks(self.team)
+        self.assertEqual(TeamTaskStats.objects.get(team=self.team).total, 2)
+
+    def test_due_date_patch_leaves_counters_alone(self):
+        due = timezone.now() + timedelta(days=3)
+
+        self.assertEqual(self.bulk_update('status=done', {'due_date': due.isoformat()}).json(), {'updated': 1})
+        self.assertEqual(Task.objects.get(pk=self.tasks[3].pk).due_date, due)
+        self.assertCountersMatchTasks(self.team)
+
+    def test_chunks_cover_every_task(self):
+        queryset = Task.objects.filter(team=self.team)
+
+        self.assertEqual(bulk_update_tasks(queryset, self.admin, {'status': 'in_progress'}, chunk_size=2), 5)
+        self.assertEqual(Task.objects.filter(team=self.team, status='in_progress').count(), 5)
+        self.assertCountersMatchTasks(self.team)
+
+    def test_filter_and_body_are_required(self):
+        self.assertEqual(self.bulk_update('', {'status': 'done'}).status_code, 400)
+        self.assertEqual(self.bulk_update('status=todo', {}).status_code, 400)
+        self.assertEqual(self.bulk_update('status=todo', {'status': 'done', 'delete': True}).status_code, 400)
+        self.assertEqual(Task.objects.filter(status='done').count(), 1)
+
+
+class TeamTaskStatsTests(QueryBudgetTestCase):
+    def setUp(self):
+        self.admin = make_user()
+        company = Company.objects.create(name='Acme', created_by=self.admin)
+        self.team = Team.objects.create(name='Core', company=company)
+        self.other_team = Team.objects.create(name='Other', company=company)
+        self.membership = Membership.objects.create(user=self.admin, team=self.team, role=Membership.ROLE_ADMIN)
+        self.client.force_authenticate(self.admin)
+
+    def create(self, status='todo', **fields):
+        return Task.objects.create(title='Task', team=self.team, created_by=self.membership, status=status, **fields)
+
+    def counters(self, team=None):
+        stats = TeamTaskStats.objects.filter(team=team or self.team).first()
+        return (stats.todo, stats.in_progress, stats.done) if stats else None
+
+    def test_counters_follow_task_writes(self):
+        task = self.create()
+        self.create('done')
+        self.assertEqual(self.counters(), (1, 0, 1))
+
+        task.status = 'in_progress'
+        task.save()
+        self.assertEqual(self.counters(), (0, 1, 1))
+
+        task.team = self.other_team
+        task.save()
+        self.assertEqual(self.counters(), (0, 0, 1))
+        self.assertEqual(self.counters(self.other_team), (0, 1, 0))
+
+        task.soft_delete()
+        self.assertEqual(self.counters(self.other_team), (0, 0, 0))
+        task.is_deleted = False
+        task.save()
+        self.assertEqual(self.counters(self.other_team), (0, 1, 0))
+
+        task.delete()
+        self.assertEqual(self.counters(self.other_team), (0, 0, 0))
+
+    def stat_updates(self, deletable):
+        with CaptureQueriesContext(connection) as context:
+            deletable.delete()
+        return [query['sql'] for query in context.captured_queries if query['sql'].startswith('UPDATE "tasks_teamtaskstats"')]
+
+    def test_deleting_a_team_does_not_touch_its_counters_per_task(self):
+        for status in ('todo', 'todo', 'done'):
+            self.create(status)
+
+        self.assertEqual(self.stat_updates(self.team), [])
+        self.assertFalse(TeamTaskStats.objects.filter(team_id=self.team.pk).exists())
+
+    def test_a_cascade_updates_each_surviving_team_once(self):
+        for status in ('todo', 'todo', 'done', 'in_progress'):
+            self.create(status)
+        Task.objects.create(title='Other', team=self.other_team, created_by=self.membership)
+
+        self.assertEqual(len(self.stat_updates(self.membership)), 2)
+        self.assertEqual(self.counters(), (0, 0, 0))
+        self.assertEqual(self.counters(self.other_team), (0, 0, 0))
+
+    def test_a_lost_row_is_recreated_from_a_count(self):
+        self.create()
+        self.create('done')
+        TeamTaskStats.objects.filter(team=self.team).delete()
+
+        self.create('in_progress')
+
+        self.assertEqual(self.counters(), (1, 1, 1))
+
+    def test_removals_without_a_row_do_not_create_one(self):
+        apply_stat_deltas({(self.team.pk, 'todo'): -1})
+
+        self.assertIsNone(self.counters())
+
+    def test_endpoint_counts_overdue_on_read(self):
+        past, future = timezone.now() - timedelta(days=1), timezone.now() + timedelta(days=1)
+        self.create(due_date=past)
+        self.create('in_progress', due_date=past)
+        self.create('done', due_date=past)
+        self.create(due_date=future)
+        self.create(due_date=past).soft_delete()
+
+        body = self.client.get(f'/api/teams/{self.team.pk}/stats/').json()
+
+        self.assertEqual(
+            {key: body[key] for key in ('todo', 'in_progress', 'done', 'total', 'overdue')},
+            {'todo': 2, 'in_progress': 1, 'done': 1, 'total': 4, 'overdue': 2},
+        )
+
+    def test_reconcile_repairs_drift_and_missing_rows(self):
+        self.create()
+        self.create('done')
+        Task.objects.create(title='Other', team=self.other_team, created_by=self.membership)
+        TeamTaskStats.objects.filter(team=self.team).update(todo=7, done=0)
+        TeamTaskStats.objects.filter(team=self.other_team).delete()
+        empty = Team.objects.create(name='Empty', company=self.team.company)
+
+        result = reconcile_task_stats(batch_size=2)
+
+        self.assertEqual(result, {'checked': 3, 'repaired': 2})
+        self.assertEqual(self.counters(), (1, 0, 1))
+        self.assertEqual(self.counters(self.other_team), (1, 0, 0))
+        self.assertEqual(self.counters(empty), (0, 0, 0))
+        self.assertEqual(reconcile_task_stats(), {'checked': 3, 'repaired': 0})
+
+    def test_reconcile_command(self):
+        self.create()
+        TeamTaskStats.objects.filter(team=self.team).update(todo=0)
+        out = StringIO()
+
+        call_command('reconcile_task_stats', batch_size=1, stdout=out)
+
+        self.assertIn('Checked 2 teams, repaired 1.', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('reconcile_task_stats', batch_size=0, stdout=StringIO())
+
+
+
+class SyntheticDataGeneratorTests(QueryBudgetTestCase):
+    options = {'users': 20, 'companies': 2, 'teams': 6, 'members_per_team': 4, 'tasks': 80, 'batch_size': 7}
+
+    def generate(self, **options):
+        return SyntheticDataGenerator(**{**self.options, **options}).run()
+
+    def snapshot(self):
+        return (
+            sorted(User.objects.values_list('id', 'username')),
+            sorted(Team.objects.values_list('id', 'company_id')),
+            sorted(Membership.objects.values_list('id', 'user_id', 'team_id', 'role')),
+            sorted(Task.objects.values_list('id', 'title', 'status', 'team_id', 'created_by_id', 'assigned_to_id', 'is_deleted')),
+            sorted(Task.assigned_members.through.objects.values_list('task_id', 'membership_id')),
+        )
+
+    def team_sizes(self):
+        return sorted(Team.objects.annotate(size=Count('memberships')).values_list('size', flat=True))
+
+    def test_same_seed_gives_the_same_rows(self):
+        self.generate(seed=7)
+        first = self.snapshot()
+        User.objects.all().delete()
+
+        self.generate(seed=7)
+        self.assertEqual(self.snapshot(), first)
+
+        User.objects.all().delete()
+        self.generate(seed=8)
+        self.assertNotEqual(self.snapshot(), first)
+
+    def test_row_counts_match_the_requested_sizes(self):
+        counts = self.generate()
+
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Company.objects.count(), 2)
+        self.assertEqual(Team.objects.count(), 6)
+        self.assertEqual(Task.objects.count(), 80)
+        self.assertEqual(counts['users.User'], 20)
+        self.assertEqual(counts['tasks.Task'], 80)
+        self.assertEqual(counts['teams.Membership'], Membership.objects.count())
+        self.assertEqual(counts['tasks.ActivityLog'], ActivityLog.objects.count())
+        self.assertEqual(sum(stats.total for stats in TeamTaskStats.objects.all()), Task.objects.filter(is_deleted=False).count())
+
+    def test_team_sizes_follow_the_skew(self):
+        self.generate(skew=0)
+        self.assertEqual(self.team_sizes(), [4] * 6)
+
+        User.objects.all().delete()
+        self.generate(skew=2)
+        sizes = self.team_sizes()
+        self.assertGreaterEqual(sizes[-1], 3 * 4)
+        self.assertLessEqual(sizes[0], 2)
+        # Task counts follow the same weights: the biggest team owns the most tasks.
+        biggest = Team.objects.annotate(size=Count('memberships')).order_by('-size').first()
+        busiest = Team.objects.annotate(count=Count('tasks')).order_by('-count').first()
+        self.assertEqual(biggest, busiest)
+
+
+@override_settings(
+    ACTIVITY_LOG_WRITER={'BUFFERED': True, 'BATCH_SIZE': 3, 'FLUSH_INTERVAL': 0.2},
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+)
+class BufferedActivityLogWriterTests(TransactionTestCase):
+    """The production write path: rows are queued on commit and written in batches."""
+
+    def setUp(self):
+        self.user = make_user()
+        self.writer = ActivityLogWriter()
+        self.addCleanup(self.writer.flush)
+
+    def record(self, **fields):
+        return self.writer.record(action='task_created', performed_by=self.user, details={}, **fields)
+
+    def wait_for_rows(self, count, timeout=5):
+        deadline = time.monotonic() + timeout
+        while ActivityLog.objects.count() < count and time.monotonic() < deadline:
+            time.sleep(0.02)
+        return ActivityLog.objects.count()
+
+    def test_a_full_batch_is_written_at_once(self):
+        self.record()
+        self.record()
+        self.assertEqual((self.writer.pending(), ActivityLog.objects.count()), (2, 0))
+
+        self.record()
+
+        self.assertEqual((self.writer.pending(), ActivityLog.objects.count()), (0, 3))
+
+    def test_the_timer_writes_a_partial_batch(self):
+        self.record()
+
+        self.assertEqual(self.wait_for_rows(1), 1)
+        self.assertEqual(self.writer.pending(), 0)
+
+    def test_rows_are_queued_when_the_transaction_commits(self):
+        with transaction.atomic():
+            self.record()
+            self.assertEqual(self.writer.pending(), 0)
+        self.assertEqual(self.writer.pending(), 1)
+
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.record()
+            raise RuntimeError
+        self.assertEqual(self.writer.pending(), 1)
+
+        self.assertEqual(self.writer.flush(), 1)
+        self.assertEqual(ActivityLog.objects.count(), 1)
+
+    def test_a_failed_batch_is_retried_row_by_row(self):
+        self.record()
+        # References a task that does not exist.
+        self.record(task_id=uuid.uuid4())
+
+        with self.assertLogs('tasks.activity', 'ERROR') as logs:
+            self.record()
+
+        self.assertEqual(ActivityLog.objects.count(), 2)
+        self.assertEqual(self.writer.pending(), 0)
+        self.assertIn('retrying one by one', logs.output[0])
+        self.assertIn("Dropping activity log entry 'task_created'", logs.output[1])
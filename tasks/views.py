@@ -2,24 +2,155 @@ from rest_framework import viewsets, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.exceptions import ValidationError, PermissionDenied
+from rest_framework.permissions import IsAuthenticated
+from django.http import StreamingHttpResponse
+from django.db.models import Prefetch, prefetch_related_objects
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
+from monitoring.profiling import ProfilingMixin
 from tasks.permissions import IsTaskTeamMember, IsTeamAdmin
+from teams.access import get_membership_resolver
 from teams.models import Team, Membership
-from .models import Task
-from .serializers import TaskSerializer
+from teams.scoping import visible_tasks
+from teams.versions import ConditionalGetMixin
+from .activity import record_activity
+from .export import EXPORT_FORMATS, iter_export
+from .importer import TaskImporter
+from .bulk import bulk_update_tasks
+from .models import ActivityLog
+from .pagination import ActivityFeedPagination, TaskPagination
+from .search import TaskSearchFilter
+from .serializers import TaskSerializer, TaskSideloadSerializer, ActivityLogSerializer, TaskBulkUpdateSerializer
+from .sideload import attach_assigned_member_ids, build_included
 
 
-class TaskViewSet(viewsets.ModelViewSet):
+BULK_CREATE_MAX_ROWS = 1000
+
+
+def task_member_prefetches(fields=None):
+    """Prefetches for the TaskSerializer roster fields in `fields` (None: all)."""
+    member_queryset = Membership.objects.select_related('user')
+    prefetches = {
+        'team_members': Prefetch('team__memberships', queryset=member_queryset),
+        'assigned_members': Prefetch('assigned_members', queryset=member_queryset),
+    }
+    return [prefetch for name, prefetch in prefetches.items() if fields is None or name in fields]
+
+
+TASK_FILTER_PARAMETERS = [
+    openapi.Parameter('status', openapi.IN_QUERY, description="Filter by task status", type=openapi.TYPE_STRING),
+    openapi.Parameter('assigned_to', openapi.IN_QUERY, description="Filter by assigned membership ID", type=openapi.TYPE_STRING, format=openapi.FORMAT_UUID),
+    openapi.Parameter('due_date', openapi.IN_QUERY, description="Filter by due date", type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
+    openapi.Parameter('search', openapi.IN_QUERY, description="Full-text search in title and description (prefix match, ranked by relevance unless ordering is given)", type=openapi.TYPE_STRING),
+    openapi.Parameter('ordering', openapi.IN_QUERY, description="Order by field (created_at, due_date)", type=openapi.TYPE_STRING),
+]
+
+TASK_FIELDS_PARAMETERS = [
+    openapi.Parameter('fields', openapi.IN_QUERY, description="Only render these fields (comma separated). team_members and assigned_members are left out unless listed here or in expand.", type=openapi.TYPE_STRING),
+    openapi.Parameter('expand', openapi.IN_QUERY, description="Add team_members and/or assigned_members (comma separated). With expand or fields present, the rosters are only loaded when requested.", type=openapi.TYPE_STRING),
+]
+
+ACTIVITY_FEED_PARAMETERS = [
+    openapi.Parameter('action', openapi.IN_QUERY, description="Only return these actions (comma separated, e.g. task_created,task_assigned)", type=openapi.TYPE_STRING),
+    openapi.Parameter('cursor', openapi.IN_QUERY, description="Cursor from the next/previous link of a previous page", type=openapi.TYPE_STRING),
+]
+
+
+class ActivityFeedMixin:
+    """
+    Serves a newest-first ActivityLog feed with keyset pagination. Every page
+    is a single indexed query, whatever the size of the log.
+    """
+
+    def activity_feed(self, request, queryset):
+        actions = [value.strip() for value in request.query_params.get('action', '').split(',') if value.strip()]
+        if actions:
+            valid_actions = {choice for choice, _ in ActivityLog.ACTION_CHOICES}
+            unknown = sorted(set(actions) - valid_actions)
+            if unknown:
+                raise ValidationError({'action': f'Unknown action(s): {", ".join(unknown)}. Valid actions: {", ".join(sorted(valid_actions))}.'})
+            queryset = queryset.filter(action__in=actions)
+
+        queryset = queryset.select_related('performed_by', 'target_user')
+        paginator = ActivityFeedPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = ActivityLogSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+
+class TaskViewSet(ProfilingMixin, ActivityFeedMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = TaskSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    pagination_class = TaskPagination
+    filter_backends = [DjangoFilterBackend, TaskSearchFilter, filters.OrderingFilter]
     filterset_fields = ['status', 'assigned_to', 'due_date']
     search_fields = ['title', 'description']
     ordering_fields = ['created_at', 'due_date']
 
+    def get_base_queryset(self):
+        return visible_tasks(self.request.user).filter(is_deleted=False)
+
     def get_queryset(self):
-        return Task.objects.filter(team__memberships__user=self.request.user, is_deleted=False)
+        # Load every relation the rendered fields walk up front so a page
+        # costs a fixed number of queries no matter how large the team is,
+        # and nothing for fields left out with ?fields= / ?expand=.
+        if self.is_sideloaded():
+            # Members come from build_included, once per page.
+            return self.get_base_queryset()
+
+        fields = self.get_selected_fields()
+        related = []
+        if fields is None or 'team_members' in fields:
+            related.append('team')
+        if fields is None or 'created_by' in fields:
+            related.append('created_by__user')
+        return (
+            self.get_base_queryset()
+            .select_related(*related)
+            .prefetch_related(*task_member_prefetches(fields))
+        )
+
+    def get_selected_fields(self):
+        """
+        Field names to render from `?fields=` (comma separated) and
+        `?expand=` (EXPANDABLE_FIELDS to add), or None to render all of
+        them when neither is given. Only applies to list and retrieve.
+        """
+        if hasattr(self, '_selected_fields'):
+            return self._selected_fields
+
+        self._selected_fields = None
+        params = self.request.query_params if self.request else {}
+        if self.action not in ('list', 'retrieve') or ('fields' not in params and 'expand' not in params):
+            return None
+
+        def split(name):
+            return {value.strip() for value in params.get(name, '').split(',') if value.strip()}
+
+        available = set(TaskSerializer().fields)
+        expandable = set(TaskSerializer.EXPANDABLE_FIELDS)
+        fields, expand = split('fields'), split('expand')
+        unknown = fields - available
+        if unknown:
+            raise ValidationError({'fields': f'Unknown field(s): {", ".join(sorted(unknown))}.'})
+        if expand - expandable:
+            raise ValidationError({'expand': f'Can only expand: {", ".join(TaskSerializer.EXPANDABLE_FIELDS)}.'})
+
+        self._selected_fields = (fields or available - expandable) | expand
+        return self._selected_fields
+
+    def is_sideloaded(self):
+        return self.action == 'list' and self.request.query_params.get('sideload', '').lower() in ('1', 'true', 'yes')
+
+    def get_serializer_class(self):
+        if self.is_sideloaded():
+            return TaskSideloadSerializer
+        return TaskSerializer
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'] = self.get_selected_fields()
+        return context
     
     @swagger_auto_schema(
         operation_summary="Create a new task",
@@ -41,35 +172,51 @@ class TaskViewSet(viewsets.ModelViewSet):
     
     @swagger_auto_schema(
         operation_summary="List tasks",
-        operation_description="List all tasks in teams where the user is a member. Supports filtering by status, assigned_to, due_date and search by title/description.",
+        operation_description="List all tasks in teams where the user is a member. Supports filtering by status, assigned_to, due_date and search by title/description. Passing `cursor` switches to cursor pagination, which has no total count but stays fast on deep pages.",
         security=[{'Bearer': []}],
-        manual_parameters=[
-            openapi.Parameter('status', openapi.IN_QUERY, description="Filter by task status", type=openapi.TYPE_STRING),
-            openapi.Parameter('assigned_to', openapi.IN_QUERY, description="Filter by assigned membership ID", type=openapi.TYPE_STRING, format=openapi.FORMAT_UUID),
-            openapi.Parameter('due_date', openapi.IN_QUERY, description="Filter by due date", type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
-            openapi.Parameter('search', openapi.IN_QUERY, description="Search in title and description", type=openapi.TYPE_STRING),
-            openapi.Parameter('ordering', openapi.IN_QUERY, description="Order by field (created_at, due_date)", type=openapi.TYPE_STRING),
+        manual_parameters=TASK_FILTER_PARAMETERS + TASK_FIELDS_PARAMETERS + [
+            openapi.Parameter('sideload', openapi.IN_QUERY, description="true: tasks reference memberships by id (team_members is dropped, assigned_members and created_by are membership ids) and a top-level included section lists each team, membership and user once", type=openapi.TYPE_BOOLEAN),
+            openapi.Parameter('cursor', openapi.IN_QUERY, description="Use cursor pagination instead of page numbers. Pass an empty value for the first page, then follow the next/previous links.", type=openapi.TYPE_STRING),
         ],
         responses={
             200: openapi.Response(
                 description="List of tasks",
                 schema=TaskSerializer(many=True)
             ),
+            304: "Not modified since the ETag sent in If-None-Match",
             401: "Authentication credentials were not provided"
         }
     )
     def list(self, request, *args, **kwargs):
+        if self.is_sideloaded():
+            return self.conditional_response(request, self.sideloaded_list, *args, **kwargs)
         return super().list(request, *args, **kwargs)
+
+    def sideloaded_list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        tasks = list(queryset) if page is None else page
+
+        attach_assigned_member_ids(tasks)
+        data = self.get_serializer(tasks, many=True).data
+        if page is None:
+            return Response({'results': data, 'included': build_included(tasks)})
+
+        response = self.get_paginated_response(data)
+        response.data['included'] = build_included(tasks)
+        return response
     
     @swagger_auto_schema(
         operation_summary="Retrieve task details",
         operation_description="Get details of a specific task. User must be a team member.",
         security=[{'Bearer': []}],
+        manual_parameters=TASK_FIELDS_PARAMETERS,
         responses={
             200: openapi.Response(
                 description="Task details",
                 schema=TaskSerializer
             ),
+            304: "Not modified since the ETag sent in If-None-Match",
             401: "Authentication credentials were not provided",
             404: "Task not found"
         }
@@ -101,19 +248,27 @@ class TaskViewSet(viewsets.ModelViewSet):
         if not team:
             raise ValidationError({"team": "This field is required."})
         
-        try:
-            membership = team.memberships.get(user=self.request.user)
-        except Membership.DoesNotExist:
+        membership = get_membership_resolver(self.request).membership(team.pk)
+        if membership is None:
             raise PermissionDenied("You must be a member of the team to create tasks.")
         
-        serializer.save(created_by=membership, team=team, assigned_to=None)
+        task = serializer.save(created_by=membership, team=team, assigned_to=None)
+        # The response embeds the team's roster.
+        prefetch_related_objects([task], *task_member_prefetches())
+
+    def perform_update(self, serializer):
+        serializer.instance.changed_by = self.request.user
+        serializer.save()
 
     def get_permissions(self):
+        # The team checks are object permissions only; IsAuthenticated turns
+        # anonymous requests to list, create and the collection actions
+        # (export, bulk_create, bulk_update) away with a 401.
         if self.action == 'destroy':
-            return [IsTeamAdmin()]
+            return [IsAuthenticated(), IsTeamAdmin()]
         elif self.action in ['update', 'partial_update']:
-            return [IsTaskTeamMember()]
-        return [IsTaskTeamMember()]
+            return [IsAuthenticated(), IsTaskTeamMember()]
+        return [IsAuthenticated(), IsTaskTeamMember()]
     
     @swagger_auto_schema(
         operation_summary="Update task",
@@ -136,8 +291,7 @@ class TaskViewSet(viewsets.ModelViewSet):
         partial = kwargs.pop('partial', False)
         instance = self.get_object()
         
-        membership = instance.team.memberships.filter(user=request.user).first()
-        is_admin = membership and membership.role == 'admin'
+        is_admin = get_membership_resolver(request).is_admin(instance.team_id)
         
         serializer = self.get_serializer(instance, data=request.data, partial=partial)
         serializer.is_valid(raise_exception=True)
@@ -152,7 +306,17 @@ class TaskViewSet(viewsets.ModelViewSet):
                     'detail': f'Members can only update status and description. Restricted fields: {", ".join(restricted_fields)}'
                 })
         
+        team = instance.team
         self.perform_update(serializer)
+        # A PUT always sets team, to a Team without the roster get_queryset
+        # prefetched; keep the prefetched one unless the task really moved.
+        if instance.team_id == team.pk:
+            instance.team = team
+
+        # Only runs queries when the update moved the task to another team,
+        # everything else is still cached from get_queryset.
+        prefetch_related_objects([instance], *task_member_prefetches())
+
         return Response(serializer.data)
     
     @swagger_auto_schema(
@@ -206,8 +370,7 @@ class TaskViewSet(viewsets.ModelViewSet):
         
         task = self.get_object()
         
-        membership = task.team.memberships.filter(user=request.user).first()
-        if not membership or membership.role != 'admin':
+        if not get_membership_resolver(request).is_admin(task.team_id):
             raise PermissionDenied("Only team admins can assign tasks.")
         
         assigned_to_value = request.data.get('assigned_to')
@@ -234,9 +397,9 @@ class TaskViewSet(viewsets.ModelViewSet):
             
             task.assigned_members.add(assigned_membership)
             task.save()
+            prefetch_related_objects([task], *task_member_prefetches())
             
-            from .models import ActivityLog
-            ActivityLog.objects.create(
+            record_activity(
                 action='task_assigned',
                 performed_by=request.user,
                 team=task.team,
@@ -256,3 +419,126 @@ class TaskViewSet(viewsets.ModelViewSet):
                 "assigned_to": "Invalid format. Please provide a valid membership ID (UUID) or user email."
             })
 
+    @swagger_auto_schema(
+        operation_summary="Task activity feed",
+        operation_description="Activity log entries for a task, newest first. User must be a team member.",
+        security=[{'Bearer': []}],
+        manual_parameters=ACTIVITY_FEED_PARAMETERS,
+        responses={
+            200: openapi.Response(
+                description="Page of activity log entries",
+                schema=ActivityLogSerializer(many=True)
+            ),
+            400: "Unknown action filter",
+            401: "Authentication credentials were not provided",
+            404: "Task not found or invalid cursor"
+        }
+    )
+    @action(detail=True, methods=['get'], permission_classes=[IsTaskTeamMember])
+    def activity(self, request, pk=None):
+        task = self.get_object()
+        return self.activity_feed(request, ActivityLog.objects.filter(task=task))
+
+    @swagger_auto_schema(
+        operation_summary="Export tasks",
+        operation_description="Stream every task matching the list filters, search and ordering as CSV or NDJSON, unpaginated. Without ordering or search, tasks come newest first.",
+        security=[{'Bearer': []}],
+        manual_parameters=TASK_FILTER_PARAMETERS + [
+            openapi.Parameter('export_format', openapi.IN_QUERY, description="csv (default) or ndjson", type=openapi.TYPE_STRING, enum=['csv', 'ndjson']),
+        ],
+        responses={
+            200: "CSV or NDJSON stream, one row per task. assigned_to lists the assignees' emails (separated by ; in CSV)",
+            400: "Unknown export format or invalid filter",
+            401: "Authentication credentials were not provided"
+        }
+    )
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        export_format = request.query_params.get('export_format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            raise ValidationError({'export_format': f'Must be one of: {", ".join(EXPORT_FORMATS)}.'})
+
+        # Rows are read with values_list() in chunks and written as they
+        # arrive, so memory stays flat however many tasks match.
+        queryset = self.filter_queryset(self.get_base_queryset())
+        if not queryset.ordered:
+            queryset = queryset.order_by('-created_at', '-pk')
+
+        content_type, extension = EXPORT_FORMATS[export_format]
+        response = StreamingHttpResponse(iter_export(queryset, export_format), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="tasks.{extension}"'
+        return response
+
+    @swagger_auto_schema(
+        operation_summary="Create tasks in bulk",
+        operation_description=f"Create up to {BULK_CREATE_MAX_ROWS} tasks from a JSON array of records shaped like sample_task_data.json. The user must be a member of each record's team; assigned_to (membership ID or user email) needs team admin rights. Invalid rows are reported by index and do not stop the others.",
+        request_body=openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_OBJECT)),
+        security=[{'Bearer': []}],
+        responses={
+            201: openapi.Response(
+                description="Tasks created. `errors` lists rejected rows by index.",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        'created': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_UUID)),
+                        'errors': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_OBJECT)),
+                    }
+                )
+            ),
+            400: "Body is not a list, too many rows, or no row was valid",
+            401: "Authentication credentials were not provided"
+        }
+    )
+    @action(detail=False, methods=['post'])
+    def bulk_create(self, request):
+        records = request.data
+        if not isinstance(records, list):
+            raise ValidationError({'detail': 'Expected a list of task records.'})
+        if len(records) > BULK_CREATE_MAX_ROWS:
+            raise ValidationError({'detail': f'At most {BULK_CREATE_MAX_ROWS} tasks per request, use the import_tasks command for more.'})
+
+        created, errors = [], []
+        for result in TaskImporter(request.user).run(records):
+            created.extend(str(task_id) for task_id in result['created'])
+            errors.extend(result['errors'])
+
+        response_status = status.HTTP_201_CREATED if created or not errors else status.HTTP_400_BAD_REQUEST
+        return Response({'created': created, 'errors': errors}, status=response_status)
+
+    @swagger_auto_schema(
+        operation_summary="Update or delete tasks in bulk",
+        operation_description="Apply a patch (status, due_date) or a soft delete to every task matching the list filters, in teams where the user is admin. Tasks of other teams are left untouched. At least one filter is required.",
+        manual_parameters=TASK_FILTER_PARAMETERS,
+        request_body=TaskBulkUpdateSerializer,
+        security=[{'Bearer': []}],
+        responses={
+            200: openapi.Response(
+                description="Number of tasks updated or deleted",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        'updated': openapi.Schema(type=openapi.TYPE_INTEGER),
+                        'deleted': openapi.Schema(type=openapi.TYPE_INTEGER),
+                    }
+                )
+            ),
+            400: "Validation Error or no filter given",
+            401: "Authentication credentials were not provided"
+        }
+    )
+    @action(detail=False, methods=['post'])
+    def bulk_update(self, request):
+        serializer = TaskBulkUpdateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        filter_params = {'status', 'assigned_to', 'due_date', 'search'}
+        if not filter_params & {key for key, value in request.query_params.items() if value}:
+            raise ValidationError({'detail': f'Pass at least one filter ({", ".join(sorted(filter_params))}).'})
+
+        admin_team_ids = get_membership_resolver(request).admin_team_ids()
+        queryset = self.filter_queryset(self.get_base_queryset()).filter(team_id__in=admin_team_ids)
+
+        data = dict(serializer.validated_data)
+        delete = data.pop('delete')
+        count = bulk_update_tasks(queryset, request.user, data, delete=delete)
+        return Response({'deleted' if delete else 'updated': count})
@@ -45,11 +45,14 @@ INSTALLED_APPS = [
     'users',
     'companies',
     'teams',
-    'tasks'
+    'tasks',
+    'monitoring',
 ]
 
 MIDDLEWARE = [
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'monitoring.middleware.MetricsMiddleware',
+    'monitoring.middleware.QueryInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -82,6 +85,22 @@ REST_FRAMEWORK = {
     'UNAUTHENTICATED_TOKEN': None,
 }
 
+# ActivityLog rows are buffered per process and written in batches, see
+# tasks/activity.py. Set BUFFERED to False to write each row immediately.
+ACTIVITY_LOG_WRITER = {
+    'BUFFERED': True,
+    'BATCH_SIZE': 200,
+    'FLUSH_INTERVAL': 2.0,
+}
+
+# Entries older than HOT_DAYS are moved to gzipped NDJSON segments (one per
+# team per month) by `manage.py archive_activity_logs`, see tasks/archive.py.
+ACTIVITY_LOG_RETENTION = {
+    'HOT_DAYS': 90,
+    'ARCHIVE_DIR': BASE_DIR / 'archive' / 'activity_logs',
+    'CHUNK_SIZE': 500,
+}
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
@@ -118,6 +137,96 @@ DATABASES = {
 }
 
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Shared by every worker process on the host so membership changes made
+    # in one process invalidate the cached roles in all of them. Plain
+    # FileBasedCache lists the directory on every write to cull it; this one
+    # does so at most every CULL_INTERVAL seconds, see teams/caches.py.
+    'memberships': {
+        'BACKEND': 'teams.caches.PeriodicCullFileBasedCache',
+        'LOCATION': BASE_DIR / '.cache' / 'memberships',
+        'OPTIONS': {'MAX_ENTRIES': 20000, 'CULL_INTERVAL': 60},
+    },
+}
+
+# Per-process LRU of each user's team roles, see teams/access.py. Entries are
+# checked against a version token in the CACHE_ALIAS cache on every read.
+MEMBERSHIP_CACHE = {
+    'ENABLED': True,
+    'MAX_ENTRIES': 10000,
+    'TIMEOUT': 300,
+    'CACHE_ALIAS': 'memberships',
+}
+
+# Per-request query count, DB time and duplicate statements as a
+# Server-Timing header and a JSON line on the monitoring.requests logger,
+# see monitoring/middleware.py.
+REQUEST_INSTRUMENTATION = {
+    'ENABLED': True,
+    'SERVER_TIMING': True,
+    'LOG': True,
+}
+
+# Statements slower than THRESHOLD_MS during a request are written with their
+# view, parameter types and EXPLAIN output to a size-rotated JSON-lines file,
+# see monitoring/slow_queries.py.
+SLOW_QUERY_LOG = {
+    'ENABLED': True,
+    'THRESHOLD_MS': 100,
+    'EXPLAIN': True,
+    'LOG_FILE': BASE_DIR / 'logs' / 'slow_queries.log',
+    'MAX_BYTES': 10 * 1024 * 1024,
+    'BACKUP_COUNT': 5,
+}
+
+# Request counts and latency histograms per view, DB time and ActivityLog
+# writes, served in the Prometheus text format at /metrics, see
+# monitoring/metrics.py. With several worker processes point
+# MULTIPROCESS_DIR at a directory they share on the host. /metrics is only
+# served to requests sending `Authorization: Bearer <TOKEN>` and, with
+# ALLOW_STAFF, to staff users.
+METRICS = {
+    'ENABLED': True,
+    'MULTIPROCESS_DIR': None,
+    'SNAPSHOT_INTERVAL': 5.0,
+    'TOKEN': None,
+    'ALLOW_STAFF': True,
+}
+
+# cProfile captures (.prof plus a top-N .txt summary) of requests from staff
+# users sending HEADER, or of a fraction of a view's requests given in
+# SAMPLE_RATES, e.g. {'TaskViewSet.list': 0.01}. OUTPUT_DIR is trimmed to
+# MAX_BYTES, oldest first, see monitoring/profiling.py.
+PROFILING = {
+    'ENABLED': True,
+    'HEADER': 'X-Profile',
+    'SAMPLE_RATES': {},
+    'OUTPUT_DIR': BASE_DIR / 'logs' / 'profiles',
+    'MAX_BYTES': 100 * 1024 * 1024,
+    'TOP_N': 30,
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'monitoring': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -44,6 +44,7 @@ urlpatterns = [
     path('api/companies/', include('companies.urls')),
     path('api/teams/', include('teams.urls')),
     path('api/tasks/', include('tasks.urls')),    # task CRUD
+    path('metrics', include('monitoring.urls')),
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='swagger'),
 
 ]
@@ -0,0 +1,177 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .models import Membership
+
+DEFAULTS = {
+    'ENABLED': True,
+    'MAX_ENTRIES': 10000,
+    'TIMEOUT': 300,
+    'CACHE_ALIAS': 'default',
+}
+
+
+def get_cache_settings():
+    return {**DEFAULTS, **getattr(settings, 'MEMBERSHIP_CACHE', {})}
+
+
+def _team_key(team_id):
+    return team_id if isinstance(team_id, uuid.UUID) else uuid.UUID(str(team_id))
+
+
+class MembershipCache:
+    """
+    Process-level LRU of user id -> {team_id: (membership_id, role, joined_at)}.
+
+    Every entry is stamped with the user's version token, which lives in the
+    Django cache named by CACHE_ALIAS. Invalidating a user replaces the token,
+    so entries in every process sharing that cache stop matching; a token
+    read before a database load also keeps a concurrent invalidation from
+    being overwritten with stale rows. Entries expire after TIMEOUT seconds
+    regardless.
+    """
+
+    key_prefix = 'membership-version:'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def version(self, user_id):
+        options = get_cache_settings()
+        if not options['ENABLED']:
+            return None
+
+        version_cache = caches[options['CACHE_ALIAS']]
+        key = f'{self.key_prefix}{user_id}'
+        version = version_cache.get(key)
+        if version is None:
+            version_cache.add(key, uuid.uuid4().hex, timeout=None)
+            version = version_cache.get(key)
+        return version
+
+    def get(self, user_id, version):
+        if version is None:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            roles, entry_version, expires_at = entry
+            if entry_version != version or expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return roles
+
+    def set(self, user_id, roles, version):
+        if version is None:
+            return
+
+        options = get_cache_settings()
+        with self._lock:
+            self._entries[user_id] = (roles, version, time.monotonic() + options['TIMEOUT'])
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > options['MAX_ENTRIES']:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+        options = get_cache_settings()
+        caches[options['CACHE_ALIAS']].set(f'{self.key_prefix}{user_id}', uuid.uuid4().hex, timeout=None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+membership_cache = MembershipCache()
+
+
+def invalidate_user_memberships(user_id):
+    membership_cache.invalidate(user_id)
+    # Again once the transaction commits: a request that read the old rows in
+    # between must not be able to cache them under the new version.
+    transaction.on_commit(lambda: membership_cache.invalidate(user_id))
+
+
+class MembershipResolver:
+    """
+    The memberships of one user keyed by team id, read from membership_cache
+    (or one query on a miss) the first time they are needed and reused for
+    the rest of the request by permissions, views and serializers.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self._memberships = None
+
+    @property
+    def memberships(self):
+        if self._memberships is None:
+            self._memberships = self._load()
+        return self._memberships
+
+    def _load(self):
+        if not self.user or not self.user.is_authenticated:
+            return {}
+
+        version = membership_cache.version(self.user.pk)
+        roles = membership_cache.get(self.user.pk, version)
+        if roles is None:
+            roles = {
+                team_id: (membership_id, role, joined_at)
+                for membership_id, team_id, role, joined_at in Membership.objects.filter(user=self.user).values_list('id', 'team_id', 'role', 'joined_at')
+            }
+            membership_cache.set(self.user.pk, roles, version)
+
+        memberships = {}
+        for team_id, (membership_id, role, joined_at) in roles.items():
+            membership = Membership(id=membership_id, team_id=team_id, role=role, joined_at=joined_at)
+            membership._state.adding = False
+            membership._state.db = Membership.objects.db
+            # Callers read membership.user (e.g. ActivityLog, created_by email).
+            membership.user = self.user
+            memberships[team_id] = membership
+        return memberships
+
+    def membership(self, team_id):
+        try:
+            return self.memberships.get(_team_key(team_id))
+        except ValueError:
+            return None
+
+    def role(self, team_id):
+        membership = self.membership(team_id)
+        return membership.role if membership else None
+
+    def is_member(self, team_id):
+        return self.membership(team_id) is not None
+
+    def is_admin(self, team_id):
+        return self.role(team_id) == Membership.ROLE_ADMIN
+
+    def team_ids(self):
+        return list(self.memberships)
+
+    def admin_team_ids(self):
+        return [team_id for team_id, membership in self.memberships.items() if membership.role == Membership.ROLE_ADMIN]
+
+    def invalidate(self):
+        self._memberships = None
+
+
+def get_membership_resolver(request):
+    resolver = getattr(request, '_membership_resolver', None)
+    if resolver is None or resolver.user is not request.user:
+        resolver = MembershipResolver(request.user)
+        request._membership_resolver = resolver
+    return resolver
@@ -0,0 +1,29 @@
+import threading
+import time
+
+from django.core.cache.backends.filebased import FileBasedCache
+
+_last_cull = {}
+_lock = threading.Lock()
+
+
+class PeriodicCullFileBasedCache(FileBasedCache):
+    """
+    FileBasedCache that counts its files against MAX_ENTRIES at most every
+    OPTIONS['CULL_INTERVAL'] seconds per process (default 60) instead of on
+    every set(), which lists the whole directory. The directory can overshoot
+    MAX_ENTRIES in between; for the membership version tokens a culled key
+    only costs one cache miss.
+    """
+
+    def __init__(self, dir, params):
+        super().__init__(dir, params)
+        self._cull_interval = float(params.get('OPTIONS', {}).get('CULL_INTERVAL', 60))
+
+    def _cull(self):
+        now = time.monotonic()
+        with _lock:
+            if now - _last_cull.get(self._dir, float('-inf')) < self._cull_interval:
+                return
+            _last_cull[self._dir] = now
+        super()._cull()
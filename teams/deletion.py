@@ -0,0 +1,54 @@
+import threading
+from collections import Counter
+
+_local = threading.local()
+
+
+class Deletion:
+    """
+    What one delete() call removes, as far as the signal receivers care.
+
+    Django sends pre_delete for every collected row before deleting any of
+    them, then post_delete for each row, all with the same `origin` (the
+    instance or queryset delete() was called on). pre_delete receivers note
+    what the cascade touches here so the post_delete receivers can do their
+    per-team work once per delete() instead of once per row, and skip teams
+    that are deleted along with it.
+    """
+
+    def __init__(self, origin):
+        self.origin = origin
+        self.collecting = True
+        self.deleted_team_ids = set()
+        self.team_ids = set()
+        # {(team_id, status): n} for the task counters, see tasks.stats.
+        self.stat_deltas = Counter()
+        self._done = set()
+
+    def changed_team_ids(self):
+        """Teams that lose rows but survive the delete."""
+        return self.team_ids - self.deleted_team_ids
+
+    def once(self, name):
+        """True for the first post_delete receiver asking for `name`."""
+        if name in self._done:
+            return False
+        self._done.add(name)
+        return True
+
+
+def collecting_deletion(origin):
+    """The Deletion pre_delete receivers add to; a new one per delete() call."""
+    deletion = getattr(_local, 'deletion', None)
+    if deletion is None or deletion.origin is not origin or not deletion.collecting:
+        deletion = _local.deletion = Deletion(origin)
+    return deletion
+
+
+def running_deletion(origin):
+    """The Deletion a post_delete receiver reads, None if no pre_delete was seen for it."""
+    deletion = getattr(_local, 'deletion', None)
+    if deletion is None or deletion.origin is not origin:
+        return None
+    deletion.collecting = False
+    return deletion
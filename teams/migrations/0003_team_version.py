@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('teams', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='team',
+            name='version',
+            field=models.PositiveBigIntegerField(default=1, editable=False),
+        ),
+    ]
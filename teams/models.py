@@ -10,6 +10,18 @@ class Team(models.Model):
     name = models.CharField(max_length=255)
     company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='teams')
     created_at = models.DateTimeField(auto_now_add=True)
+    # Bumped on every write that changes what the team's API payloads show,
+    # see teams.versions. Never written through save().
+    version = models.PositiveBigIntegerField(default=1, editable=False)
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # A stale in-memory counter must not overwrite a newer bump.
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'version'
+            ]
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.name} - {self.company.name}"
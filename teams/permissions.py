@@ -1,18 +1,20 @@
 from rest_framework import permissions
+from .access import get_membership_resolver
 
 class IsTeamMember(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
-        return obj.memberships.filter(user=request.user).exists()
+        return get_membership_resolver(request).is_member(obj.pk)
 
 
 class IsTeamAdmin(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
-        return obj.memberships.filter(user=request.user, role='admin').exists()
+        return get_membership_resolver(request).is_admin(obj.pk)
 
 
 class IsTeamAdminOrReadOnly(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
+        resolver = get_membership_resolver(request)
         if request.method in permissions.SAFE_METHODS:
-            return obj.memberships.filter(user=request.user).exists()
+            return resolver.is_member(obj.pk)
         
-        return obj.memberships.filter(user=request.user, role='admin').exists()
\ No newline at end of file
+        return resolver.is_admin(obj.pk)
\ No newline at end of file
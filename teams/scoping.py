@@ -0,0 +1,36 @@
+from django.db.models import Q
+
+from companies.models import Company
+from tasks.models import Task
+from .models import Membership, Team
+
+# Visibility is expressed as uncorrelated `IN (SELECT team_id FROM
+# teams_membership WHERE user_id = ...)` semi-joins instead of joins: rows
+# are never multiplied, so no DISTINCT (a temp B-tree on SQLite) is needed,
+# and SQLite builds the user's team list once from the (user, team) unique
+# index. Correlated EXISTS was measured too and lost on teams and task
+# counts, where it scans every row of the outer table.
+
+
+def member_team_ids(user):
+    """Subquery of the ids of the teams `user` is a member of."""
+    return Membership.objects.filter(user=user).values('team_id')
+
+
+def visible_teams(user, queryset=None):
+    """Teams `user` is a member of."""
+    queryset = Team.objects.all() if queryset is None else queryset
+    return queryset.filter(pk__in=member_team_ids(user))
+
+
+def visible_companies(user, queryset=None):
+    """Companies `user` owns or has at least one team membership in."""
+    queryset = Company.objects.all() if queryset is None else queryset
+    member_company_ids = Team.objects.filter(pk__in=member_team_ids(user)).values('company_id')
+    return queryset.filter(Q(created_by=user) | Q(pk__in=member_company_ids))
+
+
+def visible_tasks(user, queryset=None):
+    """Tasks of the teams `user` is a member of, soft-deleted ones included."""
+    queryset = Task.objects.all() if queryset is None else queryset
+    return queryset.filter(team_id__in=member_team_ids(user))
@@ -2,6 +2,8 @@ from rest_framework import serializers
 from .models import Team, Membership
 from companies.models import Company
 from users.models import User
+from tasks.models import TeamTaskStats
+from tasks.serializers import TeamTaskStatsSerializer
 
 
 class MembershipSerializer(serializers.ModelSerializer):
@@ -30,6 +32,7 @@ class TeamSerializer(serializers.ModelSerializer):
 
     members = MembershipSerializer(source='memberships', many=True, read_only=True)
     member_count = serializers.SerializerMethodField()
+    task_stats = serializers.SerializerMethodField()
 
     class Meta:
         model = Team
@@ -40,9 +43,10 @@ class TeamSerializer(serializers.ModelSerializer):
             'company',         
             'created_at',
             'members',
-            'member_count'
+            'member_count',
+            'task_stats'
         ]
-        read_only_fields = ['created_at', 'company', 'members', 'member_count']
+        read_only_fields = ['created_at', 'company', 'members', 'member_count', 'task_stats']
 
  
     def validate_company_id(self, value):
@@ -71,8 +75,18 @@ class TeamSerializer(serializers.ModelSerializer):
         }
 
     def get_member_count(self, obj):
+        # Annotated by TeamViewSet.get_queryset.
+        if hasattr(obj, 'member_count'):
+            return obj.member_count
         return obj.memberships.count()
 
+    def get_task_stats(self, obj):
+        try:
+            stats = obj.task_stats
+        except TeamTaskStats.DoesNotExist:
+            stats = TeamTaskStats(team=obj)
+        return TeamTaskStatsSerializer(stats).data
+
 
     def create(self, validated_data):
 
@@ -84,4 +98,14 @@ class TeamSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError({"company_id": "Invalid or missing company."})
 
 
-        return Team.objects.create(company=company, **validated_data)
\ No newline at end of file
+        return Team.objects.create(company=company, **validated_data)
+
+
+class TeamListSerializer(TeamSerializer):
+    """TeamSerializer without the embedded members, used for `?compact=true` team lists."""
+
+    members = None
+
+    class Meta(TeamSerializer.Meta):
+        fields = [field for field in TeamSerializer.Meta.fields if field != 'members']
+        read_only_fields = [field for field in TeamSerializer.Meta.read_only_fields if field != 'members']
@@ -0,0 +1,48 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from companies.models import Company
+from .access import invalidate_user_memberships
+from .deletion import collecting_deletion
+from .models import Membership, Team
+from .versions import bump_team_versions, bump_team_versions_on_delete
+
+
+@receiver(post_save, sender=Membership)
+@receiver(post_delete, sender=Membership)
+def invalidate_membership_cache(sender, instance, **kwargs):
+    # Covers add_member, remove_member, change_role, team creation and the
+    # cascade when a team or user is deleted.
+    invalidate_user_memberships(instance.user_id)
+
+
+@receiver(post_save, sender=Membership)
+def bump_version_on_membership_change(sender, instance, **kwargs):
+    bump_team_versions([instance.team_id])
+
+
+@receiver(pre_delete, sender=Team)
+def note_team_delete(sender, instance, origin=None, **kwargs):
+    collecting_deletion(origin).deleted_team_ids.add(instance.pk)
+
+
+@receiver(pre_delete, sender=Membership)
+def note_membership_delete(sender, instance, origin=None, **kwargs):
+    collecting_deletion(origin).team_ids.add(instance.team_id)
+
+
+@receiver(post_delete, sender=Membership)
+def bump_version_on_membership_delete(sender, instance, origin=None, **kwargs):
+    bump_team_versions_on_delete(instance.team_id, origin)
+
+
+@receiver(post_save, sender=Team)
+def bump_version_on_team_change(sender, instance, created, **kwargs):
+    if not created:
+        bump_team_versions([instance.pk])
+
+
+@receiver(post_save, sender=Company)
+def bump_version_on_company_change(sender, instance, created, **kwargs):
+    # Team payloads embed the company name.
+    if not created:
+        bump_team_versions(instance.teams.values_list('id', flat=True))
@@ -1,3 +1,317 @@
-from django.test import TestCase
+import itertools
+import tempfile
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from companies.models import Company
+from monitoring.testing import QueryBudgetTestCase
+from tasks.models import Task
+from users.models import User
+from .access import MembershipCache, MembershipResolver, membership_cache
+from .caches import PeriodicCullFileBasedCache
+from .models import Membership, Team
+
+_labels = itertools.count()
+
+
+def make_user(label=None):
+    label = label or f'user{next(_labels)}'
+    return User.objects.create_user(email=f'{label}@example.com', username=label, name=label.title(), password='pw-12345-x')
+
+
+class TeamEndpointTests(QueryBudgetTestCase):
+    def setUp(self):
+        self.admin = make_user('admin')
+        self.company = Company.objects.create(name='Acme', created_by=self.admin)
+        self.team = Team.objects.create(name='Core', company=self.company)
+        self.admin_membership = Membership.objects.create(user=self.admin, team=self.team, role=Membership.ROLE_ADMIN)
+        self.client.force_authenticate(self.admin)
+
+    def grow_members(self, count, team=None):
+        team = team or self.team
+        for _ in range(team.memberships.count(), count):
+            Membership.objects.create(user=make_user(), team=team)
+
+    def join_teams(self, count):
+        for index in range(Membership.objects.filter(user=self.admin).count(), count):
+            team = Team.objects.create(name=f'Team {index}', company=self.company)
+            Membership.objects.create(user=self.admin, team=team, role=Membership.ROLE_ADMIN)
+            self.grow_members(3, team)
+
+    def grow_tasks(self, count):
+        for index in range(self.team.tasks.count(), count):
+            Task.objects.create(title=f'Task {index}', team=self.team, created_by=self.admin_membership, status=('todo', 'done')[index % 2])
+
+    def test_list_queries_do_not_grow_with_teams(self):
+        response = self.assertConstantQueries(self.join_teams, lambda: self.client.get('/api/teams/'))
+
+        self.assertEqual(response.json()['count'], 100)
+        self.assertEqual(response.json()['results'][1]['member_count'], 3)
+
+    def test_list_queries_do_not_grow_with_members(self):
+        response = self.assertConstantQueries(self.grow_members, lambda: self.client.get('/api/teams/'))
+
+        self.assertEqual(len(response.json()['results'][0]['members']), 100)
+
+    def test_compact_list_leaves_out_members(self):
+        response = self.assertConstantQueries(self.grow_members, lambda: self.client.get('/api/teams/?compact=true'))
+
+        team = response.json()['results'][0]
+        self.assertNotIn('members', team)
+        self.assertEqual(team['member_count'], 100)
+
+    def test_retrieve_queries_do_not_grow_with_members(self):
+        response = self.assertConstantQueries(self.grow_members, lambda: self.client.get(f'/api/teams/{self.team.pk}/'))
+
+        self.assertEqual(len(response.json()['members']), 100)
+
+    def test_members_queries_do_not_grow_with_members(self):
+        response = self.assertConstantQueries(self.grow_members, lambda: self.client.get(f'/api/teams/{self.team.pk}/members/'))
+
+        self.assertEqual(response.json()['count'], 100)
+
+    def test_stats_queries_do_not_grow_with_tasks(self):
+        response = self.assertConstantQueries(self.grow_tasks, lambda: self.client.get(f'/api/teams/{self.team.pk}/stats/'))
+
+        self.assertEqual(response.json()['total'], 100)
+
+    def test_activity_queries_do_not_grow_with_entries(self):
+        self.assertConstantQueries(self.grow_tasks, lambda: self.client.get(f'/api/teams/{self.team.pk}/activity/'))
+
+    def test_add_member_queries_do_not_grow_with_members(self):
+        response = self.assertConstantQueries(
+            self.grow_members,
+            lambda: self.client.post(f'/api/teams/{self.team.pk}/add_member/', {'user_id': str(make_user().pk)}, format='json'),
+        )
+
+        self.assertEqual(response.status_code, 201)
+
+    def test_remove_member_queries_do_not_grow_with_members(self):
+        def remove_member():
+            user = make_user()
+            Membership.objects.create(user=user, team=self.team)
+            return self.client.post(f'/api/teams/{self.team.pk}/remove_member/', {'user_id': str(user.pk)}, format='json')
+
+        self.assertConstantQueries(self.grow_members, remove_member)
+
+    def test_change_role_queries_do_not_grow_with_members(self):
+        member = Membership.objects.create(user=make_user(), team=self.team)
+        roles = itertools.cycle(['admin', 'member'])
+
+        self.assertConstantQueries(
+            self.grow_members,
+            lambda: self.client.patch(f'/api/teams/{self.team.pk}/change_role/', {'user_id': str(member.user_id), 'role': next(roles)}, format='json'),
+        )
+
+    def test_create_queries_do_not_grow_with_teams(self):
+        response = self.assertConstantQueries(
+            self.join_teams,
+            lambda: self.client.post('/api/teams/', {'name': 'New', 'company_id': str(self.company.pk)}, format='json'),
+        )
+
+        self.assertEqual(response.json()['member_count'], 1)
+
+    def test_update_queries_do_not_grow_with_members(self):
+        names = itertools.cycle(['Renamed', 'Core'])
+
+        response = self.assertConstantQueries(
+            self.grow_members,
+            lambda: self.client.put(f'/api/teams/{self.team.pk}/', {'name': next(names), 'company_id': str(self.company.pk)}, format='json'),
+        )
+
+        self.assertEqual(len(response.json()['members']), 100)
+
+    def test_destroy_queries_do_not_grow_with_members_and_tasks(self):
+        teams = []
+
+        def grow(count):
+            teams[:] = [Team.objects.create(name='Doomed', company=self.company) for _ in range(2)]
+            for team in teams:
+                admin = Membership.objects.create(user=self.admin, team=team, role=Membership.ROLE_ADMIN)
+                self.grow_members(count, team)
+                for index in range(count):
+                    Task.objects.create(title=f'Task {index}', team=team, created_by=admin)
+
+        # Django deletes collected rows in batches of 100 primary keys.
+        self.assertConstantQueries(grow, lambda: self.client.delete(f'/api/teams/{teams.pop().pk}/'), sizes=(1, 10, 50))
+
+    def test_create_makes_creator_admin(self):
+        response = self.client.post('/api/teams/', {'name': 'New', 'company_id': str(self.company.pk)}, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Membership.objects.filter(team_id=response.json()['id'], user=self.admin, role=Membership.ROLE_ADMIN).exists())
+
+    def test_members_only_see_their_teams(self):
+        Team.objects.create(name='Other', company=self.company)
+
+        response = self.client.get('/api/teams/')
+
+        self.assertEqual([team['id'] for team in response.json()['results']], [str(self.team.pk)])
+
+    def test_non_admin_cannot_add_members(self):
+        member = make_user()
+        Membership.objects.create(user=member, team=self.team)
+        self.client.force_authenticate(member)
+
+        response = self.client.post(f'/api/teams/{self.team.pk}/add_member/', {'user_id': str(make_user().pk)}, format='json')
+
+        self.assertEqual(response.status_code, 403)
+
+    def test_retrieve_is_not_modified_until_team_changes(self):
+        etag = self.client.get(f'/api/teams/{self.team.pk}/')['ETag']
+
+        self.assertEqual(self.client.get(f'/api/teams/{self.team.pk}/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.grow_members(2)
+        self.assertEqual(self.client.get(f'/api/teams/{self.team.pk}/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class MembershipCacheTests(QueryBudgetTestCase):
+    def setUp(self):
+        membership_cache.clear()
+        self.user = make_user()
+        self.company = Company.objects.create(name='Acme', created_by=self.user)
+        self.team = Team.objects.create(name='Core', company=self.company)
+        self.membership = Membership.objects.create(user=self.user, team=self.team)
+
+    def role(self):
+        # A fresh resolver per call, like a new request.
+        return MembershipResolver(self.user).role(self.team.pk)
+
+    def test_roles_are_reused_across_requests(self):
+        self.assertEqual(self.role(), Membership.ROLE_MEMBER)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.role(), Membership.ROLE_MEMBER)
+
+    def test_role_change_invalidates(self):
+        self.role()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.membership.role = Membership.ROLE_ADMIN
+            self.membership.save()
+
+        self.assertEqual(self.role(), Membership.ROLE_ADMIN)
+
+    def test_joining_and_leaving_invalidate(self):
+        other = Team.objects.create(name='Other', company=self.company)
+        self.assertFalse(MembershipResolver(self.user).is_member(other.pk))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Membership.objects.create(user=self.user, team=other)
+        self.assertTrue(MembershipResolver(self.user).is_member(other.pk))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.membership.delete()
+        self.assertIsNone(self.role())
+
+    def test_team_deletion_invalidates(self):
+        self.role()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.team.delete()
+
+        self.assertEqual(MembershipResolver(self.user).team_ids(), [])
+
+    def test_invalidation_reaches_other_processes(self):
+        self.role()
+        # Changed without signals, then invalidated by "another process": only
+        # the shared version token tells this process its entry is stale.
+        Membership.objects.filter(pk=self.membership.pk).update(role=Membership.ROLE_ADMIN)
+        self.assertEqual(self.role(), Membership.ROLE_MEMBER)
+
+        MembershipCache().invalidate(self.user.pk)
+
+        self.assertEqual(self.role(), Membership.ROLE_ADMIN)
+
+    def test_rows_read_before_an_invalidation_are_not_reused(self):
+        version = membership_cache.version(self.user.pk)
+        membership_cache.invalidate(self.user.pk)
+        membership_cache.set(self.user.pk, {}, version)
+
+        self.assertIsNone(membership_cache.get(self.user.pk, membership_cache.version(self.user.pk)))
+
+    def test_demoted_admin_loses_access_on_the_next_request(self):
+        admin = make_user()
+        Membership.objects.create(user=admin, team=self.team, role=Membership.ROLE_ADMIN)
+        Membership.objects.filter(pk=self.membership.pk).update(role=Membership.ROLE_ADMIN)
+        membership_cache.invalidate(self.user.pk)
+        add_member = f'/api/teams/{self.team.pk}/add_member/'
+
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.post(add_member, {'user_id': str(make_user().pk)}, format='json').status_code, 201)
+
+        self.client.force_authenticate(admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f'/api/teams/{self.team.pk}/change_role/', {'user_id': str(self.user.pk), 'role': 'member'}, format='json',
+            )
+        self.assertEqual(response.status_code, 200)
+
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.post(add_member, {'user_id': str(make_user().pk)}, format='json').status_code, 403)
+
+
+class TeamDeleteVersionTests(QueryBudgetTestCase):
+    def setUp(self):
+        owner = make_user()
+        self.company = Company.objects.create(name='Acme', created_by=owner)
+        self.teams = [Team.objects.create(name=f'Team {index}', company=self.company) for index in range(2)]
+        for team in self.teams:
+            for index in range(3):
+                membership = Membership.objects.create(user=make_user(), team=team)
+                Task.objects.create(title=f'Task {index}', team=team, created_by=membership)
+
+    def versions(self):
+        return [Team.objects.get(pk=team.pk).version for team in self.teams]
+
+    def delete(self, deletable):
+        with CaptureQueriesContext(connection) as context:
+            deletable.delete()
+        return [query['sql'] for query in context.captured_queries if query['sql'].startswith('UPDATE "teams_team"')]
+
+    def test_deleting_a_team_does_not_bump_it_per_row(self):
+        self.assertEqual(self.delete(self.teams[0]), [])
+        self.assertEqual(self.delete(self.company), [])
+
+    def test_a_cascade_bumps_each_surviving_team_once(self):
+        user = Membership.objects.filter(team=self.teams[0]).first().user
+        Membership.objects.create(user=user, team=self.teams[1])
+        before = self.versions()
+
+        self.assertEqual(len(self.delete(user)), 1)
+        self.assertEqual(self.versions(), [version + 1 for version in before])
+
+    def test_queryset_deletes_bump_once(self):
+        before = self.versions()
+
+        self.assertEqual(len(self.delete(Task.objects.all())), 1)
+        self.assertEqual(self.versions(), [version + 1 for version in before])
+        self.assertEqual(len(self.delete(Task.objects.none())), 0)
+
+    def test_deletes_after_a_failed_one_still_bump(self):
+        task = Task.objects.filter(team=self.teams[0]).first()
+        with mock.patch('tasks.signals.track_task_delete', side_effect=RuntimeError), self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                task.delete()
+        before = self.versions()
+
+        self.delete(task)
+
+        self.assertEqual(self.versions(), [before[0] + 1, before[1]])
+
+
+class PeriodicCullFileBasedCacheTests(QueryBudgetTestCase):
+    def test_directory_is_listed_once_per_interval(self):
+        directory = self.enterContext(tempfile.TemporaryDirectory())
+        cache = PeriodicCullFileBasedCache(directory, {'OPTIONS': {'MAX_ENTRIES': 3, 'CULL_INTERVAL': 60}})
+
+        with mock.patch.object(cache, '_list_cache_files', wraps=cache._list_cache_files) as listing:
+            for index in range(6):
+                cache.set(f'key{index}', index)
+            self.assertEqual(listing.call_count, 1)
+
+            with mock.patch('teams.caches.time.monotonic', return_value=float('inf')):
+                cache.set('key6', 6)
+            self.assertEqual(listing.call_count, 2)
+        self.assertLess(len(list(Path(directory).glob('*.djcache'))), 7)
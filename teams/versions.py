@@ -0,0 +1,99 @@
+import hashlib
+
+from django.db.models import F
+from django.utils.cache import parse_etags, patch_vary_headers
+from rest_framework import status
+from rest_framework.response import Response
+
+from .access import get_membership_resolver
+from .deletion import running_deletion
+from .models import Team
+
+
+def bump_team_versions(team_ids):
+    """Increment the change counter of every given team in one UPDATE."""
+    team_ids = {team_id for team_id in team_ids if team_id}
+    if team_ids:
+        Team.objects.filter(pk__in=team_ids).update(version=F('version') + 1)
+
+
+def bump_team_versions_on_delete(team_id, origin):
+    """
+    post_delete side of the version bump for a row of `team_id`: one UPDATE
+    per delete() for all teams that lost rows, none for teams deleted too
+    (their ETags go with them). The rows must have been noted in the
+    Deletion by a pre_delete receiver.
+    """
+    deletion = running_deletion(origin)
+    if deletion is None:
+        bump_team_versions([team_id])
+    elif deletion.once('team_versions'):
+        bump_team_versions(deletion.changed_team_ids())
+
+
+def team_versions_etag(user, team_ids, *parts):
+    """
+    Weak ETag over the user, the (team, version) pairs of `team_ids` and any
+    extra parts such as the request path. Costs a single indexed lookup on
+    teams_team however many tasks or members the payload would contain.
+    """
+    versions = sorted(
+        (str(team_id), version)
+        for team_id, version in Team.objects.filter(pk__in=team_ids).values_list('id', 'version')
+    )
+    digest = hashlib.sha1()
+    digest.update(str(user.pk).encode())
+    for team_id, version in versions:
+        digest.update(f'|{team_id}:{version}'.encode())
+    for part in parts:
+        digest.update(f'|{part}'.encode())
+    return f'W/"{digest.hexdigest()}"'
+
+
+def etag_matches(header, etag):
+    # `*` is not special-cased: the tag is checked before the object is
+    # looked up, so `*` would answer 304 for ids that do not exist.
+    if not header:
+        return False
+    # If-None-Match uses the weak comparison.
+    return etag.removeprefix('W/') in {tag.removeprefix('W/') for tag in parse_etags(header)}
+
+
+class ConditionalGetMixin:
+    """
+    ETag / If-None-Match support for `list` and `retrieve`. The tag is built
+    from the version counters of the teams the request can see, so a client
+    polling an unchanged resource gets a 304 before the main query runs.
+    """
+
+    def get_etag_team_ids(self, request):
+        return get_membership_resolver(request).team_ids()
+
+    def get_etag(self, request):
+        team_ids = self.get_etag_team_ids(request)
+        if team_ids is None:
+            return None
+        return team_versions_etag(
+            request.user,
+            team_ids,
+            request.get_full_path(),
+            request.accepted_media_type,
+        )
+
+    def conditional_response(self, request, handler, *args, **kwargs):
+        etag = self.get_etag(request)
+        if etag and etag_matches(request.headers.get('If-None-Match'), etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = handler(request, *args, **kwargs)
+        if etag and response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = etag
+            response['Cache-Control'] = 'private, no-cache'
+            patch_vary_headers(response, ['Authorization'])
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().retrieve, *args, **kwargs)
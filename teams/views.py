@@ -5,23 +5,67 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.exceptions import ValidationError, PermissionDenied
 from django.shortcuts import get_object_or_404
 from django.db import transaction
+from django.db.models import Count, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 import uuid
+from monitoring.profiling import ProfilingMixin
 from users.models import User
 from companies.models import Company
+from tasks.models import ActivityLog
+from tasks.serializers import ActivityLogSerializer, TeamTaskStatsDetailSerializer
+from tasks.stats import team_task_stats
+from tasks.views import ACTIVITY_FEED_PARAMETERS, ActivityFeedMixin
+from .access import get_membership_resolver
 from .models import Team, Membership
-from .serializers import TeamSerializer, MembershipSerializer
+from .serializers import TeamSerializer, TeamListSerializer, MembershipSerializer
+from .scoping import visible_teams
+from .versions import ConditionalGetMixin
 from .permissions import IsTeamAdmin, IsTeamMember
 
 
-class TeamViewSet(viewsets.ModelViewSet):
+class TeamViewSet(ProfilingMixin, ActivityFeedMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Team.objects.all()
     serializer_class = TeamSerializer
     permission_classes = [IsAuthenticated, IsTeamMember]
 
     def get_queryset(self):
-        return Team.objects.filter(memberships__user=self.request.user).distinct()
+        member_count = (
+            Membership.objects
+            .filter(team=OuterRef('pk'))
+            .order_by()
+            .values('team')
+            .annotate(count=Count('pk'))
+            .values('count')
+        )
+        queryset = (
+            visible_teams(self.request.user)
+            .select_related('company', 'task_stats')
+            .annotate(member_count=Coalesce(Subquery(member_count), 0))
+            .order_by('created_at', 'pk')
+        )
+        if self.action in ('list', 'retrieve', 'update', 'partial_update') and not self.is_compact():
+            queryset = queryset.prefetch_related(
+                Prefetch('memberships', queryset=Membership.objects.select_related('user'))
+            )
+        return queryset
+
+    def is_compact(self):
+        return self.action == 'list' and self.request.query_params.get('compact', '').lower() in ('1', 'true', 'yes')
+
+    def get_serializer_class(self):
+        if self.is_compact():
+            return TeamListSerializer
+        return TeamSerializer
+
+    def get_etag_team_ids(self, request):
+        resolver = get_membership_resolver(request)
+        if self.action == 'retrieve':
+            # Teams the user is not in fall through to the regular 404.
+            membership = resolver.membership(self.kwargs.get(self.lookup_url_kwarg or self.lookup_field))
+            return [membership.team_id] if membership else None
+        return resolver.team_ids()
 
     @swagger_auto_schema(
         operation_summary="Create a new team",
@@ -43,13 +87,17 @@ class TeamViewSet(viewsets.ModelViewSet):
     
     @swagger_auto_schema(
         operation_summary="List teams",
-        operation_description="List all teams where the user is a member",
+        operation_description="List all teams where the user is a member. Pass compact=true to leave out the embedded members and page through /api/teams/{id}/members/ instead.",
         security=[{'Bearer': []}],
+        manual_parameters=[
+            openapi.Parameter('compact', openapi.IN_QUERY, description="true: leave out the embedded members (member_count is still included)", type=openapi.TYPE_BOOLEAN),
+        ],
         responses={
             200: openapi.Response(
                 description="List of teams",
                 schema=TeamSerializer(many=True)
             ),
+            304: "Not modified since the ETag sent in If-None-Match",
             401: "Authentication credentials were not provided"
         }
     )
@@ -65,6 +113,7 @@ class TeamViewSet(viewsets.ModelViewSet):
                 description="Team details",
                 schema=TeamSerializer
             ),
+            304: "Not modified since the ETag sent in If-None-Match",
             401: "Authentication credentials were not provided",
             404: "Team not found"
         }
@@ -89,7 +138,15 @@ class TeamViewSet(viewsets.ModelViewSet):
         }
     )
     def update(self, request, *args, **kwargs):
-        return super().update(request, *args, **kwargs)
+        # UpdateModelMixin.update without dropping the prefetched members,
+        # which an update of the team's own fields leaves valid; it would
+        # load them back one user at a time.
+        partial = kwargs.pop('partial', False)
+        instance = self.get_object()
+        serializer = self.get_serializer(instance, data=request.data, partial=partial)
+        serializer.is_valid(raise_exception=True)
+        self.perform_update(serializer)
+        return Response(serializer.data)
     
     @swagger_auto_schema(
         operation_summary="Partially update team",
@@ -132,6 +189,7 @@ class TeamViewSet(viewsets.ModelViewSet):
         
         # Create membership for the creator as admin
         Membership.objects.create(user=self.request.user, team=team, role='admin')
+        get_membership_resolver(self.request).invalidate()
 
 
     @swagger_auto_schema(
@@ -293,9 +351,61 @@ class TeamViewSet(viewsets.ModelViewSet):
         membership.save()
         return Response(MembershipSerializer(membership).data)
 
+    @swagger_auto_schema(
+        operation_summary="Team activity feed",
+        operation_description="Activity log entries for the team, newest first. User must be a team member.",
+        security=[{'Bearer': []}],
+        manual_parameters=ACTIVITY_FEED_PARAMETERS,
+        responses={
+            200: openapi.Response(description="Page of activity log entries", schema=ActivityLogSerializer(many=True)),
+            400: "Unknown action filter",
+            401: "Authentication credentials were not provided",
+            404: "Team not found or invalid cursor"
+        }
+    )
+    @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated, IsTeamMember])
+    def activity(self, request, pk=None):
+        team = self.get_object()
+        return self.activity_feed(request, ActivityLog.objects.filter(team=team))
+
+    @swagger_auto_schema(
+        operation_summary="List team members",
+        operation_description="Paginated members of the team, oldest first. User must be a team member.",
+        security=[{'Bearer': []}],
+        manual_parameters=[
+            openapi.Parameter('page', openapi.IN_QUERY, description="Page number", type=openapi.TYPE_INTEGER),
+        ],
+        responses={
+            200: openapi.Response(description="Page of memberships", schema=MembershipSerializer(many=True)),
+            401: "Authentication credentials were not provided",
+            404: "Team not found"
+        }
+    )
+    @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated, IsTeamMember])
+    def members(self, request, pk=None):
+        team = self.get_object()
+        memberships = team.memberships.select_related('user').order_by('joined_at', 'id')
+        page = self.paginate_queryset(memberships)
+        return self.get_paginated_response(MembershipSerializer(page, many=True).data)
+
+    @swagger_auto_schema(
+        operation_summary="Team task stats",
+        operation_description="Live task counts of the team per status, read from incrementally maintained counters, plus the number of overdue open tasks. User must be a team member.",
+        security=[{'Bearer': []}],
+        responses={
+            200: openapi.Response(description="Task counters", schema=TeamTaskStatsDetailSerializer),
+            401: "Authentication credentials were not provided",
+            404: "Team not found"
+        }
+    )
+    @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated, IsTeamMember])
+    def stats(self, request, pk=None):
+        team = self.get_object()
+        return Response(TeamTaskStatsDetailSerializer(team_task_stats(team)).data)
+
   
     def destroy(self, request, *args, **kwargs):
         team = self.get_object()
-        if not team.memberships.filter(user=request.user, role='admin').exists():
+        if not get_membership_resolver(request).is_admin(team.pk):
             raise PermissionDenied("Only team admin can delete the team.")
         return super().destroy(request, *args, **kwargs)
\ No newline at end of file
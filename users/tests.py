@@ -1,3 +1,71 @@
-from django.test import TestCase
+import itertools
 
-# Create your tests here.
+from companies.models import Company
+from monitoring.testing import QueryBudgetTestCase
+from teams.models import Membership, Team
+from .models import User
+
+PASSWORD = 'correct-horse-9'
+
+
+class UserEndpointTests(QueryBudgetTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='owner@example.com', username='owner', name='Owner', password=PASSWORD)
+        self.company = Company.objects.create(name='Acme', created_by=self.user)
+
+    def join_teams(self, count):
+        for index in range(Membership.objects.filter(user=self.user).count(), count):
+            team = Team.objects.create(name=f'Team {index}', company=self.company)
+            Membership.objects.create(user=self.user, team=team, role=Membership.ROLE_ADMIN)
+
+    def test_register(self):
+        response = self.client.post('/api/auth/register/', {
+            'email': 'new@example.com', 'username': 'new', 'name': 'New',
+            'password': PASSWORD, 'password2': PASSWORD,
+        }, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(User.objects.filter(email='new@example.com').exists())
+
+    def test_register_queries_do_not_grow_with_users(self):
+        labels = itertools.count()
+
+        def grow_users(count):
+            for index in range(User.objects.count(), count):
+                User.objects.create_user(email=f'user{index}@example.com', username=f'user{index}', password=PASSWORD)
+
+        def register():
+            label = f'new{next(labels)}'
+            return self.client.post('/api/auth/register/', {
+                'email': f'{label}@example.com', 'username': label, 'name': 'New',
+                'password': PASSWORD, 'password2': PASSWORD,
+            }, format='json')
+
+        self.assertConstantQueries(grow_users, register)
+
+    def test_register_rejects_mismatched_passwords(self):
+        response = self.client.post('/api/auth/register/', {
+            'email': 'new@example.com', 'username': 'new', 'password': PASSWORD, 'password2': 'other-horse-9',
+        }, format='json')
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_login_queries_do_not_grow_with_teams(self):
+        response = self.assertConstantQueries(
+            self.join_teams,
+            lambda: self.client.post('/api/auth/login/', {'email': self.user.email, 'password': PASSWORD}, format='json'),
+        )
+
+        self.assertIn('access', response.json())
+
+    def test_login_rejects_wrong_password(self):
+        response = self.client.post('/api/auth/login/', {'email': self.user.email, 'password': 'wrong'}, format='json')
+
+        self.assertEqual(response.status_code, 401)
+
+    def test_profile_queries_do_not_grow_with_teams(self):
+        self.client.force_authenticate(self.user)
+
+        response = self.assertConstantQueries(self.join_teams, lambda: self.client.get('/api/auth/profile/'))
+
+        self.assertEqual(response.json()['email'], self.user.email)
@@ -7,6 +7,7 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework_simplejwt.tokens import RefreshToken
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
+from monitoring.profiling import ProfilingMixin
 
 from .serializers import RegisterSerializer, LoginSerializer
 from django.contrib.auth import get_user_model
@@ -15,7 +16,7 @@ User = get_user_model()
 
 
 # ==================== REGISTER ====================
-class RegisterView(APIView):
+class RegisterView(ProfilingMixin, APIView):
     permission_classes = [AllowAny]
 
     @swagger_auto_schema(
@@ -63,7 +64,7 @@ class RegisterView(APIView):
 
 
 # ==================== LOGIN ====================
-class LoginView(APIView):
+class LoginView(ProfilingMixin, APIView):
     permission_classes = [AllowAny]
 
     @swagger_auto_schema(
@@ -111,7 +112,7 @@ class LoginView(APIView):
 
 
 # ==================== PROFILE ====================
-class ProfileView(APIView):
+class ProfileView(ProfilingMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     @swagger_auto_schema(